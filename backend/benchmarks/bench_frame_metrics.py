@@ -0,0 +1,71 @@
+"""
+Per-frame cost of the video analysis stages on synthetic 1080p frames.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_frame_metrics --frames 200
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from services.frame_buffer import FrameBuffer
+from services.motion_estimator import MotionEstimator
+from services.quality_metrics import QualityMeter
+
+
+def make_frames(count: int, width: int, height: int):
+    """Textured background with a moving bright block, so every stage has work to do"""
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width + count, 3), dtype=np.uint8), (9, 9), 0)
+    for i in range(count):
+        frame = np.ascontiguousarray(background[:, i:i + width])
+        cv2.rectangle(frame, (100 + 5 * i, 300), (400 + 5 * i, 700), (240, 240, 240), -1)
+        yield frame
+
+
+def time_stage(name, frames, buffer, stage):
+    start = time.perf_counter()
+    for frame in frames:
+        buffer.update(frame)
+        stage(buffer)
+    elapsed = time.perf_counter() - start
+    return name, elapsed * 1000.0 / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--analysis-width", type=int, default=960)
+    args = parser.parse_args()
+
+    frames = list(make_frames(args.frames, args.width, args.height))
+    buffer = FrameBuffer(args.analysis_width)
+    quality = QualityMeter()
+    motion = MotionEstimator()
+
+    results = [
+        time_stage("preprocess (FrameBuffer)", frames, buffer, lambda b: None),
+        time_stage("preprocess + quality", frames, buffer, lambda b: quality.add(quality.measure(b.gray))),
+        time_stage("preprocess + motion", frames, buffer, lambda b: motion.update(b.gray, b.blurred, time.perf_counter())),
+    ]
+
+    try:
+        import mediapipe as mp
+        detector = mp.solutions.face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5)
+        results.append(time_stage("preprocess + face detection", frames, buffer, lambda b: detector.process(b.rgb)))
+    except ImportError:
+        pass
+
+    baseline = results[0][1]
+    print(f"{args.frames} frames at {args.width}x{args.height}, analysis width {args.analysis_width}")
+    for name, per_frame in results:
+        print(f"  {name:<30} {per_frame:7.2f} ms/frame  (+{per_frame - baseline:6.2f} ms over preprocessing)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Storage size and decode time of per-frame series: JSON text vs the .npy sidecar.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_frame_series --rows 16384
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from services.frame_series import FrameSeries, FRAME_SERIES_DTYPE
+
+
+def make_series(rows: int) -> FrameSeries:
+    rng = np.random.default_rng(0)
+    points = np.column_stack([
+        np.arange(rows) * 0.5,
+        rng.integers(0, 30, rows),
+        rng.random(rows),
+        rng.random(rows),
+        rng.random(rows),
+        rng.random(rows) * 0.1
+    ])
+    return FrameSeries.from_points(points)
+
+
+def best_of(repeats: int, fn):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=16384)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    series = make_series(args.rows)
+    duration = float(series.column('timestamp')[-1])
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "series.json")
+        npy_path = os.path.join(directory, "series.npy")
+        with open(json_path, "w") as f:
+            # The old layout: one JSON object per frame
+            json.dump([dict(zip(series.data.dtype.names, row)) for row in series.data.tolist()], f)
+        series.save(npy_path)
+
+        def json_load():
+            with open(json_path) as f:
+                return json.load(f)
+
+        def json_chart():
+            # What a chart needs: one metric for a 10-minute window
+            return [row['engagement'] for row in json_load() if 600.0 <= row['timestamp'] < 1200.0]
+
+        def npy_chart():
+            return np.asarray(FrameSeries.load(npy_path).slice(600.0, 1200.0).column('engagement'))
+
+        results = [
+            ("size (KiB)", os.path.getsize(json_path) / 1024.0, os.path.getsize(npy_path) / 1024.0),
+            ("open (ms)", best_of(args.repeats, json_load), best_of(args.repeats, lambda: FrameSeries.load(npy_path))),
+            ("10-min engagement slice (ms)", best_of(args.repeats, json_chart), best_of(args.repeats, npy_chart)),
+        ]
+
+    print(f"{args.rows} rows ({duration / 60:.0f} min at 2 fps), {len(FRAME_SERIES_DTYPE.names)} 4-byte columns")
+    print(f"  {'':<30} {'JSON':>10} {'.npy':>10} {'ratio':>8}")
+    for name, json_value, npy_value in results:
+        print(f"  {name:<30} {json_value:10.2f} {npy_value:10.2f} {json_value / npy_value:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+End-to-end pipeline benchmark on a synthetic classroom video, per stage, compared against a stored baseline.
+
+Each stage is timed on its own: extract_audio_from_video, Whisper model load,
+transcribe_audio, VideoAnalyzer.analyze_video (with _process_analysis_results
+reported separately), sidecar file writes and DB writes, then the full
+process_video_pipeline. OpenRouter is replaced by the mock server, so feedback
+generation costs the same on every run. Everything runs in a temporary
+directory with its own SQLite database.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_pipeline --seconds 120 --width 1280 --height 720 --fps 25
+    python -m benchmarks.bench_pipeline --update-baseline      # store these results as the baseline
+    python -m benchmarks.bench_pipeline --fail-on-regression   # exit 1 if a stage got slower than the tolerance
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from benchmarks.mock_openrouter import MockOpenRouter, MockConfig
+from benchmarks.synthetic_media import make_test_video, find_ffmpeg
+from config.settings import settings
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "pipeline_baseline.json")
+CONFIG_KEYS = ("seconds", "width", "height", "fps", "audio", "profile")
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def stage(seconds: float, status: str = "ok", note: Optional[str] = None) -> Dict[str, Any]:
+    entry = {'seconds': round(seconds, 4), 'status': status}
+    if note:
+        entry['note'] = note
+    return entry
+
+
+def run_once(args, video_path: str, wav_path: str) -> Dict[str, Dict[str, Any]]:
+    """Time every stage once"""
+    import main as app
+    from database.connection import SessionLocal
+    from models.database import VideoAnalysis, AIFeedback
+    from services.video_analyzer import VideoAnalyzer
+    from services.frame_series import save_frame_series
+    from services.timeline_pyramid import save_timeline_pyramid
+    from services.keyframes import save_keyframes
+
+    ai_service = app.ai_service
+    stages = {}
+
+    audio_path, seconds = timed(ai_service.extract_audio_from_video, video_path)
+    if audio_path:
+        stages['extract_audio_from_video'] = stage(seconds)
+    else:
+        note = "MoviePy not installed" if not ai_service.model_status()['moviepy'] else "no audio track in the video"
+        stages['extract_audio_from_video'] = stage(seconds, "unavailable", note)
+
+    whisper, seconds = timed(lambda: ai_service.whisper_model)
+    stages['whisper_model_load'] = stage(seconds, "ok" if whisper else "unavailable", None if whisper else "Whisper not available")
+
+    transcription, seconds = timed(ai_service.transcribe_audio, audio_path or wav_path, "en")
+    if whisper and transcription:
+        stages['transcribe_audio'] = stage(seconds)
+        stages['transcribe_audio']['audio_seconds_per_second'] = round(args.seconds / max(seconds, 1e-9), 2)
+    else:
+        stages['transcribe_audio'] = stage(seconds, "unavailable", "placeholder transcription")
+
+    analyzer, seconds = timed(VideoAnalyzer, args.profile)
+    stages['video_analyzer_init'] = stage(seconds)
+
+    # Time _process_analysis_results inside analyze_video through a wrapper on this instance
+    process_timings = []
+    process_results = analyzer._process_analysis_results
+
+    def timed_process(*process_args, **process_kwargs):
+        result, elapsed = timed(process_results, *process_args, **process_kwargs)
+        process_timings.append(elapsed)
+        return result
+
+    analyzer._process_analysis_results = timed_process
+    analysis, seconds = timed(analyzer.analyze_video, video_path)
+    if not analysis:
+        stages['analyze_video'] = stage(seconds, "failed")
+        analysis = {}
+    else:
+        frames = len(analysis['frame_series']) if analysis.get('frame_series') is not None else 0
+        stages['analyze_video'] = stage(seconds)
+        stages['analyze_video']['frames_analyzed'] = frames
+        stages['analyze_video']['frames_per_second'] = round(frames / max(seconds, 1e-9), 2)
+        stages['analyze_video']['video_seconds_per_second'] = round(args.seconds / max(seconds, 1e-9), 2)
+    if process_timings:
+        stages['process_analysis_results'] = stage(sum(process_timings))
+
+    # Writes as the pipeline does them: sidecar files, then the row updates and the feedback row
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        video = VideoAnalysis(
+            video_filename="lesson.mp4", video_path=video_path, subject="mathematics", theme="fractions",
+            language="en", status="pending", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        )
+        db.add(video)
+        db.commit()
+        db.refresh(video)
+        db_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if analysis.get('frame_series') is not None:
+            video.frame_series_path = save_frame_series(video.id, analysis['frame_series'])
+            save_timeline_pyramid(video.id, analysis['frame_series'])
+        keyframes = save_keyframes(video.id, analysis.get('keyframes') or [])
+        stages['sidecar_writes'] = stage(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        video.status = "processing"
+        db.commit()
+        video.audio_path = audio_path
+        db.commit()
+        video.transcription = (transcription or {}).get('text', '')
+        db.commit()
+        technical_analysis = dict(analysis.get('technical_analysis') or {}, keyframes=keyframes)
+        video.engagement_metrics = json.dumps(analysis.get('engagement_metrics') or {})
+        db.commit()
+        db.add(AIFeedback(
+            video_analysis_id=video.id, language="en", teaching_quality_score=7.5, student_engagement_score=6.5,
+            overall_score=7.0, strengths="-", areas_for_improvement="-", specific_recommendations="-",
+            technical_analysis=json.dumps(technical_analysis)
+        ))
+        video.status = "completed"
+        db.commit()
+        stages['db_writes'] = stage(db_seconds + time.perf_counter() - start)
+
+        # Full pipeline on a fresh row, as a background task would run it; again with the profiler on if asked
+        for name, profile in (('process_video_pipeline', False), ('process_video_pipeline_profiled', True)):
+            if profile and not args.cpu_profile:
+                continue
+            video = VideoAnalysis(
+                video_filename="lesson.mp4", video_path=video_path, subject="mathematics", theme="fractions",
+                language="en", status="pending", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+            )
+            db.add(video)
+            db.commit()
+            _, seconds = timed(app.process_video_pipeline, video.id, "en", profile)
+            db.expire_all()
+            status = db.query(VideoAnalysis).filter(VideoAnalysis.id == video.id).first().status
+            stages[name] = stage(seconds, "ok" if status == "completed" else "failed")
+            if profile:
+                from services.profiler import load_profile_report
+                report = load_profile_report(video.id) or {}
+                stages[name]['profiler_overhead'] = report.get('overhead')
+                stages[name]['profiler_samples'] = report.get('samples')
+    finally:
+        db.close()
+    return stages
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float) -> Dict[str, Any]:
+    """Per-stage ratio to the baseline; a regression is slower by more than tolerance and min_delta seconds"""
+    mismatched = [key for key in CONFIG_KEYS if results['config'].get(key) != baseline.get('config', {}).get(key)]
+    if mismatched:
+        return {'comparable': False, 'reason': f"different benchmark configuration: {', '.join(mismatched)}"}
+
+    stages, regressions = {}, []
+    for name, current in results['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if not base or current['status'] != "ok" or base.get('status') != "ok":
+            continue
+        ratio = current['seconds'] / max(base['seconds'], 1e-9)
+        regressed = ratio > 1.0 + tolerance and current['seconds'] - base['seconds'] > min_delta
+        stages[name] = {'baseline_seconds': base['seconds'], 'ratio': round(ratio, 3), 'regression': regressed}
+        if regressed:
+            regressions.append(name)
+    return {
+        'comparable': True,
+        'baseline_recorded_at': baseline.get('recorded_at'),
+        'tolerance': tolerance,
+        'stages': stages,
+        'regressions': regressions
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60.0, help="Length of the synthetic video")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--audio", choices=("speech", "tone"), default="speech")
+    parser.add_argument("--profile", default=settings.video_analysis_profile, help="Video analysis profile")
+    parser.add_argument("--repeats", type=int, default=1, help="Run every stage this many times and keep the fastest")
+    parser.add_argument("--llm-latency", default="fixed:0.5", help="Mock OpenRouter latency distribution")
+    parser.add_argument("--model-server", action="store_true", help="Transcribe through the shared model server")
+    parser.add_argument("--cpu-profile", action="store_true", help="Also run the full pipeline under the sampling profiler")
+    parser.add_argument("--json", default=None, help="Write the results to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown per stage (0.2 = 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Ignore slowdowns smaller than this (seconds)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    workdir = tempfile.TemporaryDirectory()
+    try:
+        media = os.path.join(workdir.name, "media")
+        # Set before the app modules are imported: the database engine and upload directory are created at import
+        settings.database_url = f"sqlite:///{os.path.join(workdir.name, 'bench.db')}"
+        settings.upload_dir = os.path.join(media, "uploads")
+        settings.series_dir = os.path.join(media, "series")
+        settings.keyframe_dir = os.path.join(media, "keyframes")
+        settings.transcript_summary_cache_dir = os.path.join(media, "summaries")
+        settings.metrics_dir = os.path.join(media, "metrics")
+        settings.trace_db_path = os.path.join(media, "traces.db")
+        settings.profile_dir = os.path.join(media, "profiles")
+        settings.model_server_enabled = args.model_server
+        settings.model_warm_up = False
+        os.makedirs(settings.upload_dir, exist_ok=True)
+
+        mock = MockOpenRouter(MockConfig(latency=args.llm_latency, seed=0)).start()
+        try:
+            settings.openrouter_base_url = mock.base_url
+            settings.openrouter_api_key = "mock"
+
+            (video_path, wav_path, muxed), generate_seconds = timed(
+                make_test_video, workdir.name, args.seconds, args.width, args.height, args.fps, args.audio
+            )
+            from database.connection import create_tables
+            create_tables()
+
+            best: Dict[str, Dict[str, Any]] = {}
+            for _ in range(max(1, args.repeats)):
+                for name, result in run_once(args, video_path, wav_path).items():
+                    if name not in best or result['seconds'] < best[name]['seconds']:
+                        best[name] = result
+
+            results = {
+                'recorded_at': datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                'config': {key: getattr(args, key) for key in CONFIG_KEYS},
+                'environment': {
+                    'python': sys.version.split()[0],
+                    'platform': platform.platform(),
+                    'cpu_count': os.cpu_count(),
+                    'ffmpeg': find_ffmpeg() is not None,
+                    'audio_muxed': muxed
+                },
+                'generate_seconds': round(generate_seconds, 3),
+                'stages': best
+            }
+
+            if os.path.exists(args.baseline) and not args.update_baseline:
+                with open(args.baseline) as f:
+                    results['comparison'] = compare(results, json.load(f), args.tolerance, args.min_delta)
+
+            print(f"{args.seconds:.0f}s {args.width}x{args.height} @ {args.fps:g} fps, profile {args.profile}"
+                  f"{'' if muxed else ' (no ffmpeg: silent video, audio stages use the WAV)'}")
+            comparison = results.get('comparison') or {}
+            for name, result in best.items():
+                line = f"  {name:<32} {result['seconds']:9.3f}s  {result['status']:<11}"
+                if name in comparison.get('stages', {}):
+                    versus = comparison['stages'][name]
+                    line += f" {versus['ratio']:5.2f}x baseline{'  REGRESSION' if versus['regression'] else ''}"
+                if result.get('note'):
+                    line += f"  ({result['note']})"
+                print(line)
+            if comparison and not comparison['comparable']:
+                print(f"  Not compared with the baseline: {comparison['reason']}")
+
+            if args.json:
+                with open(args.json, "w") as f:
+                    json.dump(results, f, indent=2)
+            if args.update_baseline:
+                with open(args.baseline, "w") as f:
+                    json.dump(results, f, indent=2)
+                print(f"Baseline updated: {args.baseline}")
+        finally:
+            mock.stop()
+    finally:
+        workdir.cleanup()
+    if args.fail_on_regression and comparison.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
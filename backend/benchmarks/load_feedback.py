@@ -0,0 +1,165 @@
+"""
+Throughput, latency and template-fallback rate of the feedback path under concurrent load.
+
+Drives concurrent AIService.generate_ai_feedback calls (transcript digest, hedged
+requests, repair, optional streaming) against the mock OpenRouter, through
+settings.openrouter_base_url. The mock is started in-process unless --base-url
+points at one that is already running.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_feedback --jobs 60 --concurrency 12 --rate-429 0.1 --malformed 0.1
+    python -m benchmarks.load_feedback --stream --wrong-language 0.3 --json load.json
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+import numpy as np
+
+from benchmarks.mock_openrouter import MockOpenRouter, add_mock_arguments, mock_config_from_args
+from config.settings import settings
+
+LESSON_SENTENCES = [
+    "Today we continue with fractions and compare them using a common denominator.",
+    "Who can tell me what the denominator shows?",
+    "Write the example in your notebooks and try the next one with your partner.",
+    "Good, now explain to the class why one half is larger than one third.",
+    "Let us check the homework together before the short test."
+]
+
+
+def make_video_data(index: int, words: int) -> Dict[str, Any]:
+    """Synthetic lesson with a timed transcript of about ``words`` words"""
+    segments, count, start = [], 0, 0.0
+    while count < words:
+        text = LESSON_SENTENCES[(index + len(segments)) % len(LESSON_SENTENCES)]
+        segments.append({'start': start, 'end': start + 4.0, 'text': f" {text} ({index}.{len(segments)})"})
+        count += len(text.split()) + 1
+        start += 4.0
+    return {
+        'subject': "mathematics",
+        'theme': "fractions",
+        'language': "en",
+        'transcription': "".join(segment['text'] for segment in segments).strip(),
+        'transcript_segments': segments,
+        'technical_analysis': {},
+        'engagement_metrics': {}
+    }
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'p50': round(p50, 3), 'p90': round(p90, 3), 'p99': round(p99, 3), 'max': round(max(values), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--languages", default="en,ru,tj")
+    parser.add_argument("--transcript-words", type=int, default=2000, help="Long transcripts exercise the summary map-reduce")
+    parser.add_argument("--stream", action="store_true", help="Generate inside a FeedbackStream, as the pipeline does")
+    parser.add_argument("--hedge-delay", type=float, default=None, help="Override llm_hedge_default_delay (seconds)")
+    parser.add_argument("--base-url", default=None, help="Use a running mock instead of starting one")
+    parser.add_argument("--json", default=None, help="Write the report to this file")
+    parser.add_argument("--verbose", action="store_true")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    mock = None
+    if args.base_url is None:
+        mock = MockOpenRouter(mock_config_from_args(args)).start()
+    settings.openrouter_base_url = args.base_url or mock.base_url
+    settings.openrouter_api_key = settings.openrouter_api_key or "mock"
+    settings.feedback_streaming_enabled = args.stream
+    settings.llm_hedge_workers = max(settings.llm_hedge_workers, 2 * args.concurrency)
+    if args.hedge_delay is not None:
+        settings.llm_hedge_default_delay = args.hedge_delay
+    cache_dir = tempfile.TemporaryDirectory()
+    settings.transcript_summary_cache_dir = cache_dir.name  # Cold cache: every job summarizes
+    settings.metrics_dir = os.path.join(cache_dir.name, "metrics")
+    settings.trace_db_path = os.path.join(cache_dir.name, "traces.db")
+
+    # Imported after the settings above, which size the shared request pool
+    from services.ai_service import AIService
+    from services.feedback_stream import FeedbackStream
+
+    ai_service = AIService()
+    languages = args.languages.split(",")
+    template_strengths = {language: ai_service._get_template_feedback(language)['strengths'] for language in languages}
+
+    def run_job(index: int) -> Dict[str, Any]:
+        language = languages[index % len(languages)]
+        video_data = make_video_data(index, args.transcript_words)
+        started = time.perf_counter()
+        if args.stream:
+            with FeedbackStream(index, language):
+                feedback = ai_service.generate_ai_feedback(video_data, language)
+        else:
+            feedback = ai_service.generate_ai_feedback(video_data, language)
+        usage = feedback.get('llm_usage') or []
+        return {
+            'latency': time.perf_counter() - started,
+            'template': feedback.get('strengths') == template_strengths[language],
+            'calls': len(usage),
+            'repaired': any(entry['purpose'] == "feedback_repair" for entry in usage),
+            'first_token': [entry['first_token_latency'] for entry in usage if 'first_token_latency' in entry]
+        }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(run_job, range(args.jobs)))
+    wall = time.perf_counter() - started
+
+    report = {
+        'jobs': args.jobs,
+        'concurrency': args.concurrency,
+        'wall_seconds': round(wall, 2),
+        'throughput_jobs_per_second': round(args.jobs / wall, 3),
+        'latency_seconds': percentiles([result['latency'] for result in results]),
+        'first_token_seconds': percentiles([value for result in results for value in result['first_token']]),
+        'template_fallback_rate': round(sum(result['template'] for result in results) / args.jobs, 3),
+        'repair_rate': round(sum(result['repaired'] for result in results) / args.jobs, 3),
+        'llm_calls_per_job': round(sum(result['calls'] for result in results) / args.jobs, 2),
+        'mock_responses': dict(mock.stats) if mock else None,
+        'models': {
+            role: {
+                'model': health['model'],
+                'state': health['state'],
+                'latency_p90': health['latency'].get('feedback', {}).get('p90')
+            }
+            for role, health in ai_service.model_router.health().items()
+        }
+    }
+
+    print(f"{args.jobs} jobs, concurrency {args.concurrency}: {wall:.1f}s, {report['throughput_jobs_per_second']:.2f} jobs/s")
+    for name in ('latency_seconds', 'first_token_seconds'):
+        if report[name]:
+            print(f"  {name:<22} " + "  ".join(f"{key} {value:.2f}" for key, value in report[name].items()))
+    print(f"  template fallback rate {report['template_fallback_rate']:.1%}, repair rate {report['repair_rate']:.1%}, "
+          f"{report['llm_calls_per_job']:.1f} LLM calls/job")
+    if mock:
+        print(f"  mock responses         {report['mock_responses']}")
+    for role, health in report['models'].items():
+        print(f"  {role:<10} {health['model']:<40} {health['state']:<10} p90 {health['latency_p90']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if mock:
+        mock.stop()
+    cache_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
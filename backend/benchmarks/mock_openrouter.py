@@ -0,0 +1,317 @@
+"""
+Local stand-in for the OpenRouter chat-completions API, for load tests without quota or real rate limits.
+
+Answers feedback, repair, transcript-summary and vision requests with plausible
+content in the requested language, with configurable latency and injected
+failures: 429s, 5xx errors, malformed JSON and wrong-language sections. Both
+plain and streamed (stream: true) completions are supported.
+
+Run from the backend directory and point the backend at it:
+
+    python -m benchmarks.mock_openrouter --port 8999 --latency lognormal:2.0:0.5 --rate-429 0.1
+    OPENROUTER_BASE_URL=http://127.0.0.1:8999 OPENROUTER_API_KEY=mock uvicorn main:app
+
+GET /stats returns the number of responses per outcome.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional, Tuple
+
+SECTIONS = {
+    "en": {
+        "strengths": "The teacher introduces the topic with a clear goal and connects it to what students learned before. "
+                     "Examples on the board are worked step by step, and key terms are repeated and checked.",
+        "areas_for_improvement": "Most questions are answered by the same few students, and the pace leaves little time "
+                                 "to practise. Instructions for the group task could be shorter and written on the board.",
+        "specific_recommendations": "1. Use cold calling with wait time so more students answer. 2. Add a two-minute "
+                                    "pair task after each example. 3. Close the lesson with an exit ticket."
+    },
+    "ru": {
+        "strengths": "Учитель начинает урок с ясной цели и связывает тему с тем, что ученики изучали раньше. "
+                     "Примеры на доске разбираются пошагово, ключевые термины повторяются и проверяются.",
+        "areas_for_improvement": "На большинство вопросов отвечают одни и те же ученики, а темп оставляет мало времени "
+                                 "на практику. Инструкции к групповой работе стоит сократить и записать на доске.",
+        "specific_recommendations": "1. Вызывайте учеников без поднятой руки и давайте время подумать. 2. Добавьте "
+                                    "работу в парах после каждого примера. 3. Завершайте урок карточкой выхода."
+    },
+    "tj": {
+        "strengths": "Муаллим дарсро бо мақсади равшан оғоз мекунад ва мавзӯъро бо донишҳои пештараи хонандагон мепайвандад. "
+                     "Мисолҳо дар тахта қадам ба қадам ҳал карда мешаванд.",
+        "areas_for_improvement": "Ба аксари саволҳо ҳамон чанд хонанда ҷавоб медиҳанд ва барои машқ вақт кам мемонад. "
+                                 "Дастурҳои кори гурӯҳӣ бояд кӯтоҳтар бошанд.",
+        "specific_recommendations": "1. Хонандагонро бе дасти бардошта пурсед ва вақти фикр диҳед. 2. Пас аз ҳар мисол "
+                                    "кори ҷуфтиро илова кунед. 3. Дарсро бо варақаи хуруҷ анҷом диҳед."
+    }
+}
+
+SUMMARY = ("The teacher reviews the previous lesson, explains the new rule with two worked examples on the board, "
+           "asks several questions that a few students answer, and sets a short exercise in pairs.")
+VISION = "The board shows a worked example with a diagram. Students sit in rows facing the board."
+
+
+def parse_latency(spec: str):
+    """
+    Latency sampler from a spec string
+
+    Args:
+        spec: fixed:SECONDS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA
+
+    Returns:
+        Function of a random.Random returning seconds
+    """
+    kind, *values = spec.split(":")
+    values = [float(value) for value in values]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockConfig:
+    """Latency and failure injection settings; rates are probabilities per request"""
+
+    def __init__(
+        self,
+        latency: str = "lognormal:1.5:0.5",
+        model_latency: Optional[Dict[str, str]] = None,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        malformed: float = 0.0,
+        wrong_language: float = 0.0,
+        model_failure: Optional[Dict[str, float]] = None,
+        first_token_fraction: float = 0.15,
+        seed: Optional[int] = None
+    ):
+        self.latency = parse_latency(latency)
+        self.model_latency = {model: parse_latency(spec) for model, spec in (model_latency or {}).items()}
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.malformed = malformed
+        self.wrong_language = wrong_language
+        self.model_failure = model_failure or {}  # Model -> rate of 503s, e.g. 1.0 for a model that is down
+        self.first_token_fraction = first_token_fraction
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample_latency(self, model: str) -> float:
+        with self.lock:  # The shared RNG is not thread-safe
+            return max(0.0, self.model_latency.get(model, self.latency)(self.rng))
+
+    def random(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+
+def _language(messages: List[Dict[str, Any]]) -> str:
+    text = " ".join(m["content"] for m in messages if isinstance(m.get("content"), str))
+    if "in Tajik" in text:
+        return "tj"
+    if "in Russian" in text:
+        return "ru"
+    return "en"
+
+
+def _requested_fields(prompt: str) -> List[str]:
+    """Keys asked for by a repair prompt"""
+    requests = prompt.split("For consistency")[0]
+    return re.findall(r'^"(\w+)":', requests, re.MULTILINE)
+
+
+class MockOpenRouter:
+    """Threaded HTTP server answering POST /chat/completions like OpenRouter"""
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.stats: Dict[str, int] = {}
+        self.stats_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOpenRouter":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-openrouter", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, outcome: str):
+        with self.stats_lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[int, Optional[str], str]:
+        """(status, content or None, outcome) for one request"""
+        config = self.config
+        if config.random() < config.model_failure.get(body.get("model", ""), 0.0):
+            return 503, None, "model_down"
+        draw = config.random()
+        if draw < config.rate_429:
+            return 429, None, "429"
+        if draw < config.rate_429 + config.rate_5xx:
+            return (500, 502, 503)[int(config.random() * 3)], None, "5xx"
+
+        messages = body.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        language = _language(messages)
+        if not isinstance(prompt, str):
+            return 200, VISION, "vision"
+        if "had missing or invalid fields" in prompt:
+            values = {field: SECTIONS[language].get(field, 7.5) for field in _requested_fields(prompt)}
+            return 200, json.dumps(values, ensure_ascii=False), "repair"
+        if "Transcript excerpt" in prompt:
+            return 200, SUMMARY, "summary"
+
+        sections = dict(SECTIONS[language])
+        outcome = "feedback"
+        draw = config.random()
+        if draw < config.wrong_language:
+            # One section in the wrong script, as free models tend to do
+            sections["strengths"] = SECTIONS["en" if language != "en" else "ru"]["strengths"]
+            outcome = "wrong_language"
+        feedback = {"teaching_quality_score": 7.5, "student_engagement_score": 6.5, "overall_score": 7.0, **sections}
+        content = "```json\n" + json.dumps(feedback, ensure_ascii=False, indent=2) + "\n```"
+        if config.wrong_language <= draw < config.wrong_language + config.malformed:
+            # Cut off mid-way, like a completion that hit max_tokens
+            content = content[:int(len(content) * (0.3 + 0.6 * config.random()))]
+            outcome = "malformed"
+        return 200, content, outcome
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    with mock.stats_lock:
+                        self._send_json(200, dict(mock.stats))
+                else:
+                    self._send_json(404, {"error": {"message": "Not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+                latency = mock.config.sample_latency(body.get("model", ""))
+                status, content, outcome = mock.respond(body)
+                mock.count(outcome)
+
+                if status != 200:
+                    time.sleep(min(latency, 0.5))  # Errors come back quickly
+                    headers = {"Retry-After": "5"} if status == 429 else {}
+                    self._send_json(status, {"error": {"code": status, "message": outcome}}, headers)
+                    return
+                prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4}
+                if body.get("stream"):
+                    self._stream(body.get("model"), content, usage, latency)
+                else:
+                    time.sleep(latency)
+                    self._send_json(200, {
+                        "id": "mock", "model": body.get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                        "usage": usage
+                    })
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model: str, content: str, usage: Dict[str, int], latency: float):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = [content[i:i + 16] for i in range(0, len(content), 16)] or [""]
+                first_token = latency * mock.config.first_token_fraction
+                self._chunk(": OPENROUTER PROCESSING\n\n")
+                time.sleep(first_token)
+                interval = (latency - first_token) / len(pieces)
+                for piece in pieces:
+                    delta = {"id": "mock", "model": model, "choices": [{"index": 0, "delta": {"content": piece}}]}
+                    self._chunk(f"data: {json.dumps(delta, ensure_ascii=False)}\n\n")
+                    time.sleep(interval)
+                self._chunk(f"data: {json.dumps({'id': 'mock', 'choices': [], 'usage': usage})}\n\n")
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, text: str):
+                data = text.encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+        return Handler
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default="lognormal:1.5:0.5", help="fixed:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SPEC",
+                        help="Latency distribution for one model")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--malformed", type=float, default=0.0, help="Rate of truncated feedback JSON")
+    parser.add_argument("--wrong-language", type=float, default=0.0, help="Rate of feedback with a section in the wrong language")
+    parser.add_argument("--model-failure", action="append", default=[], metavar="MODEL=RATE",
+                        help="Rate of 503s for one model (1.0 = down)")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def mock_config_from_args(args) -> MockConfig:
+    return MockConfig(
+        latency=args.latency,
+        model_latency=dict(item.split("=", 1) for item in args.model_latency),
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        malformed=args.malformed,
+        wrong_language=args.wrong_language,
+        model_failure={model: float(rate) for model, rate in (item.split("=", 1) for item in args.model_failure)},
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = MockOpenRouter(mock_config_from_args(args), args.host, args.port)
+    print(f"Mock OpenRouter listening on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
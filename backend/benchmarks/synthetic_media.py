@@ -0,0 +1,153 @@
+"""
+Synthetic classroom videos for benchmarks: a board with changing slides, moving
+figures and a camera that drifts, plus a tone or speech-like audio track.
+
+Video is written with cv2.VideoWriter. The audio track is muxed in with ffmpeg
+when one is available (on PATH or from imageio-ffmpeg); otherwise the video is
+silent and the WAV is returned next to it.
+"""
+import math
+import os
+import shutil
+import subprocess
+import wave
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def make_classroom_video(path: str, seconds: float, width: int = 1280, height: int = 720, fps: float = 25.0, seed: int = 0):
+    """
+    Write a silent synthetic lesson video
+
+    Args:
+        path: Output .mp4 path
+        seconds: Length of the video
+        width: Frame width
+        height: Frame height
+        fps: Frames per second
+        seed: Random seed, so runs are reproducible
+    """
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+
+    # Wall texture, larger than the frame so the camera can drift over it
+    margin = max(16, width // 40)
+    wall = cv2.GaussianBlur(
+        rng.integers(150, 200, (height + 2 * margin, width + 2 * margin, 3), dtype=np.uint8), (15, 15), 0
+    )
+    board = (int(width * 0.2), int(height * 0.1), int(width * 0.8), int(height * 0.5))
+    students = [
+        (rng.uniform(0.05, 0.95) * width, rng.uniform(0.6, 0.9) * height, rng.uniform(0, 2 * math.pi))
+        for _ in range(12)
+    ]
+    colors = [tuple(int(c) for c in rng.integers(40, 220, 3)) for _ in students]
+
+    total = int(seconds * fps)
+    for index in range(total):
+        t = index / fps
+        dx = int(margin + margin * 0.8 * math.sin(t * 0.3))
+        dy = int(margin + margin * 0.5 * math.cos(t * 0.2))
+        frame = np.ascontiguousarray(wall[dy:dy + height, dx:dx + width])
+
+        # Board with a new slide every 20 seconds
+        cv2.rectangle(frame, board[:2], board[2:], (40, 70, 40), -1)
+        slide = int(t // 20)
+        for line in range(4):
+            y = board[1] + (line + 1) * (board[3] - board[1]) // 5
+            text = f"Slide {slide + 1}: {(slide * 7 + line * 3) % 10} / {(slide + line) % 9 + 1}"
+            cv2.putText(frame, text, (board[0] + 20, y), cv2.FONT_HERSHEY_SIMPLEX, height / 720, (230, 230, 230), 2)
+
+        # Teacher walking along the board
+        teacher_x = int(width * (0.5 + 0.35 * math.sin(t * 0.4)))
+        cv2.ellipse(frame, (teacher_x, int(height * 0.55)), (width // 40, height // 7), 0, 0, 360, (60, 60, 140), -1)
+        cv2.circle(frame, (teacher_x, int(height * 0.38)), width // 60, (140, 170, 210), -1)
+
+        # Students fidgeting in their seats
+        for (x, y, phase), color in zip(students, colors):
+            offset = 6 * math.sin(t * 1.5 + phase)
+            cv2.circle(frame, (int(x + offset), int(y)), width // 70, color, -1)
+
+        writer.write(frame)
+    writer.release()
+
+
+def make_lesson_audio(path: str, seconds: float, kind: str = "speech", seed: int = 0):
+    """
+    Write a mono 16 kHz WAV track
+
+    Args:
+        path: Output .wav path
+        seconds: Length of the track
+        kind: "tone" for a steady 440 Hz tone, "speech" for voiced syllables with pauses over room noise
+        seed: Random seed
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    if kind == "tone":
+        signal = 0.3 * np.sin(2 * math.pi * 440.0 * t)
+    else:
+        # Harmonics of a slowly gliding pitch, gated into ~4 syllables per second with phrase pauses
+        pitch = 150.0 + 40.0 * np.sin(2 * math.pi * 0.5 * t)
+        phase = 2 * math.pi * np.cumsum(pitch) / SAMPLE_RATE
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+        syllables = np.clip(np.sin(2 * math.pi * 4.0 * t), 0.0, None) ** 2
+        phrases = (np.sin(2 * math.pi * 0.2 * t + rng.uniform(0, 2 * math.pi)) > -0.6).astype(float)
+        signal = 0.25 * voiced * syllables * phrases
+    signal = signal + 0.01 * rng.standard_normal(len(t))
+    samples = (np.clip(signal, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+
+
+def find_ffmpeg() -> Optional[str]:
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def make_test_video(
+    directory: str,
+    seconds: float,
+    width: int = 1280,
+    height: int = 720,
+    fps: float = 25.0,
+    audio: str = "speech",
+    seed: int = 0
+) -> Tuple[str, str, bool]:
+    """
+    Generate a synthetic lesson with an audio track
+
+    Returns:
+        (video path, WAV path, whether the audio was muxed into the video)
+    """
+    silent_path = os.path.join(directory, "lesson_silent.mp4")
+    wav_path = os.path.join(directory, "lesson.wav")
+    video_path = os.path.join(directory, "lesson.mp4")
+    make_classroom_video(silent_path, seconds, width, height, fps, seed)
+    make_lesson_audio(wav_path, seconds, audio, seed)
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        os.replace(silent_path, video_path)
+        return video_path, wav_path, False
+    subprocess.run(
+        [ffmpeg, "-y", "-loglevel", "error", "-i", silent_path, "-i", wav_path,
+         "-c:v", "copy", "-c:a", "aac", "-shortest", video_path],
+        check=True
+    )
+    os.remove(silent_path)
+    return video_path, wav_path, True
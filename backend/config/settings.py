@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
 
 
@@ -20,13 +20,92 @@ class Settings(BaseSettings):
     
     # File Storage
     upload_dir: str = "media/uploads"
+    series_dir: str = "media/series"  # Per-frame analysis series (.npy sidecars)
+    keyframe_dir: str = "media/keyframes"  # Keyframe thumbnails, one directory per video
     max_file_size: str = "500MB"
     allowed_video_extensions: List[str] = ["mp4", "avi", "mov", "wmv", "flv", "webm"]
     
     # AI Model Settings
     whisper_model: str = "base"
     confidence_threshold: float = 0.7
-    
+
+    # Model Server Settings (one shared Whisper process per host)
+    model_server_enabled: bool = True
+    model_server_socket: str = "media/model_server.sock"
+    model_server_start_timeout: float = 120.0
+    model_server_workers: int = 2  # Concurrent transcriptions served by the model
+    model_server_log: str = "media/model_server.log"  # The server's stdout and stderr
+    model_server_idle_exit: float = 30.0  # Seconds the server keeps running after the last API process using it exits
+    model_warm_up: bool = True  # Load models in a background thread at startup
+
+    # Video Analysis Settings
+    video_analysis_profile: str = "standard"  # fast, standard or detailed
+    video_sample_interval: Optional[float] = None  # Seconds between analyzed frames (overrides the profile)
+    video_seek_threshold: float = 4.0  # Seek instead of grabbing across gaps this long (seconds)
+    video_adaptive_sampling: bool = True  # Skip near-identical frames, sample densely on change
+    video_min_sample_rate: float = 0.2  # Frames per second analyzed even in static footage
+    video_max_sample_rate: Optional[float] = None  # Frames per second probed during activity (None = 1 / sample interval)
+    video_scene_change_threshold: float = 0.01  # Fraction of thumbnail pixels that must change
+    video_analysis_width: int = 960  # Frames are downscaled to this width before analysis (0 = full size)
+    video_analysis_workers: int = 0  # Worker processes for segment-parallel analysis (0 = CPU count)
+    video_segment_min_seconds: float = 30.0  # Shortest time range handed to a worker
+    video_timeline_max_points: int = 16384  # Per-frame series are downsampled to at most this many rows
+    video_max_engagement_periods: int = 200  # Longest attention periods kept in the results
+
+    # Keyframes (distinct board/slide/classroom frames for the vision model)
+    keyframe_max_per_video: int = 8
+    keyframe_hash_distance: int = 10  # Perceptual hashes within this many bits are duplicates
+    keyframe_width: int = 480  # Thumbnail width in pixels
+    keyframe_jpeg_quality: int = 80
+    vision_feedback_enabled: bool = False  # Describe keyframes with the vision model for the feedback prompt
+    vision_max_images: int = 4  # Keyframes sent in the single vision request
+
+    # Transcript digest (map-reduce summarization for the feedback prompt)
+    transcript_budget_tokens: int = 1500  # Transcript share of the feedback prompt
+    transcript_chunk_tokens: int = 1500  # Transcript tokens per summarized chunk
+    transcript_summary_concurrency: int = 4  # Chunk summaries requested in parallel
+    transcript_summary_cache_dir: str = "media/summaries"
+
+    # LLM token budgeting
+    llm_context_tokens: int = 8192  # Smallest context window among the models in use
+    feedback_max_tokens: int = 3000  # Completion tokens requested for feedback
+    tokenizer_encoding: str = "cl100k_base"  # tiktoken encoding used to count tokens locally
+    token_safety_margin: float = 0.1  # Added to local counts; model tokenizers differ slightly
+
+    # OpenRouter routing (hedged requests and circuit breakers)
+    llm_hedge_default_delay: float = 20.0  # Hedge delay until a model has enough latency samples
+    llm_hedge_min_delay: float = 5.0  # Bounds for the p90-based hedge delay
+    llm_hedge_max_delay: float = 45.0
+    llm_hedge_workers: int = 8  # Threads shared by all in-flight LLM requests of a race
+    llm_latency_window: int = 50  # Recent successful latencies kept per model
+    llm_latency_min_samples: int = 5  # Samples needed before the p90 is trusted
+    llm_breaker_failure_threshold: int = 3  # Consecutive failures that open a model's circuit
+    llm_breaker_reset_seconds: float = 60.0  # How long an open circuit skips the model before a trial request
+    llm_feedback_rounds: int = 2  # Races over the feedback models before using the template
+    llm_retry_delay: float = 2.0  # Pause between races, plus jitter
+
+    # Feedback streaming (SSE)
+    feedback_streaming_enabled: bool = True  # Request feedback with stream: true and relay sections as they arrive
+    feedback_stream_interval: float = 0.25  # Minimum seconds between section updates sent to clients
+    feedback_stream_keepalive: float = 15.0  # Seconds between SSE keep-alive comments
+
+    # Metrics (/metrics, merged from per-process snapshot files)
+    metrics_enabled: bool = True
+    metrics_dir: str = "media/metrics"  # Snapshot file of every API and pipeline process on the host
+    metrics_flush_interval: float = 5.0  # Seconds between snapshot writes of a process with new values
+
+    # Tracing (per-job spans, served as a waterfall by /trace/{video_id})
+    tracing_enabled: bool = True
+    trace_db_path: str = "media/traces.db"  # Local SQLite span store shared by all processes on the host
+    trace_retention_days: float = 7.0  # Spans older than this are deleted when new traces are written (0 = keep)
+
+    # Sampling profiler (opt-in, per job)
+    profiler_sample_rate: float = 0.0  # Fraction of pipeline runs profiled, e.g. 0.01; uploads can also ask with profile=true
+    profiler_interval: float = 0.01  # Seconds between stack samples
+    profiler_max_overhead: float = 0.01  # Sampling slows down whenever its cost exceeds this fraction of the job's time
+    profile_dir: str = "media/profiles"  # Collapsed stacks and overhead report, one pair per video
+    admin_token: str = ""  # Required in the X-Admin-Token header of /admin endpoints; they are disabled while empty
+
     # Translation Settings
     default_languages: List[str] = ["en", "ru", "tj"]
     
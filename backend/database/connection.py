@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 from config.settings import settings
@@ -44,12 +44,33 @@ def create_tables():
         # Import models here to ensure they're registered with Base
         from models.database import Base, VideoAnalysis, AIFeedback, ProcessingTask
         Base.metadata.create_all(bind=engine)
+        _add_missing_columns(Base)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
         raise
 
 
+def _add_missing_columns(base):
+    """
+    Add nullable columns introduced after a table was first created
+
+    create_all only creates missing tables, so existing databases would
+    otherwise lack newer columns.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    logger.info(f"Added column {table.name}.{column.name}")
+
+
 def drop_tables():
     """
     Drop all database tables (use with caution!)
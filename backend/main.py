@@ -1,14 +1,17 @@
 import os
 import shutil
 import logging
-from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, HTTPException, Depends, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse
 from sqlalchemy.orm import Session
 from typing import Optional
+from contextlib import contextmanager
 from datetime import datetime
 import json
 import time
+import threading
+import secrets
 
 from config.settings import settings
 from database.connection import get_db, create_tables, SessionLocal
@@ -16,6 +19,10 @@ from models.database import VideoAnalysis, AIFeedback, Base
 from schemas.requests import VideoUploadRequest, LanguageEnum, SubjectEnum
 from schemas.responses import VideoUploadResponse, ProcessingStatusResponse, StatusEnum, ErrorResponse
 from services.ai_service import AIService
+from services.feedback_stream import FeedbackStream, feedback_broker
+from services.metrics import metrics
+from services.tracing import start_trace, span, trace_commits, load_waterfall, format_waterfall
+from services.profiler import profile_job, profile_stage, load_profile_report, collapsed_profile_path, list_profiles
 
 logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger(__name__)
@@ -31,9 +38,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize AI service
+# Every commit made during a traced pipeline run shows up as a db.commit span
+trace_commits(SessionLocal)
+
+# Initialize AI service (models are loaded lazily or by the background warm-up)
 ai_service = AIService()
 
+# One VideoAnalyzer per pipeline thread; MediaPipe graphs are not thread-safe
+_video_analyzers = threading.local()
+
+def get_video_analyzer():
+    analyzer = getattr(_video_analyzers, "analyzer", None)
+    if analyzer is None:
+        with span("video.analyzer_init"):
+            from services.video_analyzer import VideoAnalyzer
+            analyzer = _video_analyzers.analyzer = VideoAnalyzer()
+    return analyzer
+
 # Initialize database tables
 @app.on_event("startup")
 async def startup_event():
@@ -43,6 +64,79 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
+    
+    # Warm up models without blocking the HTTP tier from accepting requests
+    if settings.model_warm_up:
+        threading.Thread(target=ai_service.warm_up, name="model-warm-up", daemon=True).start()
+
+@app.get("/ready")
+def get_readiness():
+    """
+    Report which AI models are warm; 503 until every available one is
+
+    Models that are not configured or not installed never load, so they do not
+    block readiness. Without warm-up, models load on first use and are not waited for.
+    """
+    models = ai_service.model_status()
+    unavailable = ai_service.unavailable_models()
+    ready = not settings.model_warm_up or all(
+        loaded for name, loaded in models.items() if name not in unavailable
+    )
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": models, "unavailable": unavailable}
+    )
+
+@app.get("/models/health")
+def get_models_health():
+    """Circuit breaker state and recent latency of each OpenRouter model"""
+    return {"models": ai_service.model_router.health()}
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of the metrics of every API and pipeline process on this host"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/trace/{video_id}")
+def get_trace(video_id: int, format: str = Query("json", pattern="^(json|text)$")):
+    """Waterfall of the latest pipeline run of a video: stages, frame segments, LLM attempts, HTTP calls and commits"""
+    waterfall = load_waterfall(video_id)
+    if waterfall is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this video")
+    if format == "text":
+        return PlainTextResponse(format_waterfall(waterfall))
+    return waterfall
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Admin endpoints stay closed until a token is configured
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def get_profiles():
+    """Overhead reports of the stored job profiles, newest first"""
+    return {"profiles": list_profiles()}
+
+@app.get("/admin/profiles/{video_id}", dependencies=[Depends(require_admin)])
+def get_profile(video_id: int, format: str = Query("collapsed", pattern="^(collapsed|json)$")):
+    """
+    Collapsed stacks of a profiled job, for flamegraph.pl or speedscope; format=json for the overhead report
+
+    Samples cover the pipeline thread and the video analysis segment workers (stage label
+    suffixed with /worker). Other threads the job hands work to, such as LLM hedging and
+    transcript summaries, show up as the pipeline thread waiting on them.
+    """
+    report = load_profile_report(video_id)
+    path = collapsed_profile_path(video_id)
+    if report is None or path is None:
+        raise HTTPException(status_code=404, detail="No profile recorded for this video")
+    if format == "json":
+        return report
+    return FileResponse(path, media_type="text/plain", filename=f"profile-{video_id}.collapsed")
 
 @app.post("/upload-video", response_model=VideoUploadResponse)
 def upload_video(
@@ -52,6 +146,7 @@ def upload_video(
     theme: str = Form(...),
     language: LanguageEnum = Form(...),
     feedback_language: LanguageEnum = Form(...),
+    profile: bool = Form(False),
     db: Session = Depends(get_db)
 ):
     try:
@@ -81,7 +176,8 @@ def upload_video(
         db.refresh(video)
 
         # Start background processing with feedback language
-        background_tasks.add_task(process_video_pipeline, video.id, feedback_language.value)
+        background_tasks.add_task(_run_queued_pipeline, video.id, feedback_language.value, profile)
+        metrics.add('effectiveclass_pipeline_queue_depth', 1)
 
         return VideoUploadResponse(
             id=video.id,
@@ -97,11 +193,33 @@ def upload_video(
         logger.error(f"Error in upload_video: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-def process_video_pipeline(video_id: int, feedback_language: str):
+def _run_queued_pipeline(video_id: int, feedback_language: str, profile: bool = False):
+    """Background task for an upload: leaves the queue when a worker picks it up"""
+    metrics.add('effectiveclass_pipeline_queue_depth', -1)
+    process_video_pipeline(video_id, feedback_language, profile)
+
+@contextmanager
+def _stage(name: str):
+    """A pipeline stage: a trace span, a duration histogram observation and a profiler label"""
+    with span(name), metrics.time_stage(name), profile_stage(name):
+        yield
+
+def process_video_pipeline(video_id: int, feedback_language: str, profile: bool = False):
     """
-    Complete AI processing pipeline for video analysis
+    Complete AI processing pipeline for video analysis, traced as one trace per run
+
+    Sampled by the profiler when profile is set, or for settings.profiler_sample_rate of runs
     """
+    with start_trace("process_video_pipeline", video_id=video_id, feedback_language=feedback_language) as root:
+        with profile_job(video_id, forced=profile) as profiler:
+            root.set('profiled', profiler is not None)
+            _run_pipeline(video_id, feedback_language)
+
+def _run_pipeline(video_id: int, feedback_language: str):
     db = SessionLocal()
+    metrics.add('effectiveclass_pipeline_jobs_in_flight', 1)
+    started = time.perf_counter()
+    outcome = "failed"
     try:
         logger.info(f"[Pipeline] Start processing video_id={video_id}")
         
@@ -109,6 +227,7 @@ def process_video_pipeline(video_id: int, feedback_language: str):
         video = db.query(VideoAnalysis).filter(VideoAnalysis.id == video_id).first()
         if not video:
             logger.error(f"Video not found: {video_id}")
+            outcome = "not_found"
             return
         
         video.status = StatusEnum.PROCESSING.value
@@ -117,30 +236,79 @@ def process_video_pipeline(video_id: int, feedback_language: str):
         
         # Step 1: Audio Extraction
         logger.info(f"[Pipeline] Step 1: Audio extraction for video_id={video_id}")
-        audio_path = ai_service.extract_audio_from_video(video.video_path)
+        with _stage("audio_extraction"):
+            audio_path = ai_service.extract_audio_from_video(video.video_path)
         if audio_path:
             video.audio_path = audio_path
             db.commit()
         
         # Step 2: Transcription
         logger.info(f"[Pipeline] Step 2: Transcription for video_id={video_id}")
-        transcription_result = ai_service.transcribe_audio(audio_path or video.video_path, video.language)
+        with _stage("transcription"):
+            transcription_result = ai_service.transcribe_audio(audio_path or video.video_path, video.language)
         if transcription_result:
             video.transcription = transcription_result.get('text', '')
             db.commit()
         
-        # Step 3: Video Analysis (placeholder for now)
+        # Step 3: Video Analysis
         logger.info(f"[Pipeline] Step 3: Video analysis for video_id={video_id}")
-        # TODO: Implement video analysis with OpenCV/MediaPipe
+        with _stage("video_analysis"):
+            analysis_result = get_video_analyzer().analyze_video(video.video_path) or {}
+        technical_analysis = analysis_result.get('technical_analysis', {})
+        engagement_metrics = analysis_result.get('engagement_metrics', {})
+        
+        # Audio quality comes from the PCM decoded for transcription; re-read the WAV only if that was unavailable
+        audio_metrics = (transcription_result or {}).get('audio_metrics')
+        if not audio_metrics and audio_path:
+            from services.audio_metrics import analyze_wav
+            with _stage("audio_metrics"):
+                audio_metrics = analyze_wav(audio_path)
+        if audio_metrics:
+            technical_analysis['audio_quality_score'] = audio_metrics['audio_quality_score']
+            technical_analysis['audio_analysis'] = audio_metrics
+        
+        # Per-frame series go to a columnar sidecar file; the JSON columns keep a small summary
+        video.face_detection_data = json.dumps({
+            'face_detection_count': engagement_metrics.get('face_detection_count', 0),
+            'people_detected': engagement_metrics.get('people_detected', 0)
+        })
+        video.motion_analysis_data = json.dumps({
+            'motion_activity_score': engagement_metrics.get('motion_activity_score', 0.0),
+            'camera_motion_avg': technical_analysis.get('camera_motion_avg', 0.0),
+            'camera_stability_score': technical_analysis.get('camera_stability_score', 0.0)
+        })
+        with _stage("sidecar_writes"):
+            if analysis_result.get('frame_series') is not None:
+                from services.frame_series import save_frame_series
+                from services.timeline_pyramid import save_timeline_pyramid
+                video.frame_series_path = save_frame_series(video_id, analysis_result['frame_series'])
+                save_timeline_pyramid(video_id, analysis_result['frame_series'])
+            keyframes = None
+            if analysis_result.get('keyframes'):
+                from services.keyframes import save_keyframes
+                keyframes = save_keyframes(video_id, analysis_result['keyframes'])
+                technical_analysis['keyframes'] = keyframes
+        if keyframes and settings.vision_feedback_enabled:
+            with _stage("keyframe_description"):
+                technical_analysis['visual_observations'] = ai_service.describe_keyframes(
+                    [keyframe['path'] for keyframe in keyframes]
+                )
+        video.engagement_metrics = json.dumps(engagement_metrics)
+        db.commit()
         
         # Step 4: AI Feedback Generation
         logger.info(f"[Pipeline] Step 4: AI feedback generation for video_id={video_id}")
-        generate_ai_feedback(video_id, db, video, feedback_language)
+        with _stage("feedback"):
+            generate_ai_feedback(
+                video_id, db, video, feedback_language, technical_analysis, engagement_metrics,
+                (transcription_result or {}).get('segments')
+            )
         
         # Update status to completed
         video.status = StatusEnum.COMPLETED.value
         video.updated_at = datetime.utcnow()
         db.commit()
+        outcome = "completed"
         
         logger.info(f"[Pipeline] Completed processing video_id={video_id}")
         
@@ -154,8 +322,19 @@ def process_video_pipeline(video_id: int, feedback_language: str):
             db.commit()
     finally:
         db.close()
+        metrics.observe('effectiveclass_stage_duration_seconds', time.perf_counter() - started, {'stage': "pipeline"})
+        metrics.inc('effectiveclass_pipeline_jobs_total', {'outcome': outcome})
+        metrics.add('effectiveclass_pipeline_jobs_in_flight', -1)
 
-def generate_ai_feedback(video_id: int, db: Session, video: VideoAnalysis, feedback_language: str):
+def generate_ai_feedback(
+    video_id: int,
+    db: Session,
+    video: VideoAnalysis,
+    feedback_language: str,
+    technical_analysis: Optional[dict] = None,
+    engagement_metrics: Optional[dict] = None,
+    transcript_segments: Optional[list] = None
+):
     """Generate AI feedback for the specific language of the video"""
     try:
         # Prepare video data for AI analysis
@@ -163,25 +342,17 @@ def generate_ai_feedback(video_id: int, db: Session, video: VideoAnalysis, feedb
             'subject': video.subject,
             'theme': video.theme,
             'transcription': video.transcription or '',
-            'language': video.language
+            'language': video.language,
+            'technical_analysis': technical_analysis or {},
+            'engagement_metrics': engagement_metrics or {},
+            'transcript_segments': transcript_segments or []
         }
         
-        # Generate feedback only for the video's language
-        feedback = ai_service.generate_ai_feedback(video_data, feedback_language)
-        
-        ai_feedback = AIFeedback(
-            video_analysis_id=video_id,
-            language=feedback_language,
-            teaching_quality_score=feedback.get('teaching_quality_score', 7.5),
-            student_engagement_score=feedback.get('student_engagement_score', 6.5),
-            overall_score=feedback.get('overall_score', 7.0),
-            strengths=feedback.get('strengths', 'Good teaching structure and clear explanations.'),
-            areas_for_improvement=feedback.get('areas_for_improvement', 'Consider adding more interactive elements.'),
-            specific_recommendations=feedback.get('specific_recommendations', 'Include more student participation opportunities.'),
-            technical_analysis=json.dumps(feedback.get('technical_analysis', {}))
-        )
-        db.add(ai_feedback)
-        db.commit()
+        with FeedbackStream(video_id, feedback_language) as stream:
+            # Generate feedback only for the video's language; sections are streamed to /feedback-stream clients
+            feedback = ai_service.generate_ai_feedback(video_data, feedback_language)
+            ai_feedback = _save_feedback(db, video_id, feedback_language, feedback, technical_analysis)
+            stream.publish("feedback", _feedback_payload(ai_feedback))
         
         logger.info(f"Generated AI feedback for video_id={video_id}, language={feedback_language}")
         
@@ -189,6 +360,40 @@ def generate_ai_feedback(video_id: int, db: Session, video: VideoAnalysis, feedb
         logger.error(f"Error generating AI feedback: {str(e)}")
         db.rollback()  # Rollback any pending transaction
 
+def _save_feedback(
+    db: Session, video_id: int, feedback_language: str, feedback: dict, technical_analysis: Optional[dict]
+) -> AIFeedback:
+    """Persist the final parsed feedback"""
+    ai_feedback = AIFeedback(
+        video_analysis_id=video_id,
+        language=feedback_language,
+        teaching_quality_score=feedback.get('teaching_quality_score', 7.5),
+        student_engagement_score=feedback.get('student_engagement_score', 6.5),
+        overall_score=feedback.get('overall_score', 7.0),
+        strengths=feedback.get('strengths', 'Good teaching structure and clear explanations.'),
+        areas_for_improvement=feedback.get('areas_for_improvement', 'Consider adding more interactive elements.'),
+        specific_recommendations=feedback.get('specific_recommendations', 'Include more student participation opportunities.'),
+        technical_analysis=json.dumps(dict(
+            feedback.get('technical_analysis') or technical_analysis or {},
+            llm_usage=feedback.get('llm_usage', [])
+        ))
+    )
+    db.add(ai_feedback)
+    db.commit()
+    return ai_feedback
+
+def _feedback_payload(feedback: AIFeedback) -> dict:
+    return {
+        "language": feedback.language,
+        "teaching_quality_score": feedback.teaching_quality_score,
+        "student_engagement_score": feedback.student_engagement_score,
+        "overall_score": feedback.overall_score,
+        "strengths": feedback.strengths,
+        "areas_for_improvement": feedback.areas_for_improvement,
+        "specific_recommendations": feedback.specific_recommendations,
+        "technical_analysis": json.loads(feedback.technical_analysis) if feedback.technical_analysis else {}
+    }
+
 @app.get("/status/{video_id}", response_model=ProcessingStatusResponse, responses={404: {"model": ErrorResponse}})
 def get_status(video_id: int, db: Session = Depends(get_db)):
     video = db.query(VideoAnalysis).filter(VideoAnalysis.id == video_id).first()
@@ -227,17 +432,86 @@ def get_feedback(video_id: int, db: Session = Depends(get_db)):
         "video_id": video_id,
         "status": video.status,
         "transcription": video.transcription,
-        "feedbacks": [
-            {
-                "language": feedback.language,
-                "teaching_quality_score": feedback.teaching_quality_score,
-                "student_engagement_score": feedback.student_engagement_score,
-                "overall_score": feedback.overall_score,
-                "strengths": feedback.strengths,
-                "areas_for_improvement": feedback.areas_for_improvement,
-                "specific_recommendations": feedback.specific_recommendations,
-                "technical_analysis": json.loads(feedback.technical_analysis) if feedback.technical_analysis else {}
-            }
-            for feedback in feedbacks
-        ]
-    } 
\ No newline at end of file
+        "feedbacks": [_feedback_payload(feedback) for feedback in feedbacks]
+    }
+
+@app.get("/feedback-stream/{video_id}")
+def stream_feedback(video_id: int, db: Session = Depends(get_db)):
+    """
+    Server-sent events for the feedback of a video: section deltas while it is generated, then the saved feedback
+
+    Events: status, section ({field, delta} or {field, text, replace}), reset (discard the streamed
+    sections), feedback (the persisted result), done. Clients connecting after generation get the
+    saved feedback right away.
+    """
+    video = db.query(VideoAnalysis).filter(VideoAnalysis.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    def format_event(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    def events():
+        keepalive = settings.feedback_stream_keepalive
+        timeout = 0.0  # First pass checks the database right away, so saved feedback is not held back
+        while True:
+            channel = feedback_broker.wait_for_channel(video_id, timeout=timeout)
+            timeout = keepalive
+            if channel is not None:
+                for item in channel.events(keepalive):
+                    yield format_event(*item) if item else ": keep-alive\n\n"
+                return
+            
+            # Not generating in this process (yet): follow progress in the database
+            session = SessionLocal()
+            try:
+                current = session.query(VideoAnalysis).filter(VideoAnalysis.id == video_id).first()
+                saved = session.query(AIFeedback).filter(AIFeedback.video_analysis_id == video_id).first()
+                if saved:
+                    yield format_event("feedback", _feedback_payload(saved))
+                    yield format_event("done", {"ok": True})
+                    return
+                if current is None or current.status == StatusEnum.FAILED.value:
+                    yield format_event("done", {"ok": False})
+                    return
+                yield format_event("status", {"state": current.status})
+            finally:
+                session.close()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/timeline/{video_id}")
+def get_timeline(
+    video_id: int,
+    start: Optional[float] = Query(None, alias="from", ge=0.0),
+    end: Optional[float] = Query(None, alias="to", ge=0.0),
+    points: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """
+    Engagement and motion over time, min/max/mean per bucket, from the precomputed pyramid
+    
+    Ranges short enough to fit the point budget are answered with the stored frame rows
+    themselves (bucket_seconds 0), read from the memory-mapped frame series.
+    """
+    video = db.query(VideoAnalysis).filter(VideoAnalysis.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    from services.frame_series import load_frame_series
+    from services.timeline_pyramid import load_timeline_pyramid, query_frames
+    series = load_frame_series(video.frame_series_path)
+    if series is not None:
+        frames = query_frames(series, start, end, points)
+        if frames is not None:
+            return {"video_id": video_id, **frames}
+    
+    pyramid = load_timeline_pyramid(video_id)
+    if pyramid is None:
+        raise HTTPException(status_code=404, detail="Timeline not available for this video")
+    
+    return {"video_id": video_id, **pyramid.query(start, end, points)}
\ No newline at end of file
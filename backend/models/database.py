@@ -27,11 +27,15 @@ class VideoAnalysis(Base):
     transcription = Column(Text, nullable=True)
     audio_path = Column(String(500), nullable=True)
     
-    # Video analysis data (stored as JSON strings for SQLite compatibility)
+    # Video analysis data (stored as JSON strings for SQLite compatibility); the face and motion
+    # columns hold summaries since per-frame data moved to the frame series sidecar
     face_detection_data = Column(Text, nullable=True)
     motion_analysis_data = Column(Text, nullable=True)
     engagement_metrics = Column(Text, nullable=True)
     
+    # Per-frame metrics live in a columnar .npy sidecar (see services/frame_series.py)
+    frame_series_path = Column(String(500), nullable=True)
+    
     # AI feedback
     ai_feedback = relationship("AIFeedback", back_populates="video_analysis", cascade="all, delete-orphan")
     
@@ -44,6 +44,8 @@ class EngagementMetrics(BaseModel):
     motion_activity_score: float
     attention_span_avg: float
     engagement_periods: List[Dict[str, Any]]
+    people_detected: int = 0
+    per_person: List[Dict[str, Any]] = []
     
     class Config:
         from_attributes = True
@@ -53,7 +55,12 @@ class TechnicalAnalysis(BaseModel):
     video_quality_score: float
     audio_quality_score: float
     lighting_analysis: Dict[str, Any]
+    sharpness_analysis: Dict[str, Any] = {}
     camera_stability_score: float
+    camera_motion_avg: float = 0.0
+    audio_analysis: Dict[str, Any] = {}
+    keyframes: List[Dict[str, Any]] = []
+    visual_observations: Optional[str] = None
     
     class Config:
         from_attributes = True
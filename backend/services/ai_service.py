@@ -1,35 +1,60 @@
 import os
+import base64
 import logging
 import json
 import httpx
 import time
 import random
-from typing import Optional, Dict, Any, List
-from datetime import datetime
-
-# AI/ML imports
-try:
-    from moviepy.editor import VideoFileClip
-    MOVIEPY_AVAILABLE = True
-except ImportError:
-    MOVIEPY_AVAILABLE = False
-    logging.warning("MoviePy not available. Audio extraction will be skipped.")
-
-try:
-    from faster_whisper import WhisperModel
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
-    logging.warning("Faster-Whisper not available. Transcription will use placeholder.")
+import threading
+from functools import lru_cache
+from typing import Callable, Optional, Dict, Any, List, Tuple
 
 from config.settings import settings
+from services.model_server import get_whisper_client, WhisperClient, LocalWhisper
+from services.transcript_digest import TranscriptDigest
+from services.model_router import ModelRouter
+from services.feedback_stream import current_feedback_stream
+from services.metrics import metrics
+from services.tracing import span, record_span
+from services.feedback_parser import (
+    parse_feedback_json, validate_feedback, is_wrong_language, FEEDBACK_FIELDS, TEXT_FIELDS
+)
+from services.prompt_templates import (
+    feedback_template, feedback_system_prompt, repair_prompt, FALLBACK_SYSTEM_PROMPT
+)
+from services.token_budget import (
+    count_tokens, completion_budget, start_usage_log, record_usage, CHARS_PER_TOKEN
+)
 
 logger = logging.getLogger(__name__)
 
 
+# AI/ML imports are deferred until first use so the API starts quickly
+@lru_cache(maxsize=None)
+def _import_video_file_clip():
+    try:
+        from moviepy.editor import VideoFileClip
+        return VideoFileClip
+    except ImportError:
+        logging.warning("MoviePy not available. Audio extraction will be skipped.")
+        return None
+
+
+@lru_cache(maxsize=None)
+def _import_whisper_model():
+    try:
+        from faster_whisper import WhisperModel
+        return WhisperModel
+    except ImportError:
+        logging.warning("Faster-Whisper not available. Transcription will use placeholder.")
+        return None
+
+
 class AIService:
     def __init__(self):
-        self.whisper_model = None
+        self._whisper_model = None
+        self._whisper_initialized = False
+        self._whisper_lock = threading.Lock()
         
         # OpenRouter free models
         self.free_models = {
@@ -39,27 +64,94 @@ class AIService:
             "vision": "moonshotai/kimi-vl-a3b-thinking:free"   # For image/video analysis
         }
         
-        # Initialize AI models
-        self._initialize_models()
+        # Transcript chunk summaries use the analysis model, independent of the feedback language
+        self.transcript_digest = TranscriptDigest(
+            self._summarize_text, [self.free_models["analysis"], self.free_models["chat"]]
+        )
+        
+        # Circuit breakers and latency windows per model, fed by every request
+        self.model_router = ModelRouter(self.free_models)
+    
+    @property
+    def whisper_model(self):
+        """Whisper model (or model server client), initialized on first use"""
+        if not self._whisper_initialized:
+            with self._whisper_lock:
+                if not self._whisper_initialized:
+                    with span("whisper.load"):
+                        self._whisper_model = self._initialize_whisper()
+                    self._whisper_initialized = True
+        return self._whisper_model
     
-    def _initialize_models(self):
-        """Initialize AI models"""
+    def _initialize_whisper(self):
+        """Initialize the Whisper model, preferring the shared model server"""
         try:
-            # Initialize Whisper for transcription
-            if WHISPER_AVAILABLE and settings.whisper_model:
-                self.whisper_model = WhisperModel(
+            if not settings.whisper_model:
+                return None
+            
+            if settings.model_server_enabled:
+                client = get_whisper_client()
+                if client:
+                    logger.info("Using shared Whisper model server")
+                    return client
+                logger.warning("Model server unavailable, loading Whisper in-process")
+            
+            WhisperModel = _import_whisper_model()
+            if WhisperModel:
+                model = WhisperModel(
                     settings.whisper_model,
                     device="cpu",  # Change to "cuda" if GPU available
                     compute_type="int8"
                 )
                 logger.info("Whisper model initialized successfully")
+                return LocalWhisper(model)
             
         except Exception as e:
             logger.error(f"Error initializing AI models: {e}")
+        return None
+    
+    def warm_up(self):
+        """Load models ahead of the first request (run from a background thread)"""
+        start = time.perf_counter()
+        self.whisper_model  # Property access triggers initialization
+        _import_video_file_clip()
+        logger.info(f"AI models warmed up in {time.perf_counter() - start:.1f}s")
+    
+    def model_status(self) -> Dict[str, bool]:
+        """Report which models are loaded and ready to serve requests"""
+        whisper_ready = False
+        if self._whisper_initialized and self._whisper_model is not None:
+            if isinstance(self._whisper_model, WhisperClient):
+                try:
+                    whisper_ready = bool(self._whisper_model.ping().get("whisper"))
+                except Exception as e:
+                    logger.warning(f"Model server ping failed: {e}")
+            else:
+                whisper_ready = True
+        
+        # Only consult the import cache so a status check never triggers the import
+        moviepy_ready = _import_video_file_clip.cache_info().currsize > 0 and _import_video_file_clip() is not None
+        
+        return {
+            "whisper": whisper_ready,
+            "moviepy": moviepy_ready
+        }
+    
+    def unavailable_models(self) -> Dict[str, str]:
+        """Models that will not load in this install (not configured or not installed), with the reason"""
+        unavailable = {}
+        if not settings.whisper_model:
+            unavailable["whisper"] = "disabled (WHISPER_MODEL is empty)"
+        elif self._whisper_initialized and self._whisper_model is None:
+            unavailable["whisper"] = "faster-whisper is not installed or failed to load; using placeholder transcripts"
+        if _import_video_file_clip.cache_info().currsize > 0 and _import_video_file_clip() is None:
+            unavailable["moviepy"] = "MoviePy is not installed; audio extraction is skipped"
+        return unavailable
     
     def extract_audio_from_video(self, video_path: str) -> Optional[str]:
         """Extract audio from video using MoviePy"""
-        if not MOVIEPY_AVAILABLE:
+        VideoFileClip = _import_video_file_clip()
+        if VideoFileClip is None:
             logger.warning("MoviePy not available, skipping audio extraction")
             return None
         
@@ -95,7 +187,7 @@ class AIService:
     
     def transcribe_audio(self, audio_path: str, language: str = None) -> Optional[Dict[str, Any]]:
         """Transcribe audio using Whisper"""
-        if not WHISPER_AVAILABLE or not self.whisper_model:
+        if not self.whisper_model:
             logger.warning("Whisper not available, using placeholder transcription")
             return {
                 "text": "This is a placeholder transcription. Install faster-whisper for real transcription.",
@@ -109,6 +201,7 @@ class AIService:
                 return None
             
             logger.info(f"Transcribing audio: {audio_path}")
+            started = time.perf_counter()
             
             # Language mapping for Whisper
             language_map = {
@@ -159,9 +252,13 @@ class AIService:
                 "segments": segments_data,
                 "language": info.language,
                 "language_probability": info.language_probability,
-                "duration": info.duration
+                "duration": info.duration,
+                "audio_metrics": info.audio_metrics
             }
             
+            if info.duration:
+                metrics.inc('effectiveclass_audio_transcribed_seconds_total', value=info.duration)
+                metrics.inc('effectiveclass_transcription_seconds_total', value=time.perf_counter() - started)
             logger.info(f"Transcription completed. Length: {len(transcription_text)} characters")
             return result
             
@@ -173,6 +270,153 @@ class AIService:
                 "segments": []
             }
     
+    def describe_keyframes(self, keyframe_paths: List[str]) -> Optional[str]:
+        """Describe distinct keyframes (board, slides, classroom) with the vision model in one request"""
+        if not settings.openrouter_api_key or not keyframe_paths:
+            return None
+        if not self.model_router.allow(self.free_models["vision"]):
+            logger.warning("Vision model circuit is open, skipping keyframe description")
+            return None
+        
+        try:
+            content = [{
+                "type": "text",
+                "text": "These are distinct frames from a classroom video, in time order. In at most 5 short sentences, "
+                        "describe what is on the board or slides, the teaching materials used, and how the classroom is arranged."
+            }]
+            for path in keyframe_paths[:settings.vision_max_images]:
+                with open(path, "rb") as f:
+                    encoded = base64.b64encode(f.read()).decode("ascii")
+                content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded}"}})
+            
+            description = self._chat_completion(
+                self.free_models["vision"], [{"role": "user", "content": content}], max_tokens=400, purpose="keyframes"
+            ).strip()
+            
+            logger.info(f"Described {len(content) - 1} keyframes using {self.free_models['vision']}")
+            return description or None
+            
+        except Exception as e:
+            logger.error(f"Error describing keyframes: {str(e)}")
+            return None
+        finally:
+            self.model_router.release(self.free_models["vision"])
+    
+    def _chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float = 0.3,
+        purpose: str = "completion",
+        on_delta: Optional[Callable[[str], None]] = None,
+        **options
+    ) -> str:
+        """One OpenRouter chat completion; returns the message content or raises. Streams when on_delta is given"""
+        prompt_tokens = sum(count_tokens(m["content"]) for m in messages if isinstance(m["content"], str))
+        headers = {
+            "Authorization": f"Bearer {settings.openrouter_api_key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **options
+        }
+        started = time.monotonic()
+        first_token = None
+        try:
+            with httpx.Client(timeout=60.0) as client:  # Increased timeout for longer responses
+                if on_delta is None:
+                    response = client.post(f"{settings.openrouter_base_url}/chat/completions", headers=headers, json=data)
+                    response.raise_for_status()
+                    result = response.json()
+                else:
+                    result = self._stream_completion(client, headers, data, on_delta)
+                    first_token = result.get("first_token_latency")
+            content = result["choices"][0]["message"]["content"]
+        except httpx.HTTPStatusError as e:
+            self._record_request(model, purpose, e.response.status_code, started)
+            retry_after = None
+            if e.response.status_code == 429:  # Rate limit exceeded: skip the model for as long as asked
+                try:
+                    retry_after = float(e.response.headers.get("retry-after", settings.llm_breaker_reset_seconds))
+                except ValueError:
+                    retry_after = settings.llm_breaker_reset_seconds
+            self.model_router.record_failure(model, f"HTTP {e.response.status_code}", retry_after)
+            raise
+        except Exception as e:
+            self._record_request(model, purpose, "timeout" if isinstance(e, httpx.TimeoutException) else "error", started)
+            self.model_router.record_failure(model, type(e).__name__)
+            raise
+        latency = time.monotonic() - started
+        self._record_request(model, purpose, 200, started, first_token)
+        self.model_router.record_success(model, latency, purpose)
+        record_usage(purpose, model, result, prompt_tokens, latency, first_token)
+        return content
+    
+    @staticmethod
+    def _record_request(model: str, purpose: str, status, started: float, first_token: Optional[float] = None):
+        """Metrics and a trace span for one OpenRouter request"""
+        duration = time.monotonic() - started
+        metrics.observe('effectiveclass_openrouter_request_duration_seconds', duration, {'model': model})
+        metrics.inc('effectiveclass_openrouter_requests_total', {'model': model, 'status': status})
+        attributes = {'model': model, 'purpose': purpose, 'http_status': status}
+        if first_token is not None:
+            attributes['first_token_latency'] = round(first_token, 3)
+        record_span("openrouter.request", duration, status="ok" if status == 200 else "error", **attributes)
+    
+    def _stream_completion(
+        self, client: httpx.Client, headers: Dict[str, str], data: Dict[str, Any], on_delta: Callable[[str], None]
+    ) -> Dict[str, Any]:
+        """Read a streamed completion (server-sent events), passing each content delta on; returns it in response shape"""
+        started = time.monotonic()
+        parts, usage, first_token = [], None, None
+        with client.stream(
+            "POST", f"{settings.openrouter_base_url}/chat/completions", headers=headers, json={**data, "stream": True, "stream_options": {"include_usage": True}}
+        ) as response:
+            if response.is_error:
+                response.read()
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue  # Blank separators and ": OPENROUTER PROCESSING" keep-alive comments
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Stream error: {chunk['error'].get('message', chunk['error'])}")
+                usage = chunk.get("usage") or usage
+                for choice in chunk.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        if first_token is None:
+                            first_token = time.monotonic() - started
+                        parts.append(delta)
+                        on_delta(delta)
+        return {
+            "choices": [{"message": {"content": "".join(parts)}}],
+            "usage": usage,
+            "first_token_latency": first_token
+        }
+    
+    def _summarize_text(self, prompt: str, model: str) -> Optional[str]:
+        """Summarize one transcript chunk with the given model; None if it is unavailable or fails"""
+        if not self.model_router.allow(model):
+            return None
+        try:
+            return self._chat_completion(
+                model, [{"role": "user", "content": prompt}], max_tokens=300, purpose="transcript_summary"
+            )
+        except Exception as e:
+            logger.warning(f"Transcript summary with {model} failed: {str(e)}")
+            return None
+        finally:
+            self.model_router.release(model)
+    
     def generate_ai_feedback(self, video_data: Dict[str, Any], language: str) -> Optional[Dict[str, Any]]:
         """Generate AI feedback using OpenRouter free models"""
         try:
@@ -181,313 +425,245 @@ class AIService:
                 return self._get_template_feedback(language)
             
             logger.info(f"Generating real AI feedback for language: {language}")
+            usage = start_usage_log()
+            
+            # Fit the whole lesson into the prompt; digests are cached, so other languages reuse them
+            transcription = video_data.get('transcription', '')
+            if transcription and 'transcript_digest' not in video_data:
+                video_data = dict(video_data)
+                video_data['transcript_digest'] = self.transcript_digest.build(
+                    transcription, video_data.get('transcript_segments'), self._transcript_budget(video_data, language)
+                )
             
             # Prepare prompt for AI
             prompt = self._create_feedback_prompt(video_data, language)
+            prompt_tokens = count_tokens(feedback_system_prompt(language)) + count_tokens(prompt)
+            max_tokens = completion_budget(prompt_tokens, settings.feedback_max_tokens)
+            logger.info(f"Feedback prompt: ~{prompt_tokens} tokens, max_tokens={max_tokens}")
             
             # Use OpenRouter with free models
-            return self._generate_with_openrouter_free(prompt, language)
+            feedback = self._generate_with_openrouter_free(prompt, language, max_tokens, video_data)
+            if feedback is not None:
+                feedback['llm_usage'] = usage
+            return feedback
                 
         except Exception as e:
             logger.error(f"Error generating AI feedback: {str(e)}")
             return self._get_template_feedback(language)
     
+    def _transcript_budget(self, video_data: Dict[str, Any], language: str) -> int:
+        """Transcript tokens that fit next to the rest of the prompt and the full completion budget"""
+        rest = dict(video_data, transcription='', transcript_digest='')
+        overhead = count_tokens(feedback_system_prompt(language)) + count_tokens(self._create_feedback_prompt(rest, language))
+        available = settings.llm_context_tokens - settings.feedback_max_tokens - overhead
+        # Never squeeze the transcript below a useful minimum; the completion budget shrinks instead
+        return max(min(settings.transcript_budget_tokens, available), settings.transcript_budget_tokens // 4)
+    
     def _create_feedback_prompt(self, video_data: Dict[str, Any], language: str) -> str:
         """Create a prompt for AI feedback generation"""
         subject = video_data.get('subject', 'general')
         theme = video_data.get('theme', '')
-        transcription = video_data.get('transcription', '')
         
-        language_names = {"en": "English", "ru": "Russian", "tj": "Tajik"}
-        lang_name = language_names.get(language, "English")
+        measured_signals = self._format_measured_signals(
+            video_data.get('technical_analysis') or {},
+            video_data.get('engagement_metrics') or {}
+        )
         
-        # Special instruction for Tajik
-        language_instruction = ""
-        if language == "tj":
-            language_instruction = """
-IMPORTANT: You MUST respond in Tajik language (тоҷикӣ) using Cyrillic script. 
-Do NOT respond in English or any other language. Use proper Tajik grammar and vocabulary.
-"""
-        elif language == "ru":
-            language_instruction = """
-IMPORTANT: You MUST respond in Russian language (русский) using Cyrillic script.
-Do NOT respond in English or any other language. Use proper Russian grammar and vocabulary.
-"""
+        return feedback_template(subject, language).substitute(
+            theme=theme,
+            transcription_info=self._format_transcription_info(video_data),
+            measured_signals=measured_signals
+        )
+    
+    def _format_transcription_info(self, video_data: Dict[str, Any]) -> str:
+        """Transcript section of the prompt: the transcript, its digest, or a note that there was no speech"""
+        transcription = video_data.get('transcription', '')
         
         # Handle cases with no transcription
-        transcription_info = ""
         if not transcription or "no clear speech" in transcription.lower():
-            transcription_info = "Note: No clear speech was detected in the video. Please provide feedback based on general teaching principles and the subject/theme information provided."
-        else:
-            transcription_info = f"Transcription: {transcription[:800]}..."
-        
-        # Create detailed subject-specific guidance
-        subject_guidance = self._get_subject_specific_guidance(subject, theme, language)
-        
-        prompt = f"""
-        You are an expert educational consultant analyzing a classroom video. 
-        {language_instruction}
-        Please provide EXTREMELY comprehensive, detailed feedback in {lang_name} language ONLY.
+            return "Note: No clear speech was detected in the video. Please provide feedback based on general teaching principles and the subject/theme information provided."
         
-        SUBJECT: {subject}
-        THEME: {theme}
-        {transcription_info}
-        
-        {subject_guidance}
+        digest = video_data.get('transcript_digest')
+        if digest and digest != transcription:
+            return f"Lesson transcript, summarized in time order (covers the whole lesson):\n{digest}"
+        return f"Transcription: {digest or transcription[:settings.transcript_budget_tokens * CHARS_PER_TOKEN]}"
+    
+    def _format_measured_signals(self, technical_analysis: Dict[str, Any], engagement_metrics: Dict[str, Any]) -> str:
+        """Describe measured audio/video signals for the prompt, or an empty string"""
+        lines = []
         
-        Please provide EXTREMELY detailed feedback in the following JSON format, responding in {lang_name} language:
-        {{
-            "teaching_quality_score": 0-10,
-            "student_engagement_score": 0-10,
-            "overall_score": 0-10,
-            "strengths": "Provide 5-7 EXTREMELY detailed strengths specific to {subject} and {theme}. Include specific examples, observations from the video, teaching techniques used, and their effectiveness. Be very comprehensive and detailed.",
-            "areas_for_improvement": "Provide 5-7 EXTREMELY detailed areas for improvement specific to {subject} and {theme}. Be very specific about what could be enhanced, include concrete examples, and explain why these improvements would be beneficial.",
-            "specific_recommendations": "Provide 6-8 EXTREMELY specific, actionable recommendations for improving teaching in {subject}. Include concrete examples, step-by-step strategies, specific activities, assessment methods, and implementation tips. Be very detailed and practical."
-        }}
+        audio = technical_analysis.get('audio_analysis') or {}
+        if audio.get('duration'):
+            lines.append(
+                f"- Audio: estimated SNR {audio['estimated_snr_db']:.0f} dB, "
+                f"speech level {audio['speech_level_db']:.0f} dBFS, "
+                f"speech in {audio['speech_ratio']:.0%} of the recording, "
+                f"clipping {audio['clipping_ratio']:.2%} of samples"
+            )
+        if technical_analysis.get('video_quality_score'):
+            lines.append(
+                f"- Video: quality score {technical_analysis['video_quality_score']:.2f}/1, "
+                f"camera stability {technical_analysis.get('camera_stability_score', 0.0):.2f}/1"
+            )
+        if engagement_metrics.get('face_detection_count'):
+            lines.append(
+                f"- Engagement: {engagement_metrics.get('people_detected', 0)} people tracked, "
+                f"motion activity {engagement_metrics.get('motion_activity_score', 0.0):.2f}/1, "
+                f"{len(engagement_metrics.get('engagement_periods', []))} sustained attention periods"
+            )
         
-        CRITICAL REQUIREMENTS FOR MAXIMUM DETAIL:
-        1. Use the subject ({subject}) and theme ({theme}) information extensively throughout your feedback
-        2. Make feedback extremely specific to the subject area, not generic
-        3. Provide detailed explanations with multiple concrete examples for each point
-        4. Focus on practical, actionable advice with step-by-step implementation
-        5. Consider subject-specific teaching methodologies and best practices
-        6. Respond ONLY in {lang_name} language, not in English
-        7. Be extremely comprehensive and detailed in your analysis
-        8. Include specific teaching strategies, assessment methods, and classroom activities
-        9. Provide detailed explanations of why each recommendation would be effective
-        10. Use the transcription content to provide specific examples and observations
-        11. Aim for maximum detail and comprehensiveness in every section
-        """
+        visual = technical_analysis.get('visual_observations')
+        if visual:
+            lines.append(f"- What the keyframes show: {visual}")
         
-        return prompt
+        if not lines:
+            return ""
+        return "MEASURED SIGNALS (from automatic audio/video analysis; mention recording problems if they hurt the lesson):\n" + "\n".join(lines)
     
-    def _get_subject_specific_guidance(self, subject: str, theme: str, language: str) -> str:
-        """Get subject-specific guidance for feedback generation"""
-        subject_lower = subject.lower()
-        
-        guidance = {
-            "en": {
-                "mathematics": f"Focus on mathematical concepts, problem-solving approaches, clarity of explanations, use of visual aids, step-by-step demonstrations, and student understanding of {theme}.",
-                "science": f"Focus on scientific methodology, experimental design, hypothesis testing, use of scientific equipment, safety procedures, and understanding of {theme} concepts.",
-                "language": f"Focus on language acquisition, grammar instruction, vocabulary building, pronunciation, reading comprehension, and {theme} language skills.",
-                "history": f"Focus on historical analysis, source evaluation, chronological understanding, cultural context, and interpretation of {theme} historical events.",
-                "literature": f"Focus on literary analysis, text interpretation, critical thinking, creative expression, and understanding of {theme} literary works.",
-                "physics": f"Focus on physical concepts, mathematical applications, experimental demonstrations, problem-solving, and understanding of {theme} principles.",
-                "chemistry": f"Focus on chemical reactions, laboratory safety, molecular understanding, practical applications, and {theme} chemical concepts.",
-                "biology": f"Focus on biological systems, scientific observation, classification, ecological relationships, and understanding of {theme} biological processes."
-            },
-            "ru": {
-                "mathematics": f"Сосредоточьтесь на математических концепциях, подходах к решению задач, ясности объяснений, использовании наглядных пособий, пошаговых демонстрациях и понимании студентами {theme}.",
-                "science": f"Сосредоточьтесь на научной методологии, экспериментальном дизайне, проверке гипотез, использовании научного оборудования, процедурах безопасности и понимании концепций {theme}.",
-                "language": f"Сосредоточьтесь на приобретении языка, обучении грамматике, построении словарного запаса, произношении, понимании чтения и языковых навыках {theme}.",
-                "history": f"Сосредоточьтесь на историческом анализе, оценке источников, хронологическом понимании, культурном контексте и интерпретации исторических событий {theme}.",
-                "literature": f"Сосредоточьтесь на литературном анализе, интерпретации текста, критическом мышлении, творческом выражении и понимании литературных произведений {theme}.",
-                "physics": f"Сосредоточьтесь на физических концепциях, математических приложениях, экспериментальных демонстрациях, решении задач и понимании принципов {theme}.",
-                "chemistry": f"Сосредоточьтесь на химических реакциях, лабораторной безопасности, молекулярном понимании, практических применениях и химических концепциях {theme}.",
-                "biology": f"Сосредоточьтесь на биологических системах, научном наблюдении, классификации, экологических отношениях и понимании биологических процессов {theme}."
-            },
-            "tj": {
-                "mathematics": f"Ба мафҳумҳои математикӣ, усулҳои ҳалли масъалаҳо, равшании шарҳҳо, истифодаи воситаҳои намоишӣ, намоишҳои қадам ба қадам ва фаҳмиши донишҷӯён аз {theme} диққат диҳед.",
-                "science": f"Ба усули илмӣ, тарҳрезии таҷрибавӣ, санҷиши фарзияҳо, истифодаи таҷҳизоти илмӣ, процедураҳои бехатарӣ ва фаҳмиши мафҳумҳои {theme} диққат диҳед.",
-                "language": f"Ба омӯзиши забон, таълими грамматика, сохтани луғат, талаффуз, фаҳмиши хондан ва маҳоратҳои забонӣ {theme} диққат диҳед.",
-                "history": f"Ба таҳлили таърихӣ, арзёбии манбаъҳо, фаҳмиши хронологикӣ, контексти фарҳангӣ ва тафсири вокеъҳои таърихӣ {theme} диққат диҳед.",
-                "literature": f"Ба таҳлили адабӣ, тафсири матн, фикри интиқодӣ, ибрози иҷодӣ ва фаҳмиши асарҳои адабӣ {theme} диққат диҳед.",
-                "physics": f"Ба мафҳумҳои физикӣ, истифодаи математикӣ, намоишҳои таҷрибавӣ, ҳалли масъалаҳо ва фаҳмиши принсипҳои {theme} диққат диҳед.",
-                "chemistry": f"Ба реаксияҳои химиявӣ, бехатарии лабораторӣ, фаҳмиши молекулярӣ, истифодаи амалӣ ва мафҳумҳои химиявӣ {theme} диққат диҳед.",
-                "biology": f"Ба системаҳои биологӣ, мушоҳидаи илмӣ, тасниф, муносибатҳои экологӣ ва фаҳмиши равандҳои биологӣ {theme} диққат диҳед."
-            }
-        }
+    def _generate_with_openrouter_free(
+        self, prompt: str, language: str, max_tokens: int = 3000, video_data: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Generate feedback with the feedback model, hedged by the fallback model; first valid answer wins"""
+        video_data = video_data or {}
+        feedback_model, fallback_model = self.free_models["feedback"], self.free_models["chat"]
+        attempts = [
+            # Use Llama for educational feedback (best for this use case)
+            (feedback_model, "feedback", lambda: self._request_feedback(
+                feedback_model, feedback_system_prompt(language), prompt, language, max_tokens, "feedback",
+                video_data, top_p=0.9
+            )),
+            # Use Mistral as fallback
+            (fallback_model, "feedback_fallback", lambda: self._request_feedback(
+                fallback_model, FALLBACK_SYSTEM_PROMPT, prompt, language, min(2500, max_tokens), "feedback_fallback",
+                video_data
+            ))
+        ]
         
-        # Find matching subject
-        for key in guidance[language].keys():
-            if key in subject_lower:
-                return guidance[language][key]
+        rounds = max(1, settings.llm_feedback_rounds)
+        for attempt in range(rounds):
+            with span("llm.feedback_round", round=attempt + 1, language=language) as race:
+                feedback = self.model_router.race(attempts)
+                race.set('valid', feedback is not None)
+            if feedback is not None:
+                return feedback
+            if attempt < rounds - 1:
+                delay = settings.llm_retry_delay + random.uniform(0, 1)
+                logger.warning(f"No valid feedback for {language}, retrying in {delay:.1f} seconds (attempt {attempt + 1}/{rounds})")
+                with span("llm.retry_wait", seconds=round(delay, 2)):
+                    time.sleep(delay)
         
-        # Default guidance
-        return guidance[language].get("science", f"Focus on general teaching effectiveness and student engagement in {subject}.")
+        logger.error(f"No valid feedback for {language} after {rounds} attempts, using template")
+        return self._get_template_feedback(language)
+    
+    def _request_feedback(
+        self,
+        model: str,
+        system_prompt: str,
+        prompt: str,
+        language: str,
+        max_tokens: int,
+        purpose: str,
+        video_data: Dict[str, Any],
+        **options
+    ) -> Optional[Dict[str, Any]]:
+        """One feedback request; None if the answer cannot be used. Sections are relayed to SSE clients as they arrive"""
+        stream = current_feedback_stream()
+        relay = stream.relay(model) if stream is not None and settings.feedback_streaming_enabled else None
+        try:
+            content = self._chat_completion(
+                model,
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.7,
+                purpose=purpose,
+                on_delta=relay.feed if relay else None,
+                **options
+            )
+        except Exception:
+            if relay:
+                relay.finish(False)
+            raise
+        logger.info(f"Generated feedback using {model}")
+        feedback = self._parse_ai_response(model, content, language, video_data)
+        if relay:
+            relay.finish(feedback is not None)
+        return feedback
     
-    def _generate_with_openrouter_free(self, prompt: str, language: str) -> Optional[Dict[str, Any]]:
-        """Generate feedback using OpenRouter free models with retry logic"""
-        max_retries = 3
-        base_delay = 2  # Start with 2 seconds
+    def _parse_ai_response(
+        self, model: str, content: str, language: str, video_data: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Validate the feedback in a response, repairing only the fields that are missing, invalid or in the wrong language"""
+        logger.info(f"Parsing AI response for language: {language}")
+        logger.debug(f"Raw AI response: {content[:200]}...")
         
-        for attempt in range(max_retries):
-            try:
-                headers = {
-                    "Authorization": f"Bearer {settings.openrouter_api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                # Use Llama for educational feedback (best for this use case)
-                model = self.free_models["feedback"]
-                
-                # Language mapping
-                language_names = {"en": "English", "ru": "Russian", "tj": "Tajik"}
-                
-                data = {
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": f"You are an expert educational consultant with deep knowledge of teaching methodologies and classroom dynamics. You MUST respond in {language_names.get(language, 'English')} language only. Provide EXTREMELY detailed and comprehensive feedback with specific examples and actionable recommendations."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 3000,  # Significantly increased for very detailed feedback
-                    "top_p": 0.9
-                }
-                
-                with httpx.Client(timeout=60.0) as client:  # Increased timeout for longer responses
-                    response = client.post(
-                        f"{settings.openrouter_base_url}/chat/completions",
-                        headers=headers,
-                        json=data
-                    )
-                    response.raise_for_status()
-                    
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    logger.info(f"Generated feedback using {model}")
-                    return self._parse_ai_response(content, language)
-                    
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429:  # Rate limit exceeded
-                    if attempt < max_retries - 1:
-                        delay = base_delay * (2 ** attempt) + random.uniform(0, 1)  # Exponential backoff with jitter
-                        logger.warning(f"Rate limit exceeded for {language}, retrying in {delay:.1f} seconds (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        logger.error(f"Rate limit exceeded for {language} after {max_retries} attempts, using fallback")
-                        return self._generate_with_fallback_model(prompt, language)
-                else:
-                    logger.error(f"HTTP error {e.response.status_code} for {language}: {str(e)}")
-                    if attempt < max_retries - 1:
-                        time.sleep(base_delay)
-                        continue
-                    else:
-                        return self._generate_with_fallback_model(prompt, language)
-                        
-            except Exception as e:
-                logger.error(f"Error with OpenRouter API for {language}: {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(base_delay)
-                    continue
-                else:
-                    return self._generate_with_fallback_model(prompt, language)
+        data = parse_feedback_json(content) or self._extract_feedback_manually(content, language) or {}
+        feedback, invalid = validate_feedback(data, language)
+        if not invalid:
+            logger.info(f"Generated real AI feedback for {language}: {len(str(feedback))} characters")
+            return feedback
+        
+        # A response without any section is not worth repairing; the next model or round regenerates it
+        if not any(data.get(field) for field in TEXT_FIELDS):
+            logger.warning(f"No usable feedback from {model} for {language}")
+            return None
         
-        # If all retries failed
-        return self._generate_with_fallback_model(prompt, language)
+        logger.warning(f"Repairing feedback fields {invalid} from {model} for {language}")
+        feedback, invalid = self._repair_feedback(model, feedback, invalid, data, language, video_data)
+        if invalid:
+            logger.warning(f"Feedback fields {invalid} from {model} still invalid after repair")
+            return None
+        return feedback
     
-    def _generate_with_fallback_model(self, prompt: str, language: str) -> Optional[Dict[str, Any]]:
-        """Generate feedback using fallback free model with retry logic"""
-        max_retries = 2  # Fewer retries for fallback
-        base_delay = 3  # Longer delay for fallback
+    def _repair_feedback(
+        self,
+        model: str,
+        feedback: Dict[str, Any],
+        invalid: List[str],
+        data: Dict[str, Any],
+        language: str,
+        video_data: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """One small request for just the invalid fields; returns the merged feedback and the fields still invalid"""
+        translations, missing = {}, []
+        for field in invalid:
+            original = data.get(field)
+            if field in TEXT_FIELDS and original and is_wrong_language(str(original), language):
+                translations[field] = original if isinstance(original, str) else json.dumps(original, ensure_ascii=False)
+            else:
+                missing.append(field)
         
-        for attempt in range(max_retries):
-            try:
-                headers = {
-                    "Authorization": f"Bearer {settings.openrouter_api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                # Use Mistral as fallback
-                model = self.free_models["chat"]
-                
-                data = {
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": "You are an educational expert providing classroom feedback."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 2500  # Significantly increased for very detailed feedback
-                }
-                
-                with httpx.Client(timeout=60.0) as client:  # Increased timeout for longer responses
-                    response = client.post(
-                        f"{settings.openrouter_base_url}/chat/completions",
-                        headers=headers,
-                        json=data
-                    )
-                    response.raise_for_status()
-                    
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    logger.info(f"Generated feedback using fallback model {model}")
-                    return self._parse_ai_response(content, language)
-                    
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429:  # Rate limit exceeded
-                    if attempt < max_retries - 1:
-                        delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                        logger.warning(f"Fallback rate limit exceeded for {language}, retrying in {delay:.1f} seconds (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        logger.error(f"Fallback rate limit exceeded for {language} after {max_retries} attempts, using template")
-                        return self._get_template_feedback(language)
-                else:
-                    logger.error(f"Fallback HTTP error {e.response.status_code} for {language}: {str(e)}")
-                    if attempt < max_retries - 1:
-                        time.sleep(base_delay)
-                        continue
-                    else:
-                        return self._get_template_feedback(language)
-                        
-            except Exception as e:
-                logger.error(f"Error with fallback model for {language}: {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(base_delay)
-                    continue
-                else:
-                    return self._get_template_feedback(language)
+        prompt = repair_prompt(
+            video_data.get('subject', ''), video_data.get('theme', ''), language, feedback, translations, missing
+        )
+        # Translations into Cyrillic take up to ~3x the tokens of English source text; new sections get a fixed share
+        max_tokens = sum(3 * count_tokens(text) for text in translations.values())
+        max_tokens += sum(700 if field in TEXT_FIELDS else 20 for field in missing) + 50
+        max_tokens = completion_budget(count_tokens(prompt), max_tokens)
         
-        # If all retries failed
-        return self._get_template_feedback(language)
-    
-    def _parse_ai_response(self, content: str, language: str) -> Dict[str, Any]:
-        """Parse AI response and extract feedback"""
         try:
-            logger.info(f"Parsing AI response for language: {language}")
-            logger.debug(f"Raw AI response: {content[:200]}...")
-            
-            # Try to extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                try:
-                    feedback = json.loads(json_match.group())
-                    logger.info(f"Successfully extracted JSON feedback for {language}")
-                    
-                    # Check if response is in the correct language (for Tajik)
-                    if language in ["tj", "ru"] and self._is_english_response(feedback):
-                        logger.warning(f"AI responded in English instead of {language}, using template")
-                        return self._get_template_feedback(language)
-                    
-                    # Validate and normalize scores
-                    feedback = self._validate_feedback_scores(feedback)
-                    logger.info(f"Generated real AI feedback for {language}: {len(str(feedback))} characters")
-                    return feedback
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON decode error for {language}: {str(e)}")
-                    # Try to extract feedback manually from the response
-                    return self._extract_feedback_manually(content, language)
-            else:
-                # Try to extract feedback manually from the response
-                return self._extract_feedback_manually(content, language)
+            content = self._chat_completion(
+                model, [{"role": "user", "content": prompt}], max_tokens=max_tokens, purpose="feedback_repair"
+            )
+            repaired, _ = validate_feedback(parse_feedback_json(content), language)
         except Exception as e:
-            logger.error(f"Error parsing AI response for {language}: {str(e)}")
-            return self._get_template_feedback(language)
+            logger.error(f"Error repairing feedback with {model}: {str(e)}")
+            return feedback, invalid
+        
+        repaired = {field: value for field, value in repaired.items() if field in invalid}
+        logger.info(f"Repaired feedback fields {list(repaired)} with {model}")
+        merged = {**feedback, **repaired}
+        return {field: merged[field] for field in FEEDBACK_FIELDS if field in merged}, [field for field in invalid if field not in repaired]
     
-    def _extract_feedback_manually(self, content: str, language: str) -> Dict[str, Any]:
+    def _extract_feedback_manually(self, content: str, language: str) -> Optional[Dict[str, Any]]:
         """Extract feedback manually from AI response when JSON parsing fails"""
         try:
             logger.info(f"Attempting manual feedback extraction for {language}")
             
-            # Create a basic feedback structure
+            # Only the sections are extracted; scores stay missing and are repaired
             feedback = {
-                "teaching_quality_score": 7.0,
-                "student_engagement_score": 6.5,
-                "overall_score": 6.8,
                 "strengths": "",
                 "areas_for_improvement": "",
                 "specific_recommendations": ""
@@ -516,73 +692,17 @@ Do NOT respond in English or any other language. Use proper Russian grammar and
                     else:
                         feedback[current_section] = line
             
-            # If we couldn't extract meaningful content, use template
+            # If we couldn't extract meaningful content, there is nothing to repair
             if not any([feedback['strengths'], feedback['areas_for_improvement'], feedback['specific_recommendations']]):
-                logger.warning(f"Could not extract meaningful feedback for {language}, using template")
-                return self._get_template_feedback(language)
+                logger.warning(f"Could not extract meaningful feedback for {language}")
+                return None
             
             logger.info(f"Successfully extracted manual feedback for {language}")
             return feedback
             
         except Exception as e:
             logger.error(f"Error in manual feedback extraction for {language}: {str(e)}")
-            return self._get_template_feedback(language)
-    
-    def _is_english_response(self, feedback: Dict[str, Any]) -> bool:
-        """Check if the feedback is in English instead of the requested language"""
-        # More sophisticated check for different languages
-        feedback_text = " ".join([
-            str(feedback.get("strengths", "")),
-            str(feedback.get("areas_for_improvement", "")),
-            str(feedback.get("specific_recommendations", ""))
-        ]).lower()
-        
-        # Check for Cyrillic characters (Russian/Tajik)
-        cyrillic_chars = set('абвгдеёжзийклмнопрстуфхцчшщъыьэюя')
-        has_cyrillic = any(char in cyrillic_chars for char in feedback_text)
-        
-        # Check for English words that shouldn't be in Tajik/Russian
-        english_indicators = ["the", "teacher", "students", "learning", "could", "would", "should", "improve", "teaching", "classroom"]
-        english_word_count = sum(1 for indicator in english_indicators if indicator in feedback_text)
-        
-        # If it has Cyrillic characters, it's likely not English
-        if has_cyrillic:
-            return False
-        
-        # If it has many English words, it's likely English
-        if english_word_count >= 3:
-            return True
-        
-        return False
-    
-    def _validate_feedback_scores(self, feedback: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate and normalize feedback scores"""
-        try:
-            # Ensure scores are within 0-10 range
-            for score_key in ['teaching_quality_score', 'student_engagement_score', 'overall_score']:
-                if score_key in feedback:
-                    score = feedback[score_key]
-                    if isinstance(score, (int, float)):
-                        feedback[score_key] = max(0.0, min(10.0, float(score)))
-                    else:
-                        feedback[score_key] = 7.0  # Default score
-            
-            # Ensure required fields exist and are strings (not lists)
-            required_fields = ['strengths', 'areas_for_improvement', 'specific_recommendations']
-            for field in required_fields:
-                if field not in feedback or not feedback[field]:
-                    feedback[field] = "Analysis in progress."
-                else:
-                    # Convert lists to strings if needed
-                    if isinstance(feedback[field], list):
-                        feedback[field] = " ".join(str(item) for item in feedback[field])
-                    elif not isinstance(feedback[field], str):
-                        feedback[field] = str(feedback[field])
-            
-            return feedback
-        except Exception as e:
-            logger.error(f"Error validating feedback scores: {str(e)}")
-            return self._get_template_feedback("en")
+            return None
     
     def _get_template_feedback(self, language: str) -> Dict[str, Any]:
         """Get template feedback for a specific language"""
@@ -0,0 +1,76 @@
+import logging
+from typing import Dict, Any, Optional
+
+from config.settings import settings
+from services.analysis_stats import RunningStats, AttentionPeriods, DecimatingTimeline
+from services.frame_series import FrameSeries, FRAME_SERIES_FIELDS
+
+logger = logging.getLogger(__name__)
+
+ATTENTION_THRESHOLD = 0.5  # Engagement score above which a frame counts as attentive
+
+
+class AnalysisAggregator:
+    """
+    Constant-memory aggregation of per-frame analysis results.
+
+    Every analyzed frame is folded into running statistics, the online
+    attention-period detector and a bounded per-frame timeline as soon as
+    it is produced, so nothing grows with the length of the video.
+    Means are weighted by the seconds each frame stands for, so the dense
+    sampling of active scenes under adaptive sampling does not outweigh
+    long static stretches. Aggregators of consecutive segments merge into the whole-video result.
+    """
+
+    def __init__(self, timeline_points: Optional[int] = None):
+        timeline_points = timeline_points or settings.video_timeline_max_points
+        self.frames = 0
+        self.face_frames = 0
+        self.engagement = RunningStats()  # Frames with a positive engagement score
+        self.motion = RunningStats()  # Frames with in-scene motion
+        self.camera_motion = RunningStats()  # Every frame
+        self.attention = AttentionPeriods(ATTENTION_THRESHOLD, settings.video_max_engagement_periods)
+        self.timeline = DecimatingTimeline(FRAME_SERIES_FIELDS, timeline_points)
+
+    def add(self, frame_result: Dict[str, Any], span: float = 1.0):
+        """
+        Fold one frame result from VideoAnalyzer._analyze_frame into the aggregate
+
+        Args:
+            frame_result: Per-frame analysis result
+            span: Seconds of video the frame stands for (time until the next analyzed frame)
+        """
+        timestamp = frame_result['timestamp']
+        self.frames += 1
+
+        if frame_result['engagement_score'] > 0:
+            self.engagement.add(frame_result['engagement_score'], span)
+        self.attention.update(timestamp, frame_result['engagement_score'])
+        self.camera_motion.add(frame_result.get('camera_motion', 0.0), span)
+
+        if frame_result['faces_detected'] > 0:
+            self.face_frames += 1
+        if frame_result['motion_score'] > 0:
+            self.motion.add(frame_result['motion_score'], span)
+
+        self.timeline.add(timestamp, (
+            frame_result['faces_detected'],
+            frame_result['face_confidence'],
+            frame_result['engagement_score'],
+            frame_result['motion_score'],
+            frame_result.get('camera_motion', 0.0)
+        ))
+
+    def merge(self, other: "AnalysisAggregator") -> "AnalysisAggregator":
+        """Append the aggregate of the segment that directly follows this one"""
+        self.frames += other.frames
+        self.face_frames += other.face_frames
+        self.engagement.merge(other.engagement)
+        self.motion.merge(other.motion)
+        self.camera_motion.merge(other.camera_motion)
+        self.attention.merge(other.attention)
+        self.timeline.merge(other.timeline)
+        return self
+
+    def frame_series(self) -> FrameSeries:
+        return FrameSeries.from_points(self.timeline.to_array(), self.timeline.weights())
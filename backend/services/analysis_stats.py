@@ -0,0 +1,298 @@
+import heapq
+import math
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class RunningStats:
+    """
+    Streaming weighted mean, variance, minimum and maximum (West's weighted
+    form of Welford's algorithm).
+
+    Uses constant memory regardless of how many values are added, and two
+    instances can be merged, so per-segment statistics from worker processes
+    combine into exact whole-video statistics. ``count`` is the number of
+    values; ``weight`` their total weight (1 each unless given).
+    """
+
+    __slots__ = ("count", "weight", "mean", "_m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.weight = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: float = 1.0):
+        if weight <= 0:
+            return
+        self.count += 1
+        self.weight += weight
+        delta = value - self.mean
+        self.mean += delta * weight / self.weight
+        self._m2 += weight * delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Fold another instance's values into this one (Chan et al.)"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.weight, self.mean, self._m2 = other.count, other.weight, other.mean, other._m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        weight = self.weight + other.weight
+        delta = other.mean - self.mean
+        self.mean += delta * other.weight / weight
+        self._m2 += other._m2 + delta * delta * self.weight * other.weight / weight
+        self.count += other.count
+        self.weight = weight
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.weight if self.weight else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(0.0, self.variance))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else 0.0,
+            'std': self.std,
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0
+        }
+
+    def __getstate__(self):
+        return (self.count, self.weight, self.mean, self._m2, self.min, self.max)
+
+    def __setstate__(self, state):
+        self.count, self.weight, self.mean, self._m2, self.min, self.max = state
+
+
+Period = Tuple[float, float]
+
+
+class AttentionPeriods:
+    """
+    Online detection of periods where a score stays above a threshold.
+
+    Frames are fed one at a time. The count and total duration of closed
+    periods are kept exactly, while only the longest max_periods periods are
+    retained for reporting, so memory is bounded by max_periods. A period
+    still open at the end of a segment is carried into the next segment on
+    merge, giving the same result as scanning the whole video at once.
+    """
+
+    def __init__(self, threshold: float = 0.5, max_periods: int = 200):
+        self.threshold = threshold
+        self.max_periods = max_periods
+        self.count = 0
+        self.total_duration = 0.0
+        self.first_timestamp: Optional[float] = None
+        self.open_start: Optional[float] = None
+        # A period starting at the first frame is kept aside so a preceding segment can extend it
+        self.leading: Optional[Period] = None
+        self._longest: List[Tuple[float, float, float]] = []  # Min-heap of (duration, start, end)
+
+    def update(self, timestamp: float, score: float):
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        if score > self.threshold:
+            if self.open_start is None:
+                self.open_start = timestamp
+        elif self.open_start is not None:
+            self._close(timestamp)
+
+    def finish(self, end: float) -> "AttentionPeriods":
+        """Close a period still open at the end of the video"""
+        if self.open_start is not None:
+            self._close(end)
+        return self
+
+    def _close(self, end: float):
+        start, self.open_start = self.open_start, None
+        self._add((start, end))
+
+    def _add(self, period: Period):
+        self.count += 1
+        self.total_duration += period[1] - period[0]
+        if period[0] == self.first_timestamp and self.leading is None:
+            self.leading = period
+        else:
+            self._keep(period)
+
+    def _keep(self, period: Period):
+        item = (period[1] - period[0], period[0], period[1])
+        if len(self._longest) < self.max_periods:
+            heapq.heappush(self._longest, item)
+        elif item > self._longest[0]:
+            heapq.heapreplace(self._longest, item)
+
+    def merge(self, other: "AttentionPeriods") -> "AttentionPeriods":
+        """Append the periods of the segment that directly follows this one"""
+        if other.first_timestamp is None:
+            return self
+        if self.first_timestamp is None:
+            self.__setstate__(other.__getstate__())
+            return self
+
+        open_start = other.open_start
+        if self.open_start is not None:
+            if other.leading is not None:
+                # Our open period continues into the other segment's first period
+                self._add((self.open_start, other.leading[1]))
+            elif other.open_start == other.first_timestamp:
+                # Engaged through the whole other segment; stays open
+                open_start = self.open_start
+            else:
+                self._close(other.first_timestamp)
+        elif other.leading is not None:
+            self._add(other.leading)
+
+        self.count += other.count - (1 if other.leading is not None else 0)
+        self.total_duration += other.total_duration - (
+            other.leading[1] - other.leading[0] if other.leading is not None else 0.0
+        )
+        for _, start, end in other._longest:
+            self._keep((start, end))
+        self.open_start = open_start
+        return self
+
+    @property
+    def average_duration(self) -> float:
+        return self.total_duration / self.count if self.count else 0.0
+
+    def periods(self) -> List[Dict[str, float]]:
+        """Retained closed periods in time order"""
+        kept = [(start, end) for _, start, end in self._longest]
+        if self.leading is not None:
+            kept.append(self.leading)
+        return [
+            {'start': start, 'end': end, 'duration': end - start}
+            for start, end in sorted(kept)
+        ]
+
+    def __getstate__(self):
+        return (
+            self.threshold, self.max_periods, self.count, self.total_duration,
+            self.first_timestamp, self.open_start, self.leading, list(self._longest)
+        )
+
+    def __setstate__(self, state):
+        (self.threshold, self.max_periods, self.count, self.total_duration,
+         self.first_timestamp, self.open_start, self.leading, self._longest) = state
+        self._longest = list(self._longest)
+
+
+class DecimatingTimeline:
+    """
+    Fixed-capacity time series that halves its resolution when it fills up.
+
+    Each stored point is the mean of a bucket of consecutive samples (with the
+    bucket's first timestamp). When the buffer is full, neighbouring points
+    are merged pairwise and new buckets hold twice as many samples, so a
+    timeline of any length fits in ``capacity`` points at uniform resolution.
+    """
+
+    def __init__(self, fields: Sequence[str], capacity: int = 4096):
+        self.fields = tuple(fields)
+        self.capacity = max(2, capacity - capacity % 2)
+        self.stride = 1
+        self.size = 0
+        # Column 0 is the timestamp, then one column per field
+        self._points = np.empty((self.capacity, len(self.fields) + 1), dtype=np.float64)
+        self._weights = np.empty(self.capacity, dtype=np.int64)
+        self._pending = np.zeros(len(self.fields) + 1, dtype=np.float64)
+        self._pending_count = 0
+
+    def add(self, timestamp: float, values: Sequence[float]):
+        if self._pending_count == 0:
+            self._pending[0] = timestamp
+            self._pending[1:] = 0.0
+        self._pending[1:] += values
+        self._pending_count += 1
+        if self._pending_count == self.stride:
+            self._flush()
+
+    def _flush(self):
+        if self.size == self.capacity:
+            self._halve()
+        row = self._pending.copy()
+        row[1:] /= self._pending_count
+        self._points[self.size] = row
+        self._weights[self.size] = self._pending_count
+        self.size += 1
+        self._pending_count = 0
+
+    def _halve(self):
+        points, weights = self._combine_pairs(self._points[:self.size], self._weights[:self.size])
+        self.size = len(points)
+        self._points[:self.size] = points
+        self._weights[:self.size] = weights
+        self.stride *= 2
+
+    @staticmethod
+    def _combine_pairs(points: np.ndarray, weights: np.ndarray):
+        """Merge neighbouring points pairwise (weighted means); an odd last point is kept as is"""
+        even = len(points) - len(points) % 2
+        first, second = points[0:even:2], points[1:even:2]
+        first_weight, second_weight = weights[0:even:2], weights[1:even:2]
+        total = first_weight + second_weight
+        merged = np.empty_like(first)
+        merged[:, 0] = first[:, 0]
+        merged[:, 1:] = (
+            first[:, 1:] * first_weight[:, None] + second[:, 1:] * second_weight[:, None]
+        ) / total[:, None]
+        if even < len(points):
+            merged = np.vstack([merged, points[even:]])
+            total = np.concatenate([total, weights[even:]])
+        return merged, total
+
+    def _arrays(self):
+        """Stored points plus the partially filled bucket"""
+        points, weights = self._points[:self.size], self._weights[:self.size]
+        if self._pending_count:
+            row = self._pending.copy()
+            row[1:] /= self._pending_count
+            points = np.vstack([points, row])
+            weights = np.append(weights, self._pending_count)
+        return points, weights
+
+    def merge(self, other: "DecimatingTimeline") -> "DecimatingTimeline":
+        """Append the timeline of the segment that directly follows this one"""
+        own_points, own_weights = self._arrays()
+        other_points, other_weights = other._arrays()
+        points = np.vstack([own_points, other_points])
+        weights = np.concatenate([own_weights, other_weights])
+        stride = max(self.stride, other.stride)
+        while len(points) > self.capacity:
+            points, weights = self._combine_pairs(points, weights)
+            stride *= 2
+
+        self.size = len(points)
+        self._points[:self.size] = points
+        self._weights[:self.size] = weights
+        self.stride = stride
+        self._pending_count = 0
+        return self
+
+    def to_array(self) -> np.ndarray:
+        """(points, 1 + fields) array of bucket timestamps followed by the field means"""
+        return self._arrays()[0]
+
+    def weights(self) -> np.ndarray:
+        """Samples averaged into each point of to_array()"""
+        return self._arrays()[1]
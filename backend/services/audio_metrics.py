@@ -0,0 +1,180 @@
+import math
+import wave
+import logging
+from typing import Dict, Any, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Window loudness histogram: 1 dB bins from -100 dBFS to 0 dBFS
+HISTOGRAM_FLOOR_DB = -100
+HISTOGRAM_BINS = 101
+
+WINDOWS_PER_BLOCK = 512
+CLIP_LEVEL = 0.99  # |sample| at or above this counts as clipped
+SPEECH_MARGIN_DB = 10.0  # Windows this far above the noise floor count as speech
+SILENCE_DB = -50.0  # Windows quieter than this are never speech
+TARGET_SNR_DB = 30.0
+TARGET_LOUDNESS_DB = (-30.0, -12.0)  # Comfortable speech RMS range in dBFS
+
+
+class AudioQualityAnalyzer:
+    """
+    One-pass audio quality metrics over PCM in fixed windows.
+
+    Windows are processed in vectorized blocks; each contributes its RMS
+    level to a 1 dB histogram and its clipped-sample count to a running
+    total, so memory stays O(block) no matter how long the recording is.
+    The noise floor and speech level are percentiles of the histogram; the
+    SNR estimate is their difference and speech windows are those well
+    above the floor.
+    """
+
+    def __init__(self, sample_rate: int, window_seconds: float = 0.03):
+        self.sample_rate = sample_rate
+        self.window_size = max(1, int(sample_rate * window_seconds))
+        self.histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.windows = 0
+        self.samples = 0
+        self.clipped = 0
+        self.clip_checked = 0  # Samples checked for clipping; counts every channel when added with add_clipping
+        self.sum_squares = 0.0
+
+    def add_windows(self, block: np.ndarray, count_clipping: bool = True):
+        """
+        Add a (windows, window_size) block of mono float samples in [-1, 1]
+
+        Levels, histogram bins and clipping are computed for the whole block at once.
+        count_clipping is False when clipping was already counted per channel.
+        """
+        if block.size == 0:
+            return
+        energy = np.einsum("ij,ij->i", block, block, dtype=np.float64)
+        rms = np.sqrt(energy / block.shape[1])
+        with np.errstate(divide="ignore"):
+            levels = 20.0 * np.log10(rms)
+        bins = np.clip(np.rint(levels - HISTOGRAM_FLOOR_DB), 0, HISTOGRAM_BINS - 1)
+        bins = np.nan_to_num(bins, nan=0).astype(np.int64)
+
+        self.histogram += np.bincount(bins, minlength=HISTOGRAM_BINS)
+        self.windows += block.shape[0]
+        self.samples += block.size
+        self.sum_squares += float(energy.sum())
+        if count_clipping:
+            self.add_clipping(block)
+
+    def add_clipping(self, samples: np.ndarray):
+        """Count clipped samples, e.g. of every channel before a downmix averages peaks away"""
+        self.clipped += int(np.count_nonzero(np.abs(samples) >= CLIP_LEVEL))
+        self.clip_checked += samples.size
+
+    def add_samples(self, samples: np.ndarray, count_clipping: bool = True):
+        """Add a buffer of mono float samples, split into fixed windows"""
+        full = samples.size // self.window_size * self.window_size
+        # Process in blocks of windows so temporaries stay small for long recordings
+        block_samples = self.window_size * WINDOWS_PER_BLOCK
+        for start in range(0, full, block_samples):
+            stop = min(full, start + block_samples)
+            self.add_windows(samples[start:stop].reshape(-1, self.window_size), count_clipping)
+        if full < samples.size:
+            self.add_windows(samples[full:].reshape(1, -1), count_clipping)
+
+    def _percentile_db(self, fraction: float) -> float:
+        cumulative = np.cumsum(self.histogram)
+        index = int(np.searchsorted(cumulative, fraction * cumulative[-1]))
+        return float(HISTOGRAM_FLOOR_DB + min(index, HISTOGRAM_BINS - 1))
+
+    def result(self) -> Dict[str, Any]:
+        """Summarize everything added so far"""
+        if self.windows == 0:
+            return {'audio_quality_score': 0.0, 'duration': 0.0}
+
+        noise_floor = self._percentile_db(0.1)
+        speech_level = self._percentile_db(0.9)
+        speech_threshold = max(noise_floor + SPEECH_MARGIN_DB, SILENCE_DB)
+        first_speech_bin = int(math.ceil(speech_threshold - HISTOGRAM_FLOOR_DB))
+        speech_windows = int(self.histogram[first_speech_bin:].sum())
+
+        overall_rms = math.sqrt(self.sum_squares / self.samples)
+        loudness = 20.0 * math.log10(overall_rms) if overall_rms > 0 else float(HISTOGRAM_FLOOR_DB)
+        snr = max(0.0, speech_level - noise_floor)
+        clipping_ratio = self.clipped / self.clip_checked if self.clip_checked else 0.0
+
+        snr_score = min(1.0, snr / TARGET_SNR_DB)
+        low, high = TARGET_LOUDNESS_DB
+        if low <= speech_level <= high:
+            loudness_score = 1.0
+        else:
+            loudness_score = max(0.0, 1.0 - min(abs(speech_level - low), abs(speech_level - high)) / 20.0)
+        clipping_score = max(0.0, 1.0 - clipping_ratio * 100.0)
+
+        return {
+            'audio_quality_score': (snr_score + loudness_score + clipping_score) / 3.0,
+            'duration': self.samples / self.sample_rate,
+            'rms_loudness_db': loudness,
+            'speech_level_db': speech_level,
+            'noise_floor_db': noise_floor,
+            'estimated_snr_db': snr,
+            'clipping_ratio': clipping_ratio,
+            'speech_ratio': speech_windows / self.windows
+        }
+
+
+def analyze_pcm(samples: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    """
+    Audio quality metrics for an already decoded mono float buffer
+
+    Args:
+        samples: Mono samples in [-1, 1], e.g. the buffer decoded for transcription
+        sample_rate: Samples per second
+
+    Returns:
+        Dictionary of audio quality metrics
+    """
+    analyzer = AudioQualityAnalyzer(sample_rate)
+    analyzer.add_samples(np.asarray(samples, dtype=np.float32))
+    return analyzer.result()
+
+
+def _wav_chunks(wav: wave.Wave_read, frames_per_chunk: int) -> Iterable[np.ndarray]:
+    """(frames, channels) float blocks of a WAV file in [-1, 1]"""
+    channels = wav.getnchannels()
+    width = wav.getsampwidth()
+    if width not in (1, 2, 4):
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+    scale = float(2 ** (8 * width - 1))
+    while True:
+        data = wav.readframes(frames_per_chunk)
+        if not data:
+            return
+        samples = np.frombuffer(data, dtype=dtype).astype(np.float32)
+        if width == 1:
+            samples -= 128.0  # 8-bit WAV is unsigned
+        samples /= scale
+        yield samples.reshape(-1, channels)
+
+
+def analyze_wav(audio_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Stream a PCM WAV file from disk in fixed windows and measure its quality
+
+    Args:
+        audio_path: Path to a PCM WAV file
+
+    Returns:
+        Dictionary of audio quality metrics or None if failed
+    """
+    try:
+        with wave.open(audio_path, "rb") as wav:
+            analyzer = AudioQualityAnalyzer(wav.getframerate())
+            for chunk in _wav_chunks(wav, analyzer.window_size * WINDOWS_PER_BLOCK):
+                # A peak clipped in one channel is averaged below the clip level by the downmix
+                analyzer.add_clipping(chunk)
+                analyzer.add_samples(chunk.mean(axis=1) if chunk.shape[1] > 1 else chunk[:, 0], count_clipping=False)
+        return analyzer.result()
+    except Exception as e:
+        logger.error(f"Error analyzing audio quality for {audio_path}: {str(e)}")
+        return None
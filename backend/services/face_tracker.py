@@ -0,0 +1,218 @@
+import logging
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Normalized (xmin, ymin, xmax, ymax)
+Box = Tuple[float, float, float, float]
+
+
+def box_iou(a: Box, b: Box) -> float:
+    """Intersection over union of two normalized boxes"""
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def _match_boxes(track_boxes: Sequence[Box], boxes: Sequence[Box], threshold: float) -> Dict[int, int]:
+    """Greedy IoU matching; returns {box_index: track_index}"""
+    pairs = sorted(
+        ((box_iou(track_box, box), t, b) for t, track_box in enumerate(track_boxes) for b, box in enumerate(boxes)),
+        reverse=True
+    )
+    matches = {}
+    used_tracks = set()
+    for iou, t, b in pairs:
+        if iou < threshold:
+            break
+        if b in matches or t in used_tracks:
+            continue
+        matches[b] = t
+        used_tracks.add(t)
+    return matches
+
+
+class FaceTrack:
+    def __init__(self, track_id: int, box: Box, timestamp: float):
+        self.track_id = track_id
+        self.box = box
+        self.first_box = box
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.missed = 0
+        self.frames = 0
+        self.engagement: Optional[float] = None
+        self.engagement_sum = 0.0
+        self.engagement_frames = 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.track_id,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'frames_tracked': self.frames,
+            'avg_engagement': self.engagement_sum / self.engagement_frames if self.engagement_frames else 0.0,
+            'engagement_frames': self.engagement_frames,
+            'first_box': self.first_box,
+            'last_box': self.box
+        }
+
+
+class FaceTracker:
+    """
+    Detect-then-track bookkeeping for every face in view.
+
+    Face detection boxes from each sampled frame are associated with existing
+    tracks by IoU, which keeps a stable ID per person. The full face mesh only
+    needs to run every ``mesh_interval`` frames (or when a new face appears);
+    in between, each track carries its last mesh-based engagement score.
+    """
+
+    def __init__(self, mesh_interval: int, iou_threshold: float = 0.3, max_missed: int = 4):
+        """
+        Args:
+            mesh_interval: Run the face mesh at least every this many sampled frames
+            iou_threshold: Minimum IoU to associate a detection with a track
+            max_missed: Sampled frames a track may go undetected before it is closed
+        """
+        self.mesh_interval = max(1, mesh_interval)
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.active: List[FaceTrack] = []
+        self.finished: List[FaceTrack] = []
+        self._next_id = 1
+        self._frames_since_mesh = self.mesh_interval
+        self._new_face = False
+        self._visible: List[FaceTrack] = []
+
+    def update(self, boxes: Sequence[Box], timestamp: float):
+        """
+        Associate this frame's face detections with tracks
+
+        Args:
+            boxes: Detected face boxes in normalized coordinates
+            timestamp: Frame timestamp in seconds
+        """
+        matches = _match_boxes([track.box for track in self.active], boxes, self.iou_threshold)
+
+        self._visible = []
+        self._new_face = False
+        for b, box in enumerate(boxes):
+            if b in matches:
+                track = self.active[matches[b]]
+                track.box = box
+                track.missed = 0
+            else:
+                track = FaceTrack(self._next_id, box, timestamp)
+                self._next_id += 1
+                self.active.append(track)
+                self._new_face = True
+            track.last_seen = timestamp
+            track.frames += 1
+            self._visible.append(track)
+
+        still_active = []
+        for track in self.active:
+            if track not in self._visible:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self.finished.append(track)
+                    continue
+            still_active.append(track)
+        self.active = still_active
+        self._frames_since_mesh += 1
+
+    def needs_mesh(self) -> bool:
+        """True when the face mesh should run on the current frame"""
+        if not self._visible:
+            return False
+        return self._new_face or self._frames_since_mesh >= self.mesh_interval
+
+    def assign_engagement(self, mesh_faces: Sequence[Tuple[Box, float]]):
+        """
+        Attach face mesh engagement scores to the visible tracks
+
+        Args:
+            mesh_faces: (box, engagement_score) for each face the mesh found
+        """
+        self._frames_since_mesh = 0
+        matches = _match_boxes([track.box for track in self._visible], [box for box, _ in mesh_faces], self.iou_threshold)
+        for m, t in matches.items():
+            self._visible[t].engagement = mesh_faces[m][1]
+
+    def frame_engagement(self) -> float:
+        """Mean engagement of the faces visible in the current frame, and accumulate per-person totals"""
+        scores = []
+        for track in self._visible:
+            if track.engagement is not None:
+                track.engagement_sum += track.engagement
+                track.engagement_frames += 1
+                scores.append(track.engagement)
+        return sum(scores) / len(scores) if scores else 0.0
+
+    def summary(self, min_frames: int = 2) -> List[Dict[str, Any]]:
+        """Per-person results for every track seen on at least min_frames frames"""
+        tracks = sorted(self.finished + self.active, key=lambda track: track.track_id)
+        return [track.summary() for track in tracks if track.frames >= min_frames]
+
+
+def stitch_people(segments: List[List[Dict[str, Any]]], boundaries: List[float], gap: float, iou_threshold: float = 0.3) -> List[Dict[str, Any]]:
+    """
+    Merge per-segment person summaries into one list with lesson-wide IDs
+
+    A person whose track ends at a segment boundary is joined with a track
+    that starts right after it in about the same place.
+
+    Args:
+        segments: Person summaries from each segment, in time order
+        boundaries: Start time of each segment in seconds
+        gap: Largest time difference across a boundary that still joins two tracks
+        iou_threshold: Minimum IoU between the last and first boxes to join tracks
+
+    Returns:
+        Person summaries with IDs renumbered across the whole lesson
+    """
+    people: List[Dict[str, Any]] = []
+    previous: List[Dict[str, Any]] = []
+
+    for index, segment_people in enumerate(segments):
+        boundary = boundaries[index]
+        ending = [person for person in previous if boundary - person['last_seen'] <= gap]
+        starting = [person for person in segment_people if person['first_seen'] - boundary <= gap]
+        matches = _match_boxes([person['last_box'] for person in ending], [person['first_box'] for person in starting], iou_threshold)
+
+        current = []
+        for p, person in enumerate(starting):
+            if p in matches:
+                merged = ending[matches[p]]
+                total_frames = merged['engagement_frames'] + person['engagement_frames']
+                if total_frames:
+                    merged['avg_engagement'] = (
+                        merged['avg_engagement'] * merged['engagement_frames']
+                        + person['avg_engagement'] * person['engagement_frames']
+                    ) / total_frames
+                merged['engagement_frames'] = total_frames
+                merged['frames_tracked'] += person['frames_tracked']
+                merged['last_seen'] = person['last_seen']
+                merged['last_box'] = person['last_box']
+                current.append(merged)
+            else:
+                person = dict(person)
+                people.append(person)
+                current.append(person)
+        starting_ids = {id(person) for person in starting}
+        for person in segment_people:
+            if id(person) not in starting_ids:
+                person = dict(person)
+                people.append(person)
+                current.append(person)
+        previous = current
+
+    # Boxes are only needed for stitching
+    for person_id, person in enumerate(people, start=1):
+        person['id'] = person_id
+        person.pop('first_box', None)
+        person.pop('last_box', None)
+    return people
@@ -0,0 +1,230 @@
+import json
+import logging
+from typing import Annotated, Dict, Any, List, Tuple, get_type_hints
+
+from pydantic import BaseModel, BeforeValidator, Field, TypeAdapter, ValidationError
+
+logger = logging.getLogger(__name__)
+
+SCORE_FIELDS = ("teaching_quality_score", "student_engagement_score", "overall_score")
+TEXT_FIELDS = ("strengths", "areas_for_improvement", "specific_recommendations")
+FEEDBACK_FIELDS = SCORE_FIELDS + TEXT_FIELDS
+
+CYRILLIC_LANGUAGES = ("ru", "tj")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _parse_score(value):
+    # Models sometimes answer "8/10" or "8.5 out of 10"
+    if isinstance(value, str) and value.strip():
+        try:
+            return float(value.strip().split("/")[0].split()[0])
+        except ValueError:
+            return value
+    return value
+
+
+def _join_items(value):
+    # Lists of points (or {"title": ..., "details": ...} items) become one paragraph
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        return " ".join(
+            " ".join(str(part) for part in item.values()) if isinstance(item, dict) else str(item)
+            for item in value
+        )
+    return value.strip() if isinstance(value, str) else value
+
+
+Score = Annotated[float, BeforeValidator(_parse_score), Field(ge=0.0, le=10.0)]
+Section = Annotated[str, BeforeValidator(_join_items), Field(min_length=20)]
+
+
+class FeedbackOutput(BaseModel):
+    """The feedback object the LLM is asked to return"""
+    teaching_quality_score: Score
+    student_engagement_score: Score
+    overall_score: Score
+    strengths: Section
+    areas_for_improvement: Section
+    specific_recommendations: Section
+
+
+# Fields are validated one by one against the model's annotations, so a single bad field does not
+# discard the others and FeedbackOutput stays the one definition of the schema
+_FIELD_HINTS = get_type_hints(FeedbackOutput, include_extras=True)
+_FIELD_ADAPTERS = {field: TypeAdapter(_FIELD_HINTS[field]) for field in FeedbackOutput.model_fields}
+
+
+class PartialJSONParser:
+    """
+    Tolerant, incremental parser for the JSON object in an LLM response.
+
+    Text is fed in any number of pieces. Prose or code fences before the
+    first ``{`` and anything after the object closes are ignored, raw
+    newlines inside strings are escaped and trailing commas are dropped.
+    ``snapshot`` returns everything parsed so far, closing open strings and
+    brackets, so a response truncated at max_tokens still yields all the
+    fields it completed (and the partial one being written).
+    """
+
+    def __init__(self):
+        self.out: List[str] = []
+        self.stack: List[str] = []
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.string_is_key = False
+        self.escape = False
+        self.expect_key = False
+        self.pending_comma = False
+        # Longest prefix of ``out`` that is a complete value, and the brackets open at that point
+        self.safe_length = 0
+        self.safe_stack: Tuple[str, ...] = ()
+        self.length = 0
+
+    def feed(self, text: str) -> "PartialJSONParser":
+        for char in text:
+            if self.done:
+                break
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self._open(char)
+                continue
+            if self.in_string:
+                self._string_char(char)
+            else:
+                self._structural_char(char)
+        return self
+
+    def _emit(self, text: str):
+        self.out.append(text)
+        self.length += len(text)
+
+    def _mark_safe(self):
+        self.safe_length = self.length
+        self.safe_stack = tuple(self.stack)
+
+    def _flush_comma(self):
+        if self.pending_comma:
+            self._emit(",")
+            self.pending_comma = False
+
+    def _open(self, char: str):
+        self._flush_comma()
+        self._emit(char)
+        self.stack.append(_CLOSERS[char])
+        self.expect_key = char == "{"
+        self._mark_safe()
+
+    def _string_char(self, char: str):
+        if self.escape:
+            self.escape = False
+            self._emit(char)
+        elif char == "\\":
+            self.escape = True
+            self._emit(char)
+        elif char == '"':
+            self.in_string = False
+            self._emit(char)
+            if not self.string_is_key:
+                self._mark_safe()
+        elif char < " ":
+            self._emit(json.dumps(char)[1:-1])  # Raw newlines and tabs are invalid JSON
+        else:
+            self._emit(char)
+
+    def _structural_char(self, char: str):
+        if char.isspace():
+            return
+        if char in "{[":
+            self._open(char)
+        elif char in "}]":
+            self.pending_comma = False  # Trailing comma
+            if self.stack:
+                self._emit(self.stack.pop())
+            self.expect_key = False
+            self._mark_safe()
+            if not self.stack:
+                self.done = True
+        elif char == ",":
+            self._mark_safe()  # Cut before the comma: the value before it is complete
+            self.pending_comma = True
+            self.expect_key = bool(self.stack) and self.stack[-1] == "}"
+        elif char == ":":
+            self._emit(char)
+            self.expect_key = False
+        elif char == '"':
+            self._flush_comma()
+            self.in_string = True
+            self.string_is_key = self.expect_key
+            self._emit(char)
+        else:
+            self._flush_comma()
+            self._emit(char)  # Part of a number or literal
+
+    def snapshot(self, include_partial: bool = True) -> Dict[str, Any]:
+        """
+        Everything parsed so far as a dict (empty if nothing usable yet)
+
+        Args:
+            include_partial: Include the string value still being written, cut where the text ends
+        """
+        if not self.started:
+            return {}
+        text = "".join(self.out)
+        candidates = []
+        if include_partial and self.in_string and not self.string_is_key:
+            # Keep the value being written, e.g. a section still streaming
+            partial = text[:-1] if self.escape else text
+            candidates.append(partial + '"' + "".join(reversed(self.stack)))
+        candidates.append(text[:self.safe_length] + "".join(reversed(self.safe_stack)))
+        for candidate in candidates:
+            try:
+                value = json.loads(candidate)
+                return value if isinstance(value, dict) else {}
+            except json.JSONDecodeError:
+                continue
+        return {}
+
+
+def parse_feedback_json(content: str) -> Dict[str, Any]:
+    """The feedback object in a complete response; a value cut off at max_tokens is left out"""
+    return PartialJSONParser().feed(content or "").snapshot(include_partial=False)
+
+
+def is_wrong_language(text: str, language: str) -> bool:
+    """Whether a feedback section is written in a different script than the feedback language"""
+    cyrillic = sum(1 for char in text if "Ѐ" <= char <= "ӿ")
+    latin = sum(1 for char in text if char.isascii() and char.isalpha())
+    if language in CYRILLIC_LANGUAGES:
+        return latin > cyrillic
+    return cyrillic > latin
+
+
+def validate_feedback(data: Dict[str, Any], language: str) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Check feedback fields against the schema and the requested language
+
+    Args:
+        data: Parsed (possibly partial) feedback object
+        language: Feedback language code
+
+    Returns:
+        Normalized valid fields, and the names of missing, invalid or wrong-language fields
+    """
+    feedback, invalid = {}, []
+    for field in FEEDBACK_FIELDS:
+        try:
+            feedback[field] = _FIELD_ADAPTERS[field].validate_python(data.get(field))
+        except ValidationError:
+            invalid.append(field)
+
+    for field in TEXT_FIELDS:
+        if field in feedback and is_wrong_language(feedback[field], language):
+            logger.warning(f"Feedback field {field} is not in {language}")
+            del feedback[field]
+            invalid.append(field)
+
+    return feedback, [field for field in FEEDBACK_FIELDS if field in invalid]
@@ -0,0 +1,190 @@
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from config.settings import settings
+from services.feedback_parser import PartialJSONParser, TEXT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Stream of the feedback being generated in this context, if a client may be listening
+_current_stream: ContextVar[Optional["FeedbackStream"]] = ContextVar("feedback_stream", default=None)
+
+
+class FeedbackChannel:
+    """Events of one feedback generation, kept for replay so late subscribers catch up"""
+
+    def __init__(self):
+        self.history: List[Tuple[str, Dict[str, Any]]] = []
+        self.closed = False
+        self.owner: Optional[object] = None
+        self.condition = threading.Condition()
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        with self.condition:
+            if self.closed:
+                return
+            self.history.append((event, data))
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def events(self, keepalive: float) -> Iterator[Optional[Tuple[str, Dict[str, Any]]]]:
+        """Replay and then follow the events; None every keepalive seconds without one"""
+        index = 0
+        while True:
+            with self.condition:
+                if index >= len(self.history) and not self.closed:
+                    self.condition.wait(keepalive)
+                batch = self.history[index:]
+                index += len(batch)
+                finished = self.closed and index >= len(self.history)
+            if not batch and not finished:
+                yield None
+            yield from batch
+            if finished:
+                return
+
+
+class FeedbackBroker:
+    """
+    In-process fan-out of feedback generation events, by video id.
+
+    The pipeline publishes into a channel while generating; any number of
+    SSE clients subscribe to it. Channels only exist while feedback is
+    being generated, in the process that generates it.
+    """
+
+    def __init__(self):
+        self._channels: Dict[int, FeedbackChannel] = {}
+        self._condition = threading.Condition()
+
+    def open(self, video_id: int) -> FeedbackChannel:
+        with self._condition:
+            channel = self._channels[video_id] = FeedbackChannel()
+            self._condition.notify_all()
+            return channel
+
+    def close(self, video_id: int, channel: FeedbackChannel):
+        channel.close()
+        with self._condition:
+            if self._channels.get(video_id) is channel:
+                del self._channels[video_id]
+
+    def wait_for_channel(self, video_id: int, timeout: float) -> Optional[FeedbackChannel]:
+        """The live channel of a video, waiting up to timeout for generation to start"""
+        with self._condition:
+            self._condition.wait_for(lambda: video_id in self._channels, timeout)
+            return self._channels.get(video_id)
+
+
+feedback_broker = FeedbackBroker()
+
+
+class FeedbackStream:
+    """
+    Publishes the feedback generation of one video for SSE clients.
+
+    Used as a context manager around feedback generation: the channel is
+    opened and made current for the code (and copied contexts) inside,
+    and closed with a ``done`` event on exit.
+    """
+
+    def __init__(self, video_id: int, language: str):
+        self.video_id = video_id
+        self.language = language
+        self.channel: Optional[FeedbackChannel] = None
+        self._token = None
+
+    def __enter__(self) -> "FeedbackStream":
+        self.channel = feedback_broker.open(self.video_id)
+        self._token = _current_stream.set(self)
+        self.publish("status", {'state': "generating", 'language': self.language})
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current_stream.reset(self._token)
+        self.publish("done", {'ok': exc_type is None})
+        feedback_broker.close(self.video_id, self.channel)
+        return False
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        self.channel.publish(event, data)
+
+    def relay(self, model: str) -> "SectionRelay":
+        return SectionRelay(self, model)
+
+    def claim(self, relay: "SectionRelay") -> bool:
+        """Let the first attempt that produces text own the stream; hedged attempts stay silent"""
+        with self.channel.condition:
+            if self.channel.owner is None:
+                self.channel.owner = relay
+            return self.channel.owner is relay
+
+    def release(self, relay: "SectionRelay"):
+        """Give up ownership after a failed attempt; clients discard what it streamed"""
+        with self.channel.condition:
+            if self.channel.owner is not relay:
+                return
+            self.channel.owner = None
+        self.publish("reset", {'model': relay.model})
+
+
+class SectionRelay:
+    """
+    Turns the token deltas of one streaming completion into section events.
+
+    Deltas are fed to a PartialJSONParser; at most every
+    ``feedback_stream_interval`` seconds the sections parsed so far are
+    compared with what clients already have and the new text is sent.
+    """
+
+    def __init__(self, stream: FeedbackStream, model: str):
+        self.stream = stream
+        self.model = model
+        self.parser = PartialJSONParser()
+        self.sent: Dict[str, str] = {}
+        self.last_flush = 0.0
+
+    def feed(self, delta: str):
+        self.parser.feed(delta)
+        now = time.monotonic()
+        if now - self.last_flush >= settings.feedback_stream_interval:
+            self.last_flush = now
+            self._flush()
+
+    def finish(self, valid: bool):
+        """End of this attempt: send the rest if it produced usable feedback, otherwise retract it"""
+        if valid:
+            self._flush()
+        else:
+            self.stream.release(self)
+
+    def _flush(self):
+        snapshot = self.parser.snapshot()
+        updates = []
+        for field in TEXT_FIELDS:
+            value = snapshot.get(field)
+            if value is None:
+                continue
+            text = " ".join(str(item) for item in value) if isinstance(value, list) else str(value)
+            sent = self.sent.get(field, "")
+            if text != sent:
+                updates.append((field, text, sent))
+        if not updates or not self.stream.claim(self):
+            return
+        for field, text, sent in updates:
+            if text.startswith(sent):
+                self.stream.publish("section", {'field': field, 'delta': text[len(sent):], 'model': self.model})
+            else:
+                self.stream.publish("section", {'field': field, 'text': text, 'replace': True, 'model': self.model})
+            self.sent[field] = text
+
+
+def current_feedback_stream() -> Optional[FeedbackStream]:
+    return _current_stream.get()
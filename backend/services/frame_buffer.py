@@ -0,0 +1,82 @@
+import cv2
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FrameBuffer:
+    """
+    Per-frame preprocessing shared by every detector and metric.
+
+    Each sampled frame is resized once to the analysis resolution, and the
+    RGB, grayscale and blurred grayscale images are written into buffers that
+    are allocated once and reused for every following frame of the same size.
+    """
+
+    def __init__(self, max_width: int, blur_kernel: int = 21):
+        """
+        Args:
+            max_width: Frames wider than this are downscaled to it (0 keeps full resolution)
+            blur_kernel: Gaussian kernel size at 1920 px width, scaled to the analysis width
+        """
+        self.max_width = max_width
+        self.base_blur_kernel = blur_kernel
+        self.size: Optional[Tuple[int, int]] = None
+        self.source_size: Optional[Tuple[int, int]] = None
+
+        self.bgr: Optional[np.ndarray] = None
+        self.rgb: Optional[np.ndarray] = None
+        self.gray: Optional[np.ndarray] = None
+        self.blurred: Optional[np.ndarray] = None
+        self._resized: Optional[np.ndarray] = None
+        self._blur_ksize = (blur_kernel, blur_kernel)
+
+    def update(self, frame: np.ndarray) -> "FrameBuffer":
+        """
+        Load a new BGR frame into the shared buffers
+
+        Args:
+            frame: Full-resolution BGR frame from the decoder
+
+        Returns:
+            self, so the call can be passed straight to the analysis step
+        """
+        height, width = frame.shape[:2]
+        if (width, height) != self.source_size:
+            self._allocate(width, height)
+
+        if self._resized is not None:
+            cv2.resize(frame, self.size, dst=self._resized, interpolation=cv2.INTER_AREA)
+            self.bgr = self._resized
+        else:
+            # Already at analysis resolution; use the decoder's frame without copying
+            self.bgr = frame
+
+        cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.GaussianBlur(self.gray, self._blur_ksize, 0, dst=self.blurred)
+        return self
+
+    def _allocate(self, width: int, height: int):
+        self.source_size = (width, height)
+        if self.max_width and width > self.max_width:
+            scale = self.max_width / width
+            self.size = (self.max_width, max(1, int(round(height * scale))))
+            self._resized = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+        else:
+            self.size = (width, height)
+            self._resized = None
+
+        analysis_width, analysis_height = self.size
+        self.rgb = np.empty((analysis_height, analysis_width, 3), dtype=np.uint8)
+        self.gray = np.empty((analysis_height, analysis_width), dtype=np.uint8)
+        self.blurred = np.empty((analysis_height, analysis_width), dtype=np.uint8)
+
+        # Keep the blur's spatial extent constant relative to the picture
+        kernel = max(3, int(self.base_blur_kernel * analysis_width / 1920) | 1)
+        self._blur_ksize = (kernel, kernel)
+
+        logger.debug(f"Frame buffers allocated: {width}x{height} -> {analysis_width}x{analysis_height}")
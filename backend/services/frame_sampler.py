@@ -0,0 +1,139 @@
+import cv2
+import logging
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FrameSampler:
+    """
+    Yield only the frames of a video that will be analyzed.
+
+    Frames between samples are advanced with ``grab()`` and never converted
+    to BGR, and gaps longer than ``seek_threshold`` seconds are crossed with a
+    keyframe-aware seek instead of decoding every frame in between.
+    """
+
+    def __init__(
+        self,
+        cap: "cv2.VideoCapture",
+        interval: float,
+        seek_threshold: Optional[float] = None,
+        start: float = 0.0,
+        end: Optional[float] = None
+    ):
+        """
+        Args:
+            cap: Opened video capture
+            interval: Seconds between analyzed frames
+            seek_threshold: Gaps of at least this many seconds use a seek (None disables seeking)
+            start: Timestamp in seconds of the first frame to sample
+            end: Timestamp in seconds to stop at (exclusive), None for end of video
+        """
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_step = max(1.0, interval * self.fps)
+        self.seek_frames = int(seek_threshold * self.fps) if seek_threshold else None
+        self.start_frame = int(round(start * self.fps))
+        self.end_frame = int(round(end * self.fps)) if end is not None else None
+
+    def __iter__(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Yield (frame_index, timestamp, frame) for every sampled frame"""
+        position = 0
+        if self.start_frame > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+            position = self.start_frame
+
+        next_frame = float(self.start_frame)
+        while True:
+            target = int(round(next_frame))
+            if self.end_frame is not None and target >= self.end_frame:
+                return
+
+            if self.seek_frames and target - position >= self.seek_frames:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                position = target
+
+            # Advance without retrieving frames that will not be analyzed
+            while position < target:
+                if not self.cap.grab():
+                    return
+                position += 1
+
+            if not self.cap.grab():
+                return
+            position += 1
+
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                return
+
+            yield target, target / self.fps, frame
+            next_frame += self.frame_step
+
+
+class AdaptiveFrameSampler(FrameSampler):
+    """
+    Frame sampler that follows scene activity.
+
+    Frames are probed at the maximum rate, but one is only yielded when more
+    than ``threshold`` of the pixels of a tiny grayscale thumbnail changed
+    since the last yielded frame (motion or a scene change), or when the
+    minimum rate would otherwise be violated. Static lecture footage therefore drops to the
+    minimum rate while bursts of activity are sampled at the maximum rate.
+    """
+
+    SIGNATURE_SIZE = (64, 36)
+    PIXEL_THRESHOLD = 12  # Gray levels a thumbnail pixel must change by; filters sensor and codec noise
+
+    def __init__(
+        self,
+        cap: "cv2.VideoCapture",
+        min_rate: float,
+        max_rate: float,
+        threshold: float,
+        start: float = 0.0,
+        end: Optional[float] = None
+    ):
+        """
+        Args:
+            cap: Opened video capture
+            min_rate: Frames per second that are always analyzed, however static the scene
+            max_rate: Frames per second probed and analyzed during activity
+            threshold: Fraction of thumbnail pixels (0-1) that must change to count as activity
+            start: Timestamp in seconds of the first frame to sample
+            end: Timestamp in seconds to stop at (exclusive), None for end of video
+        """
+        # Every probed frame is needed for the change signal, so never seek
+        super().__init__(cap, interval=1.0 / max_rate, seek_threshold=None, start=start, end=end)
+        self.max_gap = 1.0 / min_rate if min_rate > 0 else float("inf")
+        self.min_changed_pixels = max(1, int(threshold * self.SIGNATURE_SIZE[0] * self.SIGNATURE_SIZE[1]))
+        self.probed = 0
+        self.sampled = 0
+
+        width, height = self.SIGNATURE_SIZE
+        self._thumbnail = np.empty((height, width, 3), dtype=np.uint8)
+        self._signature = np.empty((height, width), dtype=np.uint8)
+        self._last_signature = np.empty((height, width), dtype=np.uint8)
+        self._difference = np.empty((height, width), dtype=np.uint8)
+
+    def __iter__(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+        last_timestamp = None
+        for frame_idx, timestamp, frame in super().__iter__():
+            self.probed += 1
+            cv2.resize(frame, self.SIGNATURE_SIZE, dst=self._thumbnail, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._thumbnail, cv2.COLOR_BGR2GRAY, dst=self._signature)
+
+            if last_timestamp is not None and timestamp - last_timestamp < self.max_gap:
+                cv2.absdiff(self._signature, self._last_signature, dst=self._difference)
+                cv2.threshold(self._difference, self.PIXEL_THRESHOLD, 255, cv2.THRESH_BINARY, dst=self._difference)
+                if cv2.countNonZero(self._difference) < self.min_changed_pixels:
+                    continue
+
+            # Swap buffers instead of copying the signature
+            self._signature, self._last_signature = self._last_signature, self._signature
+            last_timestamp = timestamp
+            self.sampled += 1
+            yield frame_idx, timestamp, frame
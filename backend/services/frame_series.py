@@ -0,0 +1,118 @@
+import os
+import logging
+from typing import Optional
+
+import numpy as np
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# One row per analyzed frame, or per timeline bucket on long videos (then the metrics are
+# the bucket means and frames tells how many analyzed frames the row stands for)
+FRAME_SERIES_DTYPE = np.dtype([
+    ('timestamp', '<f4'),
+    ('face_count', '<f4'),
+    ('face_confidence', '<f4'),
+    ('engagement', '<f4'),
+    ('motion_score', '<f4'),
+    ('camera_motion', '<f4'),
+    ('frames', '<i4')
+])
+FRAME_SERIES_FIELDS = ('face_count', 'face_confidence', 'engagement', 'motion_score', 'camera_motion')
+
+
+class FrameSeries:
+    """
+    Per-frame analysis metrics backed by a NumPy structured array.
+
+    Series are stored as uncompressed ``.npy`` sidecar files and opened as
+    read-only memory maps, so loading costs only the header read and pages
+    are pulled in as they are touched. Rows are sorted by timestamp, so a
+    time range is located with a binary search and returned as a view,
+    without copying.
+    """
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    @classmethod
+    def from_points(cls, points: np.ndarray, frames: Optional[np.ndarray] = None) -> "FrameSeries":
+        """
+        Build from a (rows, 1 + fields) float array of timestamps followed by FRAME_SERIES_FIELDS
+
+        Args:
+            points: Timestamps and metric values per row
+            frames: Analyzed frames per row (default: one each)
+        """
+        data = np.empty(len(points), dtype=FRAME_SERIES_DTYPE)
+        for i, name in enumerate(('timestamp',) + FRAME_SERIES_FIELDS):
+            data[name] = points[:, i]
+        data['frames'] = 1 if frames is None else frames
+        return cls(data)
+
+    @classmethod
+    def load(cls, path: str) -> "FrameSeries":
+        return cls(np.load(path, mmap_mode='r'))
+
+    def save(self, path: str):
+        save_array(path, self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def column(self, name: str) -> np.ndarray:
+        if name == 'frames' and name not in self.data.dtype.names:
+            return np.ones(len(self.data), dtype=np.int32)  # Series written before rows carried frame counts
+        return self.data[name]
+
+    def slice(self, start: Optional[float] = None, end: Optional[float] = None) -> "FrameSeries":
+        """Rows with start <= timestamp < end, as a view of the same buffer"""
+        timestamps = self.data['timestamp']
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        last = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='left'))
+        return FrameSeries(self.data[first:max(first, last)])
+
+
+def save_array(path: str, data: np.ndarray):
+    """Write an array as .npy atomically, so readers never see a partial file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(data), allow_pickle=False)
+    os.replace(temp_path, path)
+
+
+def frame_series_path(video_id: int) -> str:
+    return os.path.join(settings.series_dir, f"{video_id}.npy")
+
+
+def save_frame_series(video_id: int, series: FrameSeries) -> Optional[str]:
+    """
+    Persist a video's frame series next to the other media files
+
+    Args:
+        video_id: Video the series belongs to
+        series: Series from VideoAnalyzer.analyze_video
+
+    Returns:
+        Path of the written file or None if failed
+    """
+    path = frame_series_path(video_id)
+    try:
+        series.save(path)
+        return path
+    except Exception as e:
+        logger.error(f"Error saving frame series for video_id={video_id}: {str(e)}")
+        return None
+
+
+def load_frame_series(path: Optional[str]) -> Optional[FrameSeries]:
+    """Open a stored frame series lazily; None if there is none"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return FrameSeries.load(path)
+    except Exception as e:
+        logger.error(f"Error loading frame series {path}: {str(e)}")
+        return None
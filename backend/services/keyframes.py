@@ -0,0 +1,160 @@
+import os
+import cv2
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from config.settings import settings
+from services.frame_buffer import FrameBuffer
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8x8 low-frequency DCT coefficients -> 64-bit hash
+HASH_IMAGE_SIZE = 32
+
+
+def perceptual_hash(gray: np.ndarray) -> int:
+    """
+    64-bit DCT perceptual hash of a grayscale image
+
+    The image is shrunk to 32x32, transformed with a DCT, and each of the
+    8x8 lowest-frequency coefficients becomes one bit (above or below their
+    median), so small shifts, noise and compression barely change the hash.
+    """
+    small = cv2.resize(gray, (HASH_IMAGE_SIZE, HASH_IMAGE_SIZE), interpolation=cv2.INTER_AREA)
+    coefficients = cv2.dct(np.float32(small))[:HASH_SIZE, :HASH_SIZE].ravel()
+    bits = coefficients[1:] > np.median(coefficients[1:])  # The DC term only encodes brightness
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def shrink_frame(bgr: np.ndarray) -> np.ndarray:
+    """Copy of a frame scaled down to the thumbnail width"""
+    height, width = bgr.shape[:2]
+    target_width = settings.keyframe_width
+    if width > target_width:
+        return cv2.resize(bgr, (target_width, round(height * target_width / width)), interpolation=cv2.INTER_AREA)
+    return bgr.copy()
+
+
+def encode_thumbnail(image: np.ndarray) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, settings.keyframe_jpeg_quality])
+    return encoded.tobytes() if ok else b""
+
+
+class Keyframe:
+    __slots__ = ("timestamp", "phash", "sharpness", "image")
+
+    def __init__(self, timestamp: float, phash: int, sharpness: float, image: np.ndarray):
+        self.timestamp = timestamp
+        self.phash = phash
+        self.sharpness = sharpness
+        self.image = image  # Thumbnail-sized BGR frame, JPEG-encoded once by save_keyframes
+
+    def __getstate__(self):
+        return (self.timestamp, self.phash, self.sharpness, self.image)
+
+    def __setstate__(self, state):
+        self.timestamp, self.phash, self.sharpness, self.image = state
+
+
+class KeyframeSelector:
+    """
+    Picks a small set of visually distinct frames during the analysis pass.
+
+    Every sampled frame is hashed from the shared grayscale buffer. A frame
+    within ``max_distance`` bits of a kept keyframe is a near-duplicate (the
+    same board or slide) and only replaces it if it is sharper; a distinct
+    frame becomes a new keyframe. Past the cap, the two most similar
+    keyframes are collapsed into the sharper one, so at most ``max_keyframes``
+    thumbnail-sized frames are ever held. They are only JPEG-encoded when
+    save_keyframes writes the final selection.
+    """
+
+    def __init__(self, max_keyframes: Optional[int] = None, max_distance: Optional[int] = None):
+        self.max_keyframes = max_keyframes or settings.keyframe_max_per_video
+        self.max_distance = settings.keyframe_hash_distance if max_distance is None else max_distance
+        self.keyframes: List[Keyframe] = []
+
+    def update(self, frame: FrameBuffer, timestamp: float, sharpness: float):
+        """
+        Consider one analyzed frame
+
+        Args:
+            frame: Preprocessed frame buffers of the current frame
+            timestamp: Frame timestamp in seconds
+            sharpness: Laplacian variance from QualityMeter, used to pick the clearest duplicate
+        """
+        phash = perceptual_hash(frame.gray)
+        nearest = self._nearest(phash)
+        if nearest is not None:
+            if sharpness > nearest.sharpness:
+                nearest.timestamp, nearest.phash, nearest.sharpness = timestamp, phash, sharpness
+                nearest.image = shrink_frame(frame.bgr)
+            return
+
+        self.keyframes.append(Keyframe(timestamp, phash, sharpness, shrink_frame(frame.bgr)))
+        self._enforce_cap()
+
+    def merge(self, other: "KeyframeSelector") -> "KeyframeSelector":
+        """Fold in the keyframes of another segment, deduplicating across the boundary"""
+        for keyframe in other.keyframes:
+            nearest = self._nearest(keyframe.phash)
+            if nearest is None:
+                self.keyframes.append(keyframe)
+            elif keyframe.sharpness > nearest.sharpness:
+                self.keyframes[self.keyframes.index(nearest)] = keyframe
+        self._enforce_cap()
+        self.keyframes.sort(key=lambda keyframe: keyframe.timestamp)
+        return self
+
+    def _nearest(self, phash: int) -> Optional[Keyframe]:
+        best, best_distance = None, self.max_distance + 1
+        for keyframe in self.keyframes:
+            distance = hamming_distance(phash, keyframe.phash)
+            if distance < best_distance:
+                best, best_distance = keyframe, distance
+        return best
+
+    def _enforce_cap(self):
+        while len(self.keyframes) > self.max_keyframes:
+            # Collapse the most similar pair, keeping the sharper frame
+            _, i, j = min(
+                (hamming_distance(a.phash, b.phash), i, j)
+                for i, a in enumerate(self.keyframes)
+                for j, b in enumerate(self.keyframes[i + 1:], i + 1)
+            )
+            drop = i if self.keyframes[i].sharpness < self.keyframes[j].sharpness else j
+            del self.keyframes[drop]
+
+
+def save_keyframes(video_id: int, keyframes: List[Keyframe]) -> List[dict]:
+    """
+    Encode keyframe thumbnails and write them to the keyframe directory of a video
+
+    Args:
+        video_id: Video the keyframes belong to
+        keyframes: Keyframes from VideoAnalyzer.analyze_video
+
+    Returns:
+        List of {timestamp, path} entries for the written thumbnails
+    """
+    directory = os.path.join(settings.keyframe_dir, str(video_id))
+    saved = []
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for index, keyframe in enumerate(keyframes):
+            jpeg = encode_thumbnail(keyframe.image)
+            if not jpeg:
+                continue
+            path = os.path.join(directory, f"{index:02d}_{keyframe.timestamp:.1f}s.jpg")
+            with open(path, "wb") as f:
+                f.write(jpeg)
+            saved.append({'timestamp': keyframe.timestamp, 'path': path})
+    except Exception as e:
+        logger.error(f"Error saving keyframes for video_id={video_id}: {str(e)}")
+    return saved
@@ -0,0 +1,324 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterable
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+REQUEST_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 45.0, 60.0, 120.0)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'effectiveclass_stage_duration_seconds': (
+        "histogram", "Duration of each pipeline stage", STAGE_BUCKETS),
+    'effectiveclass_pipeline_jobs_total': (
+        "counter", "Pipeline runs by outcome", None),
+    'effectiveclass_pipeline_queue_depth': (
+        "gauge", "Uploaded videos waiting for a pipeline worker", None),
+    'effectiveclass_pipeline_jobs_in_flight': (
+        "gauge", "Pipeline runs currently processing", None),
+    'effectiveclass_openrouter_request_duration_seconds': (
+        "histogram", "OpenRouter chat completion latency by model", REQUEST_BUCKETS),
+    'effectiveclass_openrouter_requests_total': (
+        "counter", "OpenRouter chat completions by model and HTTP status", None),
+    'effectiveclass_cache_requests_total': (
+        "counter", "Cache lookups by cache and result (hit or miss)", None),
+    'effectiveclass_frames_analyzed_total': (
+        "counter", "Video frames analyzed", None),
+    'effectiveclass_video_analysis_seconds_total': (
+        "counter", "Wall seconds spent in video analysis", None),
+    'effectiveclass_audio_transcribed_seconds_total': (
+        "counter", "Seconds of audio transcribed", None),
+    'effectiveclass_transcription_seconds_total': (
+        "counter", "Wall seconds spent transcribing", None),
+}
+
+# Ratios computed from the merged counters when rendering: name: (help, numerator, denominator)
+DERIVED = {
+    'effectiveclass_video_analysis_frames_per_second': (
+        "Frames analyzed per wall second of video analysis",
+        'effectiveclass_frames_analyzed_total', 'effectiveclass_video_analysis_seconds_total'),
+    'effectiveclass_transcription_audio_seconds_per_second': (
+        "Seconds of audio transcribed per wall second of transcription",
+        'effectiveclass_audio_transcribed_seconds_total', 'effectiveclass_transcription_seconds_total'),
+}
+
+ARCHIVE_FILE = "archive.json"
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Optional[Dict[str, Any]]) -> LabelKey:
+    if name not in METRICS:
+        raise KeyError(f"Unknown metric: {name}")
+    return name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms of one process, shared through snapshot files.
+
+    Each process writes its values to its own JSON file in ``directory`` (at
+    most every ``flush_interval`` seconds and at exit). Rendering merges every
+    file on the host: counters and histograms are summed, gauges are summed over
+    live processes only. Files of exited processes are folded into an archive
+    file so counters never go backwards after a worker restarts.
+    """
+
+    def __init__(self, directory: str, flush_interval: float):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.path = os.path.join(directory, f"{os.getpid()}-{int(time.time() * 1000)}.json")
+        self.counters: Dict[LabelKey, float] = {}
+        self.gauges: Dict[LabelKey, float] = {}
+        self.histograms: Dict[LabelKey, List[float]] = {}  # Bucket counts, then sum and count
+        self.collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._flusher = None
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """A forked child starts empty, with a file of its own; the parent keeps reporting its values"""
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{int(time.time() * 1000)}.json")
+        self.counters, self.gauges, self.histograms = {}, {}, {}
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._flusher = None
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1.0):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+        self._changed()
+
+    def add(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        """Move a gauge up or down"""
+        key = _key(name, labels)
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0.0) + value
+        self._changed()
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        key = _key(name, labels)
+        buckets = METRICS[name][2]
+        with self._lock:
+            state = self.histograms.setdefault(key, [0.0] * (len(buckets) + 2))
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+        self._changed()
+
+    @contextmanager
+    def time_stage(self, stage: str):
+        """Observe the duration of a pipeline stage, whether it succeeds or raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('effectiveclass_stage_duration_seconds', time.perf_counter() - started, {'stage': stage})
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]):
+        """Counters read at snapshot time, as (name, labels, total) for values kept elsewhere (e.g. lru_cache stats)"""
+        self.collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Any]:
+        collected = {}
+        for collector in self.collectors:
+            try:
+                for name, labels, value in collector():
+                    collected[_key(name, labels)] = float(value)
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+        with self._lock:
+            counters = dict(self.counters)
+            counters.update(collected)
+            return {
+                'pid': os.getpid(),
+                'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+                'gauges': [[name, dict(labels), value] for (name, labels), value in self.gauges.items()],
+                'histograms': [[name, dict(labels), list(state)] for (name, labels), state in self.histograms.items()]
+            }
+
+    def flush(self):
+        """Write this process's snapshot file atomically"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {str(e)}")
+
+    def _changed(self):
+        if not settings.metrics_enabled:
+            return
+        self._dirty.set()
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+                    self._flusher.start()
+                    atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.flush_interval)
+            self._dirty.clear()
+            self.flush()
+
+    def collect(self) -> Dict[str, Dict[LabelKey, Any]]:
+        """Merge the snapshots of every process on the host"""
+        self.flush()
+        merged = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._archive_dead_processes()
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                snapshot = self._read(path)
+                if snapshot is None:
+                    continue
+                live = path != os.path.join(self.directory, ARCHIVE_FILE)
+                _merge(merged, snapshot, include_gauges=live)
+        return merged
+
+    def _archive_dead_processes(self):
+        """Fold the files of exited processes into the archive; their gauges are dropped"""
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        archive = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        dead = []
+        for path in glob.glob(os.path.join(self.directory, "*-*.json")):
+            try:
+                pid = int(os.path.basename(path).split("-")[0])
+            except ValueError:
+                continue
+            if path != self.path and not _pid_alive(pid):
+                dead.append(path)
+        if not dead:
+            return
+        for path in [archive_path] + dead:
+            snapshot = self._read(path)
+            if snapshot is not None:
+                _merge(archive, snapshot, include_gauges=False)
+        temp_path = f"{archive_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(_to_snapshot(archive), f)
+        os.replace(temp_path, archive_path)
+        for path in dead:
+            os.remove(path)
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None  # Missing or replaced while reading: picked up at the next scrape
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        merged = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if kind == "histogram":
+                for (metric, labels), state in sorted(merged['histograms'].items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(list(buckets) + [math.inf], state[:len(buckets)] + [state[-1]]):
+                        le = "+Inf" if bound == math.inf else repr(float(bound))
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {_format_value(count)}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(state[-2])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {_format_value(state[-1])}")
+            else:
+                values = merged['counters' if kind == "counter" else 'gauges']
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        # Hit ratio per cache, and throughput ratios
+        cache_totals: Dict[str, Dict[str, float]] = {}
+        for (metric, labels), value in merged['counters'].items():
+            if metric == 'effectiveclass_cache_requests_total':
+                labels = dict(labels)
+                totals = cache_totals.setdefault(labels.get('cache', ""), {})
+                totals[labels.get('result', "")] = totals.get(labels.get('result', ""), 0.0) + value
+        lines += ["# HELP effectiveclass_cache_hit_ratio Cache hits over lookups since the counters started",
+                  "# TYPE effectiveclass_cache_hit_ratio gauge"]
+        for cache, totals in sorted(cache_totals.items()):
+            lookups = totals.get('hit', 0.0) + totals.get('miss', 0.0)
+            if lookups:
+                lines.append(f"effectiveclass_cache_hit_ratio{_format_labels((('cache', cache),))} "
+                             f"{_format_value(totals.get('hit', 0.0) / lookups)}")
+        for name, (help_text, numerator, denominator) in DERIVED.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            total = merged['counters'].get((denominator, ()), 0.0)
+            if total:
+                lines.append(f"{name} {_format_value(merged['counters'].get((numerator, ()), 0.0) / total)}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge(merged: Dict[str, Dict[LabelKey, Any]], snapshot: Dict[str, Any], include_gauges: bool):
+    for name, labels, value in snapshot.get('counters', []):
+        key = (name, tuple(sorted(labels.items())))
+        merged['counters'][key] = merged['counters'].get(key, 0.0) + value
+    if include_gauges:
+        for name, labels, value in snapshot.get('gauges', []):
+            key = (name, tuple(sorted(labels.items())))
+            merged['gauges'][key] = merged['gauges'].get(key, 0.0) + value
+    for name, labels, state in snapshot.get('histograms', []):
+        key = (name, tuple(sorted(labels.items())))
+        if name not in METRICS or len(state) != len(METRICS[name][2]) + 2:
+            continue  # Written with different buckets by an older version
+        current = merged['histograms'].get(key)
+        merged['histograms'][key] = state if current is None else [a + b for a, b in zip(current, state)]
+
+
+def _to_snapshot(merged: Dict[str, Dict[LabelKey, Any]]) -> Dict[str, Any]:
+    return {
+        kind: [[name, dict(labels), value] for (name, labels), value in merged[kind].items()]
+        for kind in ('counters', 'gauges', 'histograms')
+    }
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{name}="{_escape_label(value)}"' for name, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+metrics = MetricsRegistry(settings.metrics_dir, settings.metrics_flush_interval)
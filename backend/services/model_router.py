@@ -0,0 +1,249 @@
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from config.settings import settings
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Shared by all races; a losing request keeps running here after the winner has returned
+_executor = ThreadPoolExecutor(max_workers=settings.llm_hedge_workers, thread_name_prefix="llm-hedge")
+
+
+def _attempt(model: str, call: Callable[[], Optional[Any]], reason: str) -> Optional[Any]:
+    with span("llm.attempt", model=model, reason=reason) as attempt:
+        result = call()
+        attempt.set('valid', result is not None)
+        return result
+
+
+class LatencyTracker:
+    """Sliding window of recent successful request latencies of one model and workload (purpose)"""
+
+    def __init__(self, window: Optional[int] = None):
+        self.samples = deque(maxlen=window or settings.llm_latency_window)
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Nearest-rank quantile of the window; None until enough samples were seen"""
+        if len(self.samples) < settings.llm_latency_min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Tracks whether a model is worth calling.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    the model is skipped without a request. Once ``reset_seconds`` have
+    passed (or the Retry-After of a 429), one trial request is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_seconds: Optional[float] = None):
+        self.failure_threshold = failure_threshold or settings.llm_breaker_failure_threshold
+        self.reset_seconds = reset_seconds or settings.llm_breaker_reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; claims the single trial slot when half-open"""
+        if self.state == self.OPEN and time.monotonic() >= self.open_until:
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.state == self.OPEN:
+            return  # A late answer to a request sent before the circuit opened
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+
+    def release_trial(self):
+        """Give back a trial slot whose request ended without recording an outcome"""
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = False
+
+    def record_failure(self, error: str, retry_after: Optional[float] = None):
+        self.consecutive_failures += 1
+        self.last_error = error
+        self.trial_in_flight = False
+        if retry_after is not None or self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.open_until = time.monotonic() + (retry_after if retry_after is not None else self.reset_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = max(0.0, self.open_until - time.monotonic()) if self.state == self.OPEN else 0.0
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'retry_in_seconds': round(retry_in, 1),
+            'last_error': self.last_error
+        }
+
+
+class ModelRouter:
+    """
+    Latency-aware routing over the OpenRouter models of AIService.
+
+    Every request outcome feeds a per-model circuit breaker, and every
+    success a latency window per model and purpose, so short summaries and
+    repairs do not skew the latency of full feedback requests. ``race``
+    sends the first attempt and, if it has not answered within that model's
+    p90 latency for the attempt's purpose, hedges with the next one; the first
+    valid result wins and failures move on to the next model immediately
+    instead of sleeping.
+    """
+
+    def __init__(self, models: Dict[str, str]):
+        """
+        Args:
+            models: Role -> model name (AIService.free_models)
+        """
+        self.models = models
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[Tuple[str, str], LatencyTracker] = {}
+        for model in set(models.values()):
+            self._breakers[model] = CircuitBreaker()
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker()
+        return self._breakers[model]
+
+    def _latency(self, model: str, purpose: str) -> LatencyTracker:
+        key = (model, purpose)
+        if key not in self._latencies:
+            self._latencies[key] = LatencyTracker()
+        return self._latencies[key]
+
+    def allow(self, model: str) -> bool:
+        with self._lock:
+            return self._breaker(model).allow()
+
+    def release(self, model: str):
+        """Call when a request allowed by allow() has ended, whatever happened; frees an unused trial slot"""
+        with self._lock:
+            self._breaker(model).release_trial()
+
+    def record_success(self, model: str, latency: float, purpose: str):
+        with self._lock:
+            self._breaker(model).record_success()
+            self._latency(model, purpose).record(latency)
+
+    def record_failure(self, model: str, error: str, retry_after: Optional[float] = None):
+        with self._lock:
+            breaker = self._breaker(model)
+            breaker.record_failure(error, retry_after)
+            if breaker.state == CircuitBreaker.OPEN:
+                logger.warning(f"Circuit open for {model} ({error}), skipping it for {breaker.snapshot()['retry_in_seconds']}s")
+
+    def hedge_delay(self, model: str, purpose: str) -> float:
+        """Seconds to wait for a model before hedging: its p90 latency for this purpose, clamped"""
+        with self._lock:
+            p90 = self._latency(model, purpose).quantile(0.9)
+        if p90 is None:
+            return settings.llm_hedge_default_delay
+        return min(settings.llm_hedge_max_delay, max(settings.llm_hedge_min_delay, p90))
+
+    def race(self, attempts: List[Tuple[str, str, Callable[[], Optional[Any]]]]) -> Optional[Any]:
+        """
+        Run attempts in order, hedging slow ones, and return the first valid result
+
+        Args:
+            attempts: (model, purpose, call) triples in order of preference; a call returns None
+                for an unusable answer, and purpose selects the latency window for the hedge delay
+
+        Returns:
+            The first non-None result, or None if every attempt failed or was skipped
+        """
+        pending = list(attempts)
+        running: Dict[Future, str] = {}
+
+        def attempt(model: str, call: Callable[[], Optional[Any]], reason: str) -> Optional[Any]:
+            try:
+                return _attempt(model, call, reason)
+            finally:
+                # Also when the call raised before an outcome was recorded, or its race was already won
+                self.release(model)
+
+        def launch(reason: str) -> Optional[Tuple[str, str]]:
+            while pending:
+                model, purpose, call = pending.pop(0)
+                if not self.allow(model):
+                    logger.info(f"Skipping {model}: circuit open")
+                    continue
+                # Copy the caller's context so LLM usage is recorded for the job
+                running[_executor.submit(contextvars.copy_context().run, attempt, model, call, reason)] = model
+                return model, purpose
+            return None
+
+        latest = launch("first")
+        while running:
+            timeout = self.hedge_delay(*latest) if pending else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.info(f"{latest[0]} has not answered within {timeout:.1f}s, sending a hedged request")
+                latest = launch("hedge") or latest
+                continue
+            for future in done:
+                model = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Request to {model} failed: {str(e)}")
+                    result = None
+                if result is not None:
+                    if running:
+                        logger.info(f"{model} answered first, ignoring {len(running)} slower request(s)")
+                    return result
+            latest = launch("after_failure") or latest
+        return None
+
+    def health(self) -> Dict[str, Any]:
+        """Circuit state per model role, with latency percentiles and hedge delay per purpose"""
+        report = {}
+        for role, model in self.models.items():
+            with self._lock:
+                breaker = self._breaker(model).snapshot()
+                latencies = {
+                    purpose: (len(tracker.samples), tracker.quantile(0.5), tracker.quantile(0.9))
+                    for (name, purpose), tracker in self._latencies.items() if name == model
+                }
+            report[role] = {
+                'model': model,
+                **breaker,
+                'latency': {
+                    purpose: {
+                        'samples': samples,
+                        'p50': round(p50, 3) if p50 is not None else None,
+                        'p90': round(p90, 3) if p90 is not None else None,
+                        'hedge_delay': round(self.hedge_delay(model, purpose), 1)
+                    }
+                    for purpose, (samples, p50, p90) in sorted(latencies.items())
+                }
+            }
+        return report
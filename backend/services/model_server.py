@@ -0,0 +1,356 @@
+import os
+import sys
+import fcntl
+import logging
+import subprocess
+import threading
+import time
+from multiprocessing.connection import Listener, Client
+from types import SimpleNamespace
+from typing import Optional, Dict, Any
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ModelServer:
+    """
+    Local inference server that owns the Whisper model.
+
+    Every pipeline worker on the host sends transcription requests to this
+    process over a Unix socket, so the weights are loaded exactly once per
+    host no matter how many API workers are running. The server exits once
+    every API process that used it has been gone for model_server_idle_exit
+    seconds.
+    """
+
+    def __init__(self, socket_path: str, owner_pid: Optional[int] = None):
+        self.socket_path = os.path.abspath(socket_path)
+        self.whisper_model = None
+        self.whisper_error: Optional[str] = None
+        self._load_lock = threading.Lock()
+        self.clients = {owner_pid} if owner_pid else set()
+        self._had_clients = bool(self.clients)  # A server started by hand stays up until its first client is gone
+        self._clients_lock = threading.Lock()
+
+    def _load_whisper(self):
+        """Load the Whisper model once and return it"""
+        with self._load_lock:
+            if self.whisper_model is None:
+                try:
+                    from faster_whisper import WhisperModel
+
+                    logger.info(f"Loading Whisper model '{settings.whisper_model}'")
+                    self.whisper_model = WhisperModel(
+                        settings.whisper_model,
+                        device="cpu",  # Change to "cuda" if GPU available
+                        compute_type="int8",
+                        num_workers=max(1, settings.model_server_workers)
+                    )
+                except Exception as e:
+                    self.whisper_error = f"{type(e).__name__}: {e}"
+                    raise
+                self.whisper_error = None
+                logger.info("Whisper model initialized successfully")
+            return self.whisper_model
+
+    def _status(self) -> Dict[str, Any]:
+        return {"whisper": self.whisper_model is not None, "whisper_error": self.whisper_error}
+
+    def _register(self, pid: Optional[int]):
+        if pid:
+            with self._clients_lock:
+                self.clients.add(pid)
+                self._had_clients = True
+
+    def _watch_clients(self):
+        """Exit once no API process that used the server has been alive for model_server_idle_exit seconds"""
+        orphaned_since = None
+        while True:
+            time.sleep(5.0)
+            with self._clients_lock:
+                self.clients = {pid for pid in self.clients if _pid_alive(pid)}
+                alive = bool(self.clients) or not self._had_clients
+            if alive:
+                orphaned_since = None
+                continue
+            orphaned_since = orphaned_since or time.monotonic()
+            if time.monotonic() - orphaned_since >= settings.model_server_idle_exit:
+                logger.info("No API process left, shutting down the model server")
+                try:
+                    os.remove(self.socket_path)
+                except OSError:
+                    pass
+                os._exit(0)  # The accept loop blocks the main thread
+
+    def serve_forever(self):
+        """Bind the socket and serve requests until the process is stopped"""
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        # Warm the model in the background so pings are answered while loading
+        threading.Thread(target=self._warm_up, daemon=True).start()
+        threading.Thread(target=self._watch_clients, daemon=True).start()
+
+        with Listener(self.socket_path, family="AF_UNIX") as listener:
+            os.chmod(self.socket_path, 0o600)
+            logger.info(f"Model server listening on {self.socket_path}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.error(f"Model server accept error: {e}")
+                    continue
+                threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+
+    def _warm_up(self):
+        try:
+            self._load_whisper()
+        except Exception as e:
+            logger.error(f"Error initializing Whisper model: {e}")
+
+    def _handle_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+
+                try:
+                    response = {"ok": True, "result": self._dispatch(request)}
+                except Exception as e:
+                    logger.error(f"Model server error handling {request.get('op')}: {e}")
+                    response = {"ok": False, "error": str(e)}
+
+                try:
+                    conn.send(response)
+                except (BrokenPipeError, OSError):
+                    break
+
+    def _dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "ping":
+            return self._status()
+        if op == "load":
+            # Handshake: register the caller and report whether Whisper can be served at all
+            self._register(request.get("pid"))
+            try:
+                self._load_whisper()
+            except Exception as e:
+                logger.error(f"Could not load Whisper: {e}")
+            return self._status()
+        if op == "transcribe":
+            return self._transcribe(request["audio_path"], request.get("options", {}))
+        raise ValueError(f"Unknown model server operation: {op}")
+
+    def _transcribe(self, audio_path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        return run_transcription(self._load_whisper(), audio_path, options)
+
+
+def run_transcription(model, audio_path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Decode audio once, transcribe it and measure its quality on the same buffer
+
+    Args:
+        model: Loaded faster-whisper WhisperModel
+        audio_path: Path to an audio or video file
+        options: Keyword arguments for WhisperModel.transcribe
+
+    Returns:
+        Plain dictionary with "segments" and "info" (including "audio_metrics")
+    """
+    from faster_whisper import decode_audio
+    from services.audio_metrics import analyze_pcm
+
+    sampling_rate = model.feature_extractor.sampling_rate
+    audio = decode_audio(audio_path, sampling_rate=sampling_rate)
+    segments, info = model.transcribe(audio, **options)
+
+    # Segments are a lazy generator; materialize them before replying
+    segments_data = [
+        {
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text,
+            "avg_logprob": segment.avg_logprob,
+            "no_speech_prob": segment.no_speech_prob
+        }
+        for segment in segments
+    ]
+
+    try:
+        audio_metrics = analyze_pcm(audio, sampling_rate)
+    except Exception as e:
+        logger.error(f"Error analyzing audio quality for {audio_path}: {e}")
+        audio_metrics = None
+
+    return {
+        "segments": segments_data,
+        "info": {
+            "language": info.language,
+            "language_probability": info.language_probability,
+            "duration": info.duration,
+            "audio_metrics": audio_metrics
+        }
+    }
+
+
+def _as_namespaces(result: Dict[str, Any]):
+    segments = [SimpleNamespace(**segment) for segment in result["segments"]]
+    info = SimpleNamespace(**result["info"])
+    return segments, info
+
+
+class WhisperClient:
+    """
+    Stand-in for ``WhisperModel`` that forwards calls to the model server.
+
+    ``transcribe`` returns ``(segments, info)`` with the same attribute names as
+    faster-whisper, so callers do not need to know where the model lives.
+    ``info.audio_metrics`` carries audio quality measured on the decoded PCM.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = os.path.abspath(socket_path)
+
+    def transcribe(self, audio_path: str, **options):
+        result = self._request({"op": "transcribe", "audio_path": os.path.abspath(audio_path), "options": options})
+        return _as_namespaces(result)
+
+    def ping(self) -> Dict[str, Any]:
+        return self._request({"op": "ping"})
+
+    def load(self) -> Dict[str, Any]:
+        """Register this process with the server and wait until Whisper is loaded or has failed to load"""
+        return self._request({"op": "load", "pid": os.getpid()})
+
+    def _request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with Client(self.socket_path, family="AF_UNIX") as conn:
+            conn.send(request)
+            response = conn.recv()
+
+        if not response["ok"]:
+            raise RuntimeError(f"Model server error: {response['error']}")
+        return response["result"]
+
+
+class LocalWhisper:
+    """In-process counterpart of WhisperClient, used when the model server is disabled"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio_path: str, **options):
+        return _as_namespaces(run_transcription(self.model, audio_path, options))
+
+
+def ensure_model_server(socket_path: str, timeout: float) -> bool:
+    """
+    Make sure a model server is listening on socket_path, starting one if needed
+
+    Args:
+        socket_path: Unix socket the server listens on
+        timeout: Seconds to wait for a freshly started server to answer
+
+    Returns:
+        True if a server is reachable, False otherwise
+    """
+    client = WhisperClient(socket_path)
+    try:
+        client.ping()
+        return True
+    except Exception:
+        pass
+
+    socket_path = client.socket_path
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+
+    # Serialize startup across workers so only one server is ever spawned
+    with open(f"{socket_path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            try:
+                client.ping()
+                return True
+            except Exception:
+                pass
+
+            logger.info(f"Starting model server on {socket_path}")
+            env = dict(os.environ)
+            env["MODEL_SERVER_SOCKET"] = socket_path
+            env["MODEL_SERVER_OWNER_PID"] = str(os.getpid())
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")]))
+            log_path = os.path.abspath(settings.model_server_log)
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            with open(log_path, "ab") as log_file:
+                subprocess.Popen(
+                    [sys.executable, "-m", "services.model_server"],
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True  # Survives a reload of the worker that spawned it; exits when idle
+                )
+
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                try:
+                    client.ping()
+                    return True
+                except Exception:
+                    time.sleep(0.2)
+
+            logger.error(f"Model server did not start within {timeout:.0f} seconds")
+            return False
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_whisper_client: Optional[WhisperClient] = None
+
+
+def get_whisper_client() -> Optional[WhisperClient]:
+    """
+    Return a client for the shared model server, starting the server if needed
+
+    Returns None when the server cannot be reached or cannot load Whisper
+    (e.g. faster-whisper is not installed), so callers fall back to their
+    own path instead of sending every transcription to a server that fails.
+    """
+    global _whisper_client
+
+    if _whisper_client is None:
+        if not ensure_model_server(settings.model_server_socket, settings.model_server_start_timeout):
+            return None
+        client = WhisperClient(settings.model_server_socket)
+        try:
+            status = client.load()
+        except Exception as e:
+            logger.error(f"Model server handshake failed: {e}")
+            return None
+        if not status.get("whisper"):
+            logger.warning(f"Model server cannot load Whisper: {status.get('whisper_error')}")
+            return None
+        _whisper_client = client
+    return _whisper_client
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    owner = os.environ.get("MODEL_SERVER_OWNER_PID")
+    ModelServer(settings.model_server_socket, int(owner) if owner else None).serve_forever()
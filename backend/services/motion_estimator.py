@@ -0,0 +1,119 @@
+import cv2
+import logging
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MotionEstimator:
+    """
+    Inter-frame motion for consecutive sampled frames.
+
+    Corners tracked with sparse Lucas-Kanade optical flow are fitted with a
+    similarity transform (RANSAC), which is taken as the global camera motion.
+    The previous frame is warped by that transform and differenced against the
+    current one, so only movement inside the scene counts as in-scene motion.
+    Flow is computed on a half-resolution pyramid level, which is plenty for a
+    global transform and keeps corner detection cheap. The previous frame and
+    all intermediate images live in reused buffers.
+    """
+
+    MAX_CORNERS = 200
+    MIN_TRACKED_POINTS = 8
+    PIXEL_THRESHOLD = 20  # Gray levels a pixel must change by to count as moving
+
+    def __init__(self):
+        self._previous: Optional[np.ndarray] = None
+        self._current_small: Optional[np.ndarray] = None
+        self._previous_blurred: Optional[np.ndarray] = None
+        self._warped: Optional[np.ndarray] = None
+        self._difference: Optional[np.ndarray] = None
+        self._previous_timestamp: Optional[float] = None
+
+    def update(self, gray: np.ndarray, blurred: np.ndarray, timestamp: float) -> Dict[str, float]:
+        """
+        Estimate motion between the previous sampled frame and this one
+
+        Args:
+            gray: Grayscale frame at analysis resolution
+            blurred: Blurred grayscale frame, used for differencing
+            timestamp: Frame timestamp in seconds
+
+        Returns:
+            motion_score: Fraction of the picture moving within the scene (0-1)
+            camera_motion: Global camera movement in frame diagonals per second
+        """
+        result = {'motion_score': 0.0, 'camera_motion': 0.0}
+
+        first_frame = self._previous_blurred is None or self._previous_blurred.shape != gray.shape
+        if first_frame:
+            self._allocate(gray.shape)
+        cv2.pyrDown(gray, dst=self._current_small)
+
+        if not first_frame and timestamp > self._previous_timestamp:
+            try:
+                result = self._estimate(gray, blurred, timestamp - self._previous_timestamp)
+            except cv2.error as e:
+                logger.error(f"Error estimating motion at {timestamp}s: {str(e)}")
+
+        # The half-size frame computed for this step becomes the previous one
+        self._previous, self._current_small = self._current_small, self._previous
+        np.copyto(self._previous_blurred, blurred)
+        self._previous_timestamp = timestamp
+        return result
+
+    def _allocate(self, shape):
+        small_shape = ((shape[0] + 1) // 2, (shape[1] + 1) // 2)
+        self._previous = np.empty(small_shape, dtype=np.uint8)
+        self._current_small = np.empty(small_shape, dtype=np.uint8)
+        self._previous_blurred = np.empty(shape, dtype=np.uint8)
+        self._warped = np.empty(shape, dtype=np.uint8)
+        self._difference = np.empty(shape, dtype=np.uint8)
+
+    def _estimate(self, gray: np.ndarray, blurred: np.ndarray, elapsed: float) -> Dict[str, float]:
+        height, width = gray.shape
+        transform = self._global_transform(self._current_small)
+
+        if transform is not None:
+            cv2.warpAffine(
+                self._previous_blurred, transform, (width, height), dst=self._warped,
+                borderMode=cv2.BORDER_REPLICATE
+            )
+            reference = self._warped
+            shift = math.hypot(transform[0, 2], transform[1, 2])
+        else:
+            # Too little texture to track; plain frame differencing
+            reference = self._previous_blurred
+            shift = 0.0
+
+        cv2.absdiff(blurred, reference, dst=self._difference)
+        cv2.threshold(self._difference, self.PIXEL_THRESHOLD, 255, cv2.THRESH_BINARY, dst=self._difference)
+        moving_fraction = cv2.countNonZero(self._difference) / float(width * height)
+
+        return {
+            'motion_score': min(1.0, moving_fraction),
+            'camera_motion': shift / math.hypot(width, height) / elapsed
+        }
+
+    def _global_transform(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """Similarity transform (at full analysis resolution) mapping the previous frame onto this one, or None"""
+        points = cv2.goodFeaturesToTrack(self._previous, self.MAX_CORNERS, 0.01, 8)
+        if points is None or len(points) < self.MIN_TRACKED_POINTS:
+            return None
+
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(
+            self._previous, gray, points, None, winSize=(21, 21), maxLevel=2
+        )
+        tracked = status.reshape(-1) == 1
+        if np.count_nonzero(tracked) < self.MIN_TRACKED_POINTS:
+            return None
+
+        transform, _ = cv2.estimateAffinePartial2D(
+            points[tracked], next_points[tracked], method=cv2.RANSAC, ransacReprojThreshold=1.0
+        )
+        if transform is not None:
+            transform[:, 2] *= 2.0  # Translation was measured at half resolution
+        return transform
@@ -0,0 +1,244 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Profiler of the job running in this context, so stages can label their samples
+_current_profiler: ContextVar[Optional["SamplingProfiler"]] = ContextVar("job_profiler", default=None)
+
+MAX_INTERVAL = 1.0  # Sampling never gets sparser than once a second
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for one thread.
+
+    A background thread reads the target thread's stack from
+    sys._current_frames() every ``interval`` seconds and counts collapsed
+    stacks, weighted by the interval in milliseconds. The time spent sampling
+    is measured; whenever it exceeds ``max_overhead`` of the elapsed time the
+    interval is doubled, and halved again once the cost is well under it, so
+    the cost to the job stays bounded.
+
+    Only one thread is sampled. Work the job runs in other processes (the
+    video analysis segment workers) is sampled there with profile_worker
+    and folded in with merge_worker.
+    """
+
+    def __init__(self, thread_id: int, interval: float, max_overhead: float):
+        self.thread_id = thread_id
+        self.interval = self.initial_interval = interval
+        self.max_overhead = max_overhead
+        self.stage: Optional[str] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self.throttled = 0
+        self.worker_segments = 0
+        self.worker_samples = 0
+        self.worker_wall_seconds = 0.0
+        self.worker_sampling_seconds = 0.0
+        self.report: Optional[Dict[str, Any]] = None  # Set by profile_worker once sampling stopped
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling and report the cost"""
+        self._stop.set()
+        self._thread.join()
+        wall = time.perf_counter() - self.started
+        return {
+            'samples': self.samples,
+            'wall_seconds': round(wall, 3),
+            'sampling_seconds': round(self.sampling_seconds, 4),
+            'overhead': round(self.sampling_seconds / wall, 5) if wall > 0 else 0.0,
+            'max_overhead': self.max_overhead,
+            'initial_interval': self.initial_interval,
+            'final_interval': self.interval,
+            'throttled': self.throttled,
+            'worker_segments': self.worker_segments,
+            'worker_samples': self.worker_samples,
+            'worker_overhead': (
+                round(self.worker_sampling_seconds / self.worker_wall_seconds, 5) if self.worker_wall_seconds > 0 else 0.0
+            ),
+            # Worker samples run in parallel with the pipeline thread waiting on them, so the
+            # stack totals add up to more than the wall time
+            'coverage': "pipeline thread and video analysis segment workers (stages suffixed /worker)"
+        }
+
+    def merge_worker(self, stacks: Counter, report: Dict[str, Any]):
+        """Fold in the samples a segment worker took with profile_worker"""
+        self.stacks.update(stacks)
+        self.worker_segments += 1
+        self.worker_samples += report['samples']
+        self.worker_wall_seconds += report['wall_seconds']
+        self.worker_sampling_seconds += report['sampling_seconds']
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            sample_start = time.perf_counter()
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += max(1, round(self.interval * 1000))
+                self.samples += 1
+            del frame
+            now = time.perf_counter()
+            self.sampling_seconds += now - sample_start
+            budget = self.max_overhead * (now - self.started)
+            if self.sampling_seconds > budget and self.interval < MAX_INTERVAL:
+                self.interval = min(MAX_INTERVAL, self.interval * 2)
+                self.throttled += 1
+            elif self.sampling_seconds < budget / 2 and self.interval > self.initial_interval:
+                # A few expensive early samples should not leave the rest of the job sparsely sampled
+                self.interval = max(self.initial_interval, self.interval / 2)
+
+    def _collapse(self, frame) -> str:
+        """Stack as 'stage;outer;...;inner', one entry per function"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            names.append(label)
+            frame = frame.f_back
+        names.append(f"stage:{self.stage or 'pipeline'}")
+        return ";".join(reversed(names))
+
+
+def _should_profile(forced: bool) -> bool:
+    if forced:
+        return True
+    return settings.profiler_sample_rate > 0 and random.random() < settings.profiler_sample_rate
+
+
+@contextmanager
+def profile_job(video_id: int, forced: bool = False) -> Iterator[Optional[SamplingProfiler]]:
+    """
+    Sample the calling thread while a job runs, for a fraction of jobs or when forced
+
+    Args:
+        video_id: Job whose profile is stored
+        forced: Profile regardless of settings.profiler_sample_rate (per-job flag)
+    """
+    if not _should_profile(forced):
+        yield None
+        return
+    profiler = SamplingProfiler(threading.get_ident(), settings.profiler_interval, settings.profiler_max_overhead)
+    token = _current_profiler.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        report = profiler.stop()
+        _current_profiler.reset(token)
+        try:
+            save_profile(video_id, profiler.stacks, report)
+            logger.info(
+                f"Profiled video_id={video_id}: {report['samples']} samples, overhead {report['overhead']:.2%}"
+            )
+        except Exception as e:
+            logger.error(f"Could not save profile for video_id={video_id}: {str(e)}")
+
+
+def current_profiler() -> Optional[SamplingProfiler]:
+    """Profiler of the job running in this context, None when it is not profiled"""
+    return _current_profiler.get()
+
+
+@contextmanager
+def profile_worker(stage: Optional[str]) -> Iterator[Optional[SamplingProfiler]]:
+    """
+    Sample the calling thread of a worker process on behalf of a profiled job
+
+    Args:
+        stage: Stage of the job that handed over the work; None when the job is not profiled.
+            Samples are labelled '<stage>/worker'; the caller returns the profiler's stacks
+            and stop() report to the job for SamplingProfiler.merge_worker.
+    """
+    if stage is None:
+        yield None
+        return
+    profiler = SamplingProfiler(threading.get_ident(), settings.profiler_interval, settings.profiler_max_overhead)
+    profiler.stage = f"{stage}/worker"
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.report = profiler.stop()
+
+
+@contextmanager
+def profile_stage(name: str):
+    """Label samples taken inside this block with the stage name"""
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+    previous, profiler.stage = profiler.stage, name
+    try:
+        yield
+    finally:
+        profiler.stage = previous
+
+
+def _profile_path(video_id: int, extension: str) -> str:
+    return os.path.join(settings.profile_dir, f"{video_id}.{extension}")
+
+
+def save_profile(video_id: int, stacks: Counter, report: Dict[str, Any]):
+    """Write the collapsed stacks and the overhead report of a job"""
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    report = dict(report, video_id=video_id, created_at=datetime.utcnow().isoformat(timespec="seconds") + "Z")
+    for extension, content in (
+        ("collapsed", "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())),
+        ("json", json.dumps(report, indent=1))
+    ):
+        path = _profile_path(video_id, extension)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
+
+
+def load_profile_report(video_id: int) -> Optional[Dict[str, Any]]:
+    path = _profile_path(video_id, "json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def collapsed_profile_path(video_id: int) -> Optional[str]:
+    """Collapsed stacks of a job (flamegraph.pl, speedscope, inferno), if it was profiled"""
+    path = _profile_path(video_id, "collapsed")
+    return path if os.path.exists(path) else None
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Overhead reports of every stored profile, newest first"""
+    reports = []
+    for path in glob.glob(os.path.join(settings.profile_dir, "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(reports, key=lambda report: report.get('created_at', ""), reverse=True)
@@ -0,0 +1,203 @@
+import json
+from functools import lru_cache
+from string import Template
+from typing import Dict, Any, List
+
+from services.metrics import metrics
+
+LANGUAGE_NAMES = {"en": "English", "ru": "Russian", "tj": "Tajik"}
+
+LANGUAGE_INSTRUCTIONS = {
+    "tj": """
+IMPORTANT: You MUST respond in Tajik language (тоҷикӣ) using Cyrillic script. 
+Do NOT respond in English or any other language. Use proper Tajik grammar and vocabulary.
+""",
+    "ru": """
+IMPORTANT: You MUST respond in Russian language (русский) using Cyrillic script.
+Do NOT respond in English or any other language. Use proper Russian grammar and vocabulary.
+"""
+}
+
+# Subject guidance per feedback language; $theme is filled in per video
+SUBJECT_GUIDANCE = {
+    "en": {
+        "mathematics": "Focus on mathematical concepts, problem-solving approaches, clarity of explanations, use of visual aids, step-by-step demonstrations, and student understanding of $theme.",
+        "science": "Focus on scientific methodology, experimental design, hypothesis testing, use of scientific equipment, safety procedures, and understanding of $theme concepts.",
+        "language": "Focus on language acquisition, grammar instruction, vocabulary building, pronunciation, reading comprehension, and $theme language skills.",
+        "history": "Focus on historical analysis, source evaluation, chronological understanding, cultural context, and interpretation of $theme historical events.",
+        "literature": "Focus on literary analysis, text interpretation, critical thinking, creative expression, and understanding of $theme literary works.",
+        "physics": "Focus on physical concepts, mathematical applications, experimental demonstrations, problem-solving, and understanding of $theme principles.",
+        "chemistry": "Focus on chemical reactions, laboratory safety, molecular understanding, practical applications, and $theme chemical concepts.",
+        "biology": "Focus on biological systems, scientific observation, classification, ecological relationships, and understanding of $theme biological processes."
+    },
+    "ru": {
+        "mathematics": "Сосредоточьтесь на математических концепциях, подходах к решению задач, ясности объяснений, использовании наглядных пособий, пошаговых демонстрациях и понимании студентами $theme.",
+        "science": "Сосредоточьтесь на научной методологии, экспериментальном дизайне, проверке гипотез, использовании научного оборудования, процедурах безопасности и понимании концепций $theme.",
+        "language": "Сосредоточьтесь на приобретении языка, обучении грамматике, построении словарного запаса, произношении, понимании чтения и языковых навыках $theme.",
+        "history": "Сосредоточьтесь на историческом анализе, оценке источников, хронологическом понимании, культурном контексте и интерпретации исторических событий $theme.",
+        "literature": "Сосредоточьтесь на литературном анализе, интерпретации текста, критическом мышлении, творческом выражении и понимании литературных произведений $theme.",
+        "physics": "Сосредоточьтесь на физических концепциях, математических приложениях, экспериментальных демонстрациях, решении задач и понимании принципов $theme.",
+        "chemistry": "Сосредоточьтесь на химических реакциях, лабораторной безопасности, молекулярном понимании, практических применениях и химических концепциях $theme.",
+        "biology": "Сосредоточьтесь на биологических системах, научном наблюдении, классификации, экологических отношениях и понимании биологических процессов $theme."
+    },
+    "tj": {
+        "mathematics": "Ба мафҳумҳои математикӣ, усулҳои ҳалли масъалаҳо, равшании шарҳҳо, истифодаи воситаҳои намоишӣ, намоишҳои қадам ба қадам ва фаҳмиши донишҷӯён аз $theme диққат диҳед.",
+        "science": "Ба усули илмӣ, тарҳрезии таҷрибавӣ, санҷиши фарзияҳо, истифодаи таҷҳизоти илмӣ, процедураҳои бехатарӣ ва фаҳмиши мафҳумҳои $theme диққат диҳед.",
+        "language": "Ба омӯзиши забон, таълими грамматика, сохтани луғат, талаффуз, фаҳмиши хондан ва маҳоратҳои забонӣ $theme диққат диҳед.",
+        "history": "Ба таҳлили таърихӣ, арзёбии манбаъҳо, фаҳмиши хронологикӣ, контексти фарҳангӣ ва тафсири вокеъҳои таърихӣ $theme диққат диҳед.",
+        "literature": "Ба таҳлили адабӣ, тафсири матн, фикри интиқодӣ, ибрози иҷодӣ ва фаҳмиши асарҳои адабӣ $theme диққат диҳед.",
+        "physics": "Ба мафҳумҳои физикӣ, истифодаи математикӣ, намоишҳои таҷрибавӣ, ҳалли масъалаҳо ва фаҳмиши принсипҳои $theme диққат диҳед.",
+        "chemistry": "Ба реаксияҳои химиявӣ, бехатарии лабораторӣ, фаҳмиши молекулярӣ, истифодаи амалӣ ва мафҳумҳои химиявӣ $theme диққат диҳед.",
+        "biology": "Ба системаҳои биологӣ, мушоҳидаи илмӣ, тасниф, муносибатҳои экологӣ ва фаҳмиши равандҳои биологӣ $theme диққат диҳед."
+    }
+}
+
+FEEDBACK_PROMPT = Template("""
+        You are an expert educational consultant analyzing a classroom video. 
+        $language_instruction
+        Please provide EXTREMELY comprehensive, detailed feedback in $lang_name language ONLY.
+        
+        SUBJECT: $subject
+        THEME: $theme
+        $transcription_info
+        $measured_signals
+        
+        $subject_guidance
+        
+        Please provide EXTREMELY detailed feedback in the following JSON format, responding in $lang_name language:
+        {
+            "teaching_quality_score": 0-10,
+            "student_engagement_score": 0-10,
+            "overall_score": 0-10,
+            "strengths": "Provide 5-7 EXTREMELY detailed strengths specific to $subject and $theme. Include specific examples, observations from the video, teaching techniques used, and their effectiveness. Be very comprehensive and detailed.",
+            "areas_for_improvement": "Provide 5-7 EXTREMELY detailed areas for improvement specific to $subject and $theme. Be very specific about what could be enhanced, include concrete examples, and explain why these improvements would be beneficial.",
+            "specific_recommendations": "Provide 6-8 EXTREMELY specific, actionable recommendations for improving teaching in $subject. Include concrete examples, step-by-step strategies, specific activities, assessment methods, and implementation tips. Be very detailed and practical."
+        }
+        
+        CRITICAL REQUIREMENTS FOR MAXIMUM DETAIL:
+        1. Use the subject ($subject) and theme ($theme) information extensively throughout your feedback
+        2. Make feedback extremely specific to the subject area, not generic
+        3. Provide detailed explanations with multiple concrete examples for each point
+        4. Focus on practical, actionable advice with step-by-step implementation
+        5. Consider subject-specific teaching methodologies and best practices
+        6. Respond ONLY in $lang_name language, not in English
+        7. Be extremely comprehensive and detailed in your analysis
+        8. Include specific teaching strategies, assessment methods, and classroom activities
+        9. Provide detailed explanations of why each recommendation would be effective
+        10. Use the transcription content to provide specific examples and observations
+        11. Aim for maximum detail and comprehensiveness in every section
+        """)
+
+FEEDBACK_SYSTEM_PROMPT = Template(
+    "You are an expert educational consultant with deep knowledge of teaching methodologies and classroom dynamics. "
+    "You MUST respond in $lang_name language only. Provide EXTREMELY detailed and comprehensive feedback with specific "
+    "examples and actionable recommendations."
+)
+
+FALLBACK_SYSTEM_PROMPT = "You are an educational expert providing classroom feedback."
+
+# What each feedback field should contain, for repair requests
+FEEDBACK_FIELD_DESCRIPTIONS = {
+    "teaching_quality_score": "a number from 0 to 10",
+    "student_engagement_score": "a number from 0 to 10",
+    "overall_score": "a number from 0 to 10",
+    "strengths": "5-7 detailed strengths of the lesson with concrete examples, as one string",
+    "areas_for_improvement": "5-7 detailed areas for improvement with concrete examples, as one string",
+    "specific_recommendations": "6-8 specific, actionable recommendations, as one string"
+}
+
+# Asks again for only the fields of a feedback answer that were missing, invalid or in the wrong language
+REPAIR_PROMPT = Template("""Your feedback on a $subject lesson about "$theme" had missing or invalid fields.
+$language_instruction
+Return ONLY a JSON object with exactly these keys, all text written in $lang_name:
+$field_requests
+
+For consistency, these are the fields of your feedback that were fine:
+$valid_fields
+""")
+
+
+def _escape(value: str) -> str:
+    """Protect user-provided text from being read as a placeholder in a later substitution"""
+    return value.replace("$", "$$")
+
+
+@lru_cache(maxsize=None)
+def subject_guidance_template(subject: str, language: str) -> Template:
+    """Guidance for the first subject keyword found in the subject name; $theme is left open"""
+    guidance = SUBJECT_GUIDANCE.get(language, SUBJECT_GUIDANCE["en"])
+    subject_lower = subject.lower()
+    for key, text in guidance.items():
+        if key in subject_lower:
+            return Template(text)
+    # Default guidance
+    return Template(guidance["science"])
+
+
+@lru_cache(maxsize=256)
+def feedback_template(subject: str, language: str) -> Template:
+    """
+    Feedback prompt with everything that depends only on (subject, language) filled in
+
+    Compiled once per pair; the remaining placeholders are $theme,
+    $transcription_info and $measured_signals.
+    """
+    lang_name = LANGUAGE_NAMES.get(language, "English")
+    compiled = FEEDBACK_PROMPT.safe_substitute(
+        language_instruction=LANGUAGE_INSTRUCTIONS.get(language, ""),
+        lang_name=lang_name,
+        subject=_escape(subject),
+        subject_guidance=subject_guidance_template(subject, language).template
+    )
+    return Template(compiled)
+
+
+@lru_cache(maxsize=None)
+def feedback_system_prompt(language: str) -> str:
+    return FEEDBACK_SYSTEM_PROMPT.substitute(lang_name=LANGUAGE_NAMES.get(language, "English"))
+
+
+def repair_prompt(
+    subject: str,
+    theme: str,
+    language: str,
+    valid_fields: Dict[str, Any],
+    translations: Dict[str, str],
+    missing: List[str]
+) -> str:
+    """
+    Prompt for a small request that returns only the fields to repair
+
+    Args:
+        subject: Lesson subject
+        theme: Lesson theme
+        language: Feedback language code
+        valid_fields: Fields that passed validation, given as context
+        translations: Fields written in the wrong language -> their text, to be translated
+        missing: Fields to write from scratch
+    """
+    lang_name = LANGUAGE_NAMES.get(language, "English")
+    requests = [
+        f'"{field}": the translation into {lang_name} of: {json.dumps(text, ensure_ascii=False)}'
+        for field, text in translations.items()
+    ]
+    requests += [f'"{field}": {FEEDBACK_FIELD_DESCRIPTIONS[field]}' for field in missing]
+    return REPAIR_PROMPT.substitute(
+        subject=subject,
+        theme=theme,
+        language_instruction=LANGUAGE_INSTRUCTIONS.get(language, ""),
+        lang_name=lang_name,
+        field_requests="\n".join(requests),
+        valid_fields=json.dumps(valid_fields, ensure_ascii=False, indent=1) if valid_fields else "(none)"
+    )
+
+
+def _template_cache_counters():
+    info = feedback_template.cache_info()
+    return [
+        ('effectiveclass_cache_requests_total', {'cache': "feedback_template", 'result': "hit"}, info.hits),
+        ('effectiveclass_cache_requests_total', {'cache': "feedback_template", 'result': "miss"}, info.misses)
+    ]
+
+
+metrics.register_collector(_template_cache_counters)
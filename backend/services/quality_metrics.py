@@ -0,0 +1,134 @@
+import cv2
+import logging
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from services.analysis_stats import RunningStats
+
+logger = logging.getLogger(__name__)
+
+# Gray levels at or beyond which a pixel counts as crushed shadow or blown highlight
+DARK_CLIP_LEVEL = 5
+BRIGHT_CLIP_LEVEL = 250
+
+# Values that map to a full score; chosen for frames at ~960 px analysis width
+TARGET_CONTRAST = 0.2  # RMS contrast (std / 255)
+TARGET_SHARPNESS = 300.0  # Laplacian variance
+CLIPPING_LIMIT = 0.2  # Clipped fraction that scores zero
+
+
+class QualityMeter:
+    """
+    Lighting, exposure and sharpness metrics for sampled frames.
+
+    Works on the shared downscaled grayscale buffer with one histogram and
+    one Laplacian per frame (both vectorized in OpenCV) and folds every value
+    into running statistics, so no per-frame history is kept.
+    """
+
+    METRICS = ("brightness", "contrast", "dark_clipping", "bright_clipping", "sharpness")
+
+    def __init__(self):
+        self.stats: Dict[str, RunningStats] = {name: RunningStats() for name in self.METRICS}
+        self._laplacian: Optional[np.ndarray] = None
+
+    def measure(self, gray: np.ndarray) -> Dict[str, float]:
+        """
+        Measure one frame
+
+        Args:
+            gray: Grayscale frame at analysis resolution
+
+        Returns:
+            The frame's brightness, contrast, clipping and sharpness values
+        """
+        if self._laplacian is None or self._laplacian.shape != gray.shape:
+            self._laplacian = np.empty(gray.shape, dtype=np.int16)
+
+        pixels = float(gray.size)
+        histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        mean, std = cv2.meanStdDev(gray)
+
+        cv2.Laplacian(gray, cv2.CV_16S, dst=self._laplacian, ksize=3)
+        _, laplacian_std = cv2.meanStdDev(self._laplacian)
+
+        return {
+            'brightness': float(mean[0, 0]) / 255.0,
+            'contrast': float(std[0, 0]) / 255.0,
+            'dark_clipping': float(histogram[:DARK_CLIP_LEVEL + 1].sum()) / pixels,
+            'bright_clipping': float(histogram[BRIGHT_CLIP_LEVEL:].sum()) / pixels,
+            'sharpness': float(laplacian_std[0, 0]) ** 2
+        }
+
+    def add(self, metrics: Dict[str, float], span: float = 1.0):
+        """
+        Add a measured frame to the running statistics
+
+        Args:
+            metrics: Values from measure()
+            span: Seconds of video the frame stands for, its weight in the statistics
+        """
+        for name, value in metrics.items():
+            self.stats[name].add(value, span)
+
+
+def merge_quality_stats(parts) -> Dict[str, RunningStats]:
+    """Merge QualityMeter.stats dictionaries from several segments"""
+    merged = {name: RunningStats() for name in QualityMeter.METRICS}
+    for stats in parts:
+        for name, running in stats.items():
+            merged[name].merge(running)
+    return merged
+
+
+def summarize_quality(stats: Dict[str, RunningStats], camera_stability_score: float) -> Dict[str, Any]:
+    """
+    Turn running quality statistics into technical analysis scores
+
+    Args:
+        stats: Merged QualityMeter statistics
+        camera_stability_score: Stability score from the motion stage (0-1)
+
+    Returns:
+        video_quality_score, lighting_analysis and sharpness_analysis entries
+    """
+    if stats['brightness'].count == 0:
+        return {
+            'video_quality_score': 0.0,
+            'lighting_analysis': {},
+            'sharpness_analysis': {}
+        }
+
+    brightness = stats['brightness'].mean
+    contrast = stats['contrast'].mean
+    clipped = stats['dark_clipping'].mean + stats['bright_clipping'].mean
+    sharpness = stats['sharpness'].mean
+
+    brightness_score = max(0.0, 1.0 - abs(brightness - 0.5) / 0.5)
+    contrast_score = min(1.0, contrast / TARGET_CONTRAST)
+    exposure_score = max(0.0, 1.0 - clipped / CLIPPING_LIMIT)
+    sharpness_score = min(1.0, sharpness / TARGET_SHARPNESS)
+
+    video_quality_score = float(np.mean([
+        brightness_score, contrast_score, exposure_score, sharpness_score, camera_stability_score
+    ]))
+
+    return {
+        'video_quality_score': video_quality_score,
+        'lighting_analysis': {
+            'brightness_score': brightness_score,
+            'contrast_score': contrast_score,
+            'exposure_score': exposure_score,
+            'brightness_mean': brightness,
+            'brightness_variation': stats['brightness'].std,
+            'contrast_mean': contrast,
+            'underexposed_ratio': stats['dark_clipping'].mean,
+            'overexposed_ratio': stats['bright_clipping'].mean
+        },
+        'sharpness_analysis': {
+            'sharpness_score': sharpness_score,
+            'laplacian_variance_mean': sharpness,
+            'laplacian_variance_min': stats['sharpness'].min
+        }
+    }
@@ -0,0 +1,294 @@
+import os
+import math
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from services.frame_series import FrameSeries, FRAME_SERIES_FIELDS, save_array, frame_series_path, load_frame_series
+
+logger = logging.getLogger(__name__)
+
+BASE_BUCKET_SECONDS = 1.0  # Finest level resolution
+MAX_BASE_BUCKETS = 16384  # Finest level is coarsened until it has at most this many buckets
+TOP_LEVEL_BUCKETS = 16  # Levels are added until one has at most this many buckets
+STATISTICS = ("min", "max", "mean")
+
+# One row per bucket; all levels are stored back to back, finest first. rows counts the frame
+# series rows in a bucket, frames the analyzed frames they stand for (more on decimated series)
+PYRAMID_DTYPE = np.dtype(
+    [('start', '<f4'), ('width', '<f4'), ('rows', '<i4'), ('frames', '<i4')] +
+    [(f"{field}_{stat}", '<f4') for field in FRAME_SERIES_FIELDS for stat in STATISTICS]
+)
+
+
+class TimelinePyramid:
+    """
+    Min/max/mean summaries of a frame series at successively halved resolutions.
+
+    Level 0 has fixed-width buckets over the whole video and each further
+    level merges pairs of buckets of the level below, so a query for any
+    time range and point budget is answered from the level whose bucket
+    width best fits, reading only the rows it returns. The pyramid is about
+    twice the size of its finest level and is stored as a memory-mapped
+    ``.npy`` file next to the frame series.
+
+    Means are weighted by analyzed frames. Minimum and maximum are exact
+    per-frame values only where every series row is a single frame; on
+    long videos the series holds bucket means and so do the extremes.
+    """
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+        self.levels = self._layout(data)
+
+    @staticmethod
+    def _layout(data: np.ndarray) -> List[Tuple[float, int, int]]:
+        """(bucket_seconds, offset, size) per level, derived from the first bucket width and the level sizes"""
+        levels = []
+        if len(data) == 0:
+            return levels
+        width = float(data['width'][0])
+        size = _base_size_for_rows(len(data))
+        offset = 0
+        while True:
+            levels.append((width, offset, size))
+            offset += size
+            if size <= TOP_LEVEL_BUCKETS:
+                break
+            size = (size + 1) // 2
+            width *= 2
+        return levels
+
+    @classmethod
+    def build(cls, series: FrameSeries) -> "TimelinePyramid":
+        """Build every level from a frame series in vectorized passes"""
+        timestamps = np.asarray(series.column('timestamp'), dtype=np.float64)
+        if len(timestamps) == 0:
+            return cls(np.empty(0, dtype=PYRAMID_DTYPE))
+
+        duration = float(timestamps[-1]) + 1e-3
+        width = BASE_BUCKET_SECONDS
+        while duration / width > MAX_BASE_BUCKETS:
+            width *= 2
+        size = max(1, int(math.ceil(duration / width)))
+        index = np.minimum((timestamps // width).astype(np.int64), size - 1)
+
+        frames = np.asarray(series.column('frames'), dtype=np.float64)
+        level = np.zeros(size, dtype=PYRAMID_DTYPE)
+        level['start'] = np.arange(size) * width
+        level['width'] = width
+        level['rows'] = np.bincount(index, minlength=size)
+        level['frames'] = np.rint(np.bincount(index, weights=frames, minlength=size))
+        empty = level['rows'] == 0
+        for field in FRAME_SERIES_FIELDS:
+            values = np.asarray(series.column(field), dtype=np.float64)
+            minimum = np.full(size, np.inf)
+            maximum = np.full(size, -np.inf)
+            np.minimum.at(minimum, index, values)
+            np.maximum.at(maximum, index, values)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.bincount(index, weights=values * frames, minlength=size) / level['frames']
+            for stat, column in zip(STATISTICS, (minimum, maximum, mean)):
+                column[empty] = np.nan
+                level[f"{field}_{stat}"] = column
+
+        levels = [level]
+        while len(level) > TOP_LEVEL_BUCKETS:
+            level = _coarsen(level)
+            levels.append(level)
+        return cls(np.concatenate(levels))
+
+    @classmethod
+    def load(cls, path: str) -> "TimelinePyramid":
+        return cls(np.load(path, mmap_mode='r'))
+
+    def save(self, path: str):
+        save_array(path, self.data)
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None, points: int = 500) -> Dict[str, Any]:
+        """
+        Summaries for a time range at a resolution of at most ``points`` buckets
+
+        Args:
+            start: Range start in seconds (default: start of video)
+            end: Range end in seconds (default: end of video)
+            points: Maximum number of buckets to return
+
+        Returns:
+            Clamped range, bucket width, bucket starts, analyzed frames per bucket, min/max/mean per
+            metric as parallel lists, and exact_extremes: whether min/max are per-frame values
+            (False when buckets hold decimated rows of a long video, whose extremes are of bucket means)
+        """
+        if not self.levels:
+            return {
+                'from': 0.0, 'to': 0.0, 'bucket_seconds': 0.0, 'start': [], 'frames': [], 'metrics': {},
+                'exact_extremes': True
+            }
+
+        base_width, _, base_size = self.levels[0]
+        duration = base_width * base_size
+        start = max(0.0, start or 0.0)
+        end = min(duration, end if end is not None else duration)
+        span = max(end - start, 0.0)
+
+        # Finest level whose buckets overlapping the range fit the point budget
+        for bucket_seconds, offset, size in self.levels:
+            first = max(0, min(size, int(start // bucket_seconds)))
+            last = max(first, min(size, int(math.ceil(end / bucket_seconds))))
+            if last - first <= points:
+                break
+        rows = self.data[offset + first:offset + last]
+        # Budgets below the top level's size merge its buckets further
+        while len(rows) > points:
+            rows = _coarsen(rows)
+            bucket_seconds *= 2
+
+        return {
+            'from': start,
+            'to': end,
+            'bucket_seconds': bucket_seconds,
+            'start': rows['start'].tolist(),
+            'frames': rows['frames'].tolist(),
+            'exact_extremes': bool(np.array_equal(rows['frames'], rows['rows'])),
+            'metrics': {
+                field: {stat: _json_floats(rows[f"{field}_{stat}"]) for stat in STATISTICS}
+                for field in FRAME_SERIES_FIELDS
+            }
+        }
+
+
+def query_frames(
+    series: FrameSeries,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    points: int = 500
+) -> Optional[Dict[str, Any]]:
+    """
+    Stored frame rows of a time range in the layout of TimelinePyramid.query, one bucket per row
+
+    Args:
+        series: Memory-mapped frame series of the video
+        start: Range start in seconds (default: start of video)
+        end: Range end in seconds (default: end of video)
+        points: Maximum number of rows to return
+
+    Returns:
+        The rows with min = max = mean, or None if the range is empty or has more than points rows
+    """
+    start = max(0.0, start or 0.0)
+    rows = series.slice(start, end)
+    if len(rows) == 0 or len(rows) > points:
+        return None
+    frames = rows.column('frames')
+    rows = rows.data
+    end = end if end is not None else float(rows['timestamp'][-1])
+    return {
+        'from': start,
+        'to': end,
+        'bucket_seconds': 0.0,
+        'start': rows['timestamp'].tolist(),
+        'frames': frames.tolist(),
+        'exact_extremes': bool(np.all(frames == 1)),
+        'metrics': {
+            field: {stat: _json_floats(rows[field]) for stat in STATISTICS}
+            for field in FRAME_SERIES_FIELDS
+        }
+    }
+
+
+def _pyramid_rows(base_size: int) -> int:
+    """Total rows of a pyramid whose finest level has base_size buckets"""
+    rows = base_size
+    while base_size > TOP_LEVEL_BUCKETS:
+        base_size = (base_size + 1) // 2
+        rows += base_size
+    return rows
+
+
+def _base_size_for_rows(rows: int) -> int:
+    """Inverse of _pyramid_rows (which is strictly increasing), by binary search"""
+    low, high = 1, rows
+    while low < high:
+        middle = (low + high) // 2
+        if _pyramid_rows(middle) < rows:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _coarsen(level: np.ndarray) -> np.ndarray:
+    """Merge neighbouring buckets pairwise; an odd last bucket covers a single child"""
+    size = (len(level) + 1) // 2
+    padded = level
+    if len(level) % 2:
+        pad = np.zeros(1, dtype=PYRAMID_DTYPE)
+        for name in PYRAMID_DTYPE.names[4:]:
+            pad[name] = np.nan
+        padded = np.concatenate([level, pad])
+    left, right = padded[0::2], padded[1::2]
+
+    merged = np.zeros(size, dtype=PYRAMID_DTYPE)
+    merged['start'] = left['start']
+    merged['width'] = left['width'] * 2
+    merged['rows'] = left['rows'] + right['rows']
+    merged['frames'] = left['frames'] + right['frames']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for field in FRAME_SERIES_FIELDS:
+            merged[f"{field}_min"] = np.fmin(left[f"{field}_min"], right[f"{field}_min"])
+            merged[f"{field}_max"] = np.fmax(left[f"{field}_max"], right[f"{field}_max"])
+            weighted = (
+                np.nan_to_num(left[f"{field}_mean"]) * left['frames'] +
+                np.nan_to_num(right[f"{field}_mean"]) * right['frames']
+            )
+            merged[f"{field}_mean"] = np.where(merged['frames'] > 0, weighted / merged['frames'], np.nan)
+    return merged
+
+
+def _json_floats(column: np.ndarray) -> List[Optional[float]]:
+    """Floats for JSON, with empty buckets (NaN) as null"""
+    return [None if value != value else value for value in column.tolist()]
+
+
+def pyramid_path(video_id: int) -> str:
+    return os.path.join(settings.series_dir, f"{video_id}.pyramid.npy")
+
+
+def save_timeline_pyramid(video_id: int, series: FrameSeries) -> Optional[str]:
+    """
+    Build and persist the timeline pyramid for a video's frame series
+
+    Args:
+        video_id: Video the series belongs to
+        series: Frame series from VideoAnalyzer.analyze_video
+
+    Returns:
+        Path of the written file or None if failed
+    """
+    path = pyramid_path(video_id)
+    try:
+        TimelinePyramid.build(series).save(path)
+        return path
+    except Exception as e:
+        logger.error(f"Error building timeline pyramid for video_id={video_id}: {str(e)}")
+        return None
+
+
+def load_timeline_pyramid(video_id: int) -> Optional[TimelinePyramid]:
+    """Open a stored pyramid lazily, rebuilding it from the frame series if it is missing or outdated; None if neither exists"""
+    path = pyramid_path(video_id)
+    try:
+        if os.path.exists(path):
+            pyramid = TimelinePyramid.load(path)
+            if pyramid.data.dtype == PYRAMID_DTYPE:
+                return pyramid
+            logger.info(f"Timeline pyramid {path} has an outdated layout, rebuilding it")
+        series = load_frame_series(frame_series_path(video_id))
+        if series is None or save_timeline_pyramid(video_id, series) is None:
+            return None
+        return TimelinePyramid.load(path)
+    except Exception as e:
+        logger.error(f"Error loading timeline pyramid {path}: {str(e)}")
+        return None
@@ -0,0 +1,106 @@
+import logging
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Heuristic used when no tokenizer is installed
+
+# LLM calls made while generating one feedback, collected for persistence
+_usage_log: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("llm_usage_log", default=None)
+
+
+@lru_cache(maxsize=None)
+def _load_encoding():
+    """Local tokenizer (tiktoken) if installed; its BPE is a close proxy for the free models' tokenizers"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.tokenizer_encoding)
+    except Exception as e:
+        logger.warning(f"Tokenizer not available, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text, with a safety margin for tokenizer differences between models"""
+    if not text:
+        return 0
+    encoding = _load_encoding()
+    if encoding is not None:
+        tokens = len(encoding.encode(text, disallowed_special=()))
+    else:
+        tokens = len(text) // CHARS_PER_TOKEN + 1
+    return int(tokens * (1.0 + settings.token_safety_margin))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text, cut at a word boundary, that count_tokens puts within max_tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    raw_tokens = int(max_tokens / (1.0 + settings.token_safety_margin))
+    encoding = _load_encoding()
+    while raw_tokens > 0:
+        if encoding is not None:
+            prefix = encoding.decode(encoding.encode(text, disallowed_special=())[:raw_tokens])
+        else:
+            prefix = text[:(raw_tokens - 1) * CHARS_PER_TOKEN]
+        if " " in prefix.strip():
+            prefix = prefix.rstrip().rsplit(" ", 1)[0]
+        if count_tokens(prefix) <= max_tokens:
+            return prefix
+        raw_tokens -= max(1, raw_tokens // 10)
+    return ""
+
+
+def completion_budget(prompt_tokens: int, requested: int) -> int:
+    """Largest max_tokens (up to requested) that keeps prompt plus completion inside the model context"""
+    return max(0, min(requested, settings.llm_context_tokens - prompt_tokens))
+
+
+def start_usage_log() -> List[Dict[str, Any]]:
+    """Collect usage of every LLM call made from this context (and tasks copied from it)"""
+    usage: List[Dict[str, Any]] = []
+    _usage_log.set(usage)
+    return usage
+
+
+def record_usage(
+    purpose: str,
+    model: str,
+    response: Dict[str, Any],
+    estimated_prompt_tokens: int,
+    latency: float,
+    first_token_latency: Optional[float] = None
+):
+    """
+    Record the token usage reported by one chat completion
+
+    Args:
+        purpose: What the call was for (feedback, transcript_summary, ...)
+        model: Model that answered
+        response: Parsed completion response; its "usage" block is recorded when present
+        estimated_prompt_tokens: Local prompt token count, to check the budgeting against
+        latency: Request duration in seconds
+        first_token_latency: Seconds until the first streamed token, for streamed requests
+    """
+    usage = response.get("usage") or {}
+    entry = {
+        'purpose': purpose,
+        'model': model,
+        'prompt_tokens': usage.get("prompt_tokens"),
+        'completion_tokens': usage.get("completion_tokens"),
+        'estimated_prompt_tokens': estimated_prompt_tokens,
+        'latency': round(latency, 3)
+    }
+    if first_token_latency is not None:
+        entry['first_token_latency'] = round(first_token_latency, 3)
+    logger.info(
+        f"LLM usage [{purpose}] {model}: prompt={entry['prompt_tokens']} (estimated {estimated_prompt_tokens}), "
+        f"completion={entry['completion_tokens']}, {latency:.1f}s"
+    )
+    log = _usage_log.get()
+    if log is not None:
+        log.append(entry)
@@ -0,0 +1,301 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, List, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Span that new spans in this context become children of
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spans (
+    trace_id TEXT NOT NULL,
+    span_id TEXT NOT NULL,
+    parent_id TEXT,
+    video_id INTEGER,
+    name TEXT NOT NULL,
+    start REAL NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL,
+    attributes TEXT
+);
+CREATE INDEX IF NOT EXISTS spans_video ON spans (video_id, start);
+CREATE INDEX IF NOT EXISTS spans_start ON spans (start);
+"""
+
+
+class Span:
+    """One timed operation of a trace"""
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.status = "ok"
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def fail(self, error: BaseException):
+        self.status = "error"
+        self.attributes['error'] = f"{type(error).__name__}: {error}"[:300]
+
+    def finish(self, duration: Optional[float] = None):
+        self.duration = time.time() - self.start if duration is None else duration
+        self.trace.finish(self)
+
+
+class _NoopSpan:
+    """Returned outside a trace, so instrumented code never checks whether tracing is on"""
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans of one pipeline run; written to the store in one transaction when the run ends"""
+
+    def __init__(self, video_id: Optional[int]):
+        self.trace_id = uuid.uuid4().hex
+        self.video_id = video_id
+        self.spans: List[Span] = []
+        self.open: Dict[str, Span] = {}
+        self.exported = False
+        self._lock = threading.Lock()
+
+    def start(self, name: str, parent: Optional[Span], attributes: Dict[str, Any]) -> Span:
+        span = Span(self, name, parent, attributes)
+        with self._lock:
+            self.open[span.span_id] = span
+        return span
+
+    def finish(self, span: Span):
+        with self._lock:
+            self.open.pop(span.span_id, None)
+            if not self.exported:
+                self.spans.append(span)
+
+    def close(self) -> List[Span]:
+        """Spans to export; ones still running (e.g. a losing hedged request) are cut at this point"""
+        with self._lock:
+            self.exported = True
+            now = time.time()
+            for span in self.open.values():
+                span.duration = now - span.start
+                span.status = "unfinished"
+                self.spans.append(span)
+            self.open.clear()
+            return list(self.spans)
+
+
+@contextmanager
+def start_trace(name: str, video_id: Optional[int] = None, **attributes) -> Iterator[Any]:
+    """
+    Trace a pipeline run: the root span, and every span opened in this context below it
+
+    Args:
+        name: Root span name
+        video_id: Video the trace belongs to, for lookup in the waterfall endpoint
+        attributes: Root span attributes
+    """
+    if not settings.tracing_enabled:
+        yield NOOP_SPAN
+        return
+    trace = Trace(video_id)
+    with _span(trace, name, None, attributes) as root:
+        yield root
+    try:
+        _export(trace)
+    except Exception as e:
+        logger.warning(f"Could not export trace for video_id={video_id}: {str(e)}")
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Any]:
+    """Child span of the current one; does nothing outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    with _span(parent.trace, name, parent, attributes) as child:
+        yield child
+
+
+@contextmanager
+def _span(trace: Trace, name: str, parent: Optional[Span], attributes: Dict[str, Any]) -> Iterator[Span]:
+    current = trace.start(name, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+def record_span(name: str, duration: float, start: Optional[float] = None, status: str = "ok", **attributes):
+    """
+    Add a span that was timed elsewhere (another process, or code that only knows its duration afterwards)
+
+    Args:
+        name: Span name
+        duration: Seconds
+        start: Epoch start time; defaults to ending now
+        status: "ok" or "error"
+        attributes: Span attributes
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = parent.trace.start(name, parent, attributes)
+    child.start = time.time() - duration if start is None else start
+    child.status = status
+    child.finish(duration)
+
+
+def trace_commits(session_factory):
+    """Record a db.commit span for every commit of sessions made by session_factory"""
+    from sqlalchemy import event
+
+    @event.listens_for(session_factory, "before_commit")
+    def before_commit(session):
+        session.info['commit_started'] = time.time()
+
+    @event.listens_for(session_factory, "after_commit")
+    def after_commit(session):
+        started = session.info.pop('commit_started', None)
+        if started is not None:
+            record_span("db.commit", time.time() - started, start=started)
+
+    @event.listens_for(session_factory, "after_rollback")
+    def after_rollback(session):
+        started = session.info.pop('commit_started', None)
+        if started is not None:
+            record_span("db.commit", time.time() - started, start=started, status="error")
+
+
+def _connect() -> sqlite3.Connection:
+    directory = os.path.dirname(settings.trace_db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(settings.trace_db_path, timeout=10.0)
+    connection.execute("PRAGMA journal_mode=WAL")  # Readers do not block the pipeline workers writing traces
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _export(trace: Trace):
+    spans = trace.close()
+    rows = [
+        (trace.trace_id, s.span_id, s.parent_id, trace.video_id, s.name, s.start, s.duration, s.status,
+         json.dumps(s.attributes, default=str))
+        for s in spans
+    ]
+    connection = _connect()
+    try:
+        with connection:
+            connection.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if settings.trace_retention_days > 0:
+                connection.execute(
+                    "DELETE FROM spans WHERE start < ?", (time.time() - settings.trace_retention_days * 86400,)
+                )
+    finally:
+        connection.close()
+    logger.info(f"Trace {trace.trace_id} for video_id={trace.video_id}: {len(rows)} spans")
+
+
+def load_waterfall(video_id: int) -> Optional[Dict[str, Any]]:
+    """
+    The latest trace of a video, as a waterfall
+
+    Returns:
+        Trace id, start, duration and the spans in start order, each with its offset
+        from the trace start and its depth; None if the video has no trace
+    """
+    if not os.path.exists(settings.trace_db_path):
+        return None
+    connection = _connect()
+    try:
+        row = connection.execute(
+            "SELECT trace_id FROM spans WHERE video_id = ? AND parent_id IS NULL ORDER BY start DESC LIMIT 1",
+            (video_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        rows = connection.execute(
+            "SELECT span_id, parent_id, name, start, duration, status, attributes FROM spans "
+            "WHERE trace_id = ? ORDER BY start", (row[0],)
+        ).fetchall()
+    finally:
+        connection.close()
+
+    spans = [
+        {'span_id': r[0], 'parent_id': r[1], 'name': r[2], 'start': r[3], 'duration': r[4], 'status': r[5],
+         'attributes': json.loads(r[6]) if r[6] else {}}
+        for r in rows
+    ]
+    root = next(s for s in spans if s['parent_id'] is None)
+    by_id = {s['span_id']: s for s in spans}
+    for s in spans:
+        depth, parent = 0, by_id.get(s['parent_id'])
+        while parent is not None:
+            depth, parent = depth + 1, by_id.get(parent['parent_id'])
+        s['depth'] = depth
+        s['offset'] = round(s['start'] - root['start'], 4)
+        s['duration'] = round(s['duration'], 4)
+    return {
+        'video_id': video_id,
+        'trace_id': row[0],
+        'start': root['start'],
+        'duration': root['duration'],
+        'spans': _tree_order(spans)
+    }
+
+
+def _tree_order(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Depth-first by start time, so children follow their parent"""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in spans:
+        children.setdefault(s['parent_id'], []).append(s)
+    ordered = []
+    stack = list(reversed(children.get(None, [])))
+    while stack:
+        s = stack.pop()
+        ordered.append(s)
+        stack.extend(reversed(children.get(s['span_id'], [])))
+    return ordered
+
+
+def format_waterfall(waterfall: Dict[str, Any], width: int = 60) -> str:
+    """Plain-text waterfall: one line per span with a bar on the trace's time axis"""
+    total = max(waterfall['duration'], 1e-9)
+    lines = [f"trace {waterfall['trace_id']} video_id={waterfall['video_id']} {waterfall['duration']:.3f}s"]
+    for s in waterfall['spans']:
+        begin = int(s['offset'] / total * width)
+        length = max(1, int(s['duration'] / total * width))
+        bar = " " * begin + "#" * min(length, width - begin if begin < width else 1)
+        label = ("  " * s['depth'] + s['name'])[:40]
+        status = "" if s['status'] == "ok" else f" [{s['status']}]"
+        lines.append(f"{label:<40} {s['offset']:9.3f}s {s['duration']:9.3f}s |{bar:<{width}}|{status}")
+    return "\n".join(lines) + "\n"
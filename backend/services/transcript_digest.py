@@ -0,0 +1,215 @@
+import os
+import re
+import contextvars
+import threading
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Sequence
+
+from config.settings import settings
+from services.token_budget import count_tokens, truncate_tokens
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT_VERSION = "v1"  # Bump to invalidate cached chunk summaries when the prompt changes
+MAX_REDUCE_ROUNDS = 3
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize this excerpt of a classroom lesson transcript in English in 3-5 sentences. "
+    "Keep what the teacher explains, examples and exercises used, questions asked, "
+    "how students respond, and any classroom management moments. Do not add commentary."
+)
+
+
+def _format_time(seconds: float) -> str:
+    return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}"
+
+
+def chunk_segments(segments: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Group transcript segments into chunks of at most max_tokens
+
+    Args:
+        segments: Whisper segments with start, end and text
+        max_tokens: Token budget per chunk
+
+    Returns:
+        List of {start, end, text} chunks; segments are never split
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for segment in segments:
+        text = segment['text'].strip()
+        if not text:
+            continue
+        tokens = count_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(_make_chunk(current))
+            current, current_tokens = [], 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        chunks.append(_make_chunk(current))
+    return chunks
+
+
+def _make_chunk(segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        'start': segments[0].get('start'),
+        'end': segments[-1].get('end'),
+        'text': " ".join(segment['text'].strip() for segment in segments)
+    }
+
+
+def chunk_text(text: str, max_tokens: int) -> List[Dict[str, Any]]:
+    """Chunk plain text at sentence boundaries when no timed segments are available"""
+    sentences = [{'text': sentence} for sentence in re.split(r"(?<=[.!?])\s+", text) if sentence.strip()]
+    return chunk_segments(sentences, max_tokens)
+
+
+class TranscriptDigest:
+    """
+    Fits a whole lesson transcript into a fixed token budget.
+
+    Short transcripts are passed through unchanged. Longer ones are split
+    into segment-aligned chunks, each chunk is summarized concurrently
+    (map), and the timestamped summaries are joined (reduce), summarizing
+    the summaries again if they still do not fit. Chunk summaries are
+    language-independent and cached on disk by content hash and the model
+    that wrote them, so re-runs and feedback in other languages reuse them.
+    """
+
+    def __init__(self, complete: Callable[[str, str], Optional[str]], models: Sequence[str]):
+        """
+        Args:
+            complete: Sends one prompt to the named model and returns its text (None on failure)
+            models: Summarization models in order of preference; later ones are fallbacks
+        """
+        self.complete = complete
+        self.models = list(models)
+
+    def build(
+        self,
+        transcription: str,
+        segments: Optional[List[Dict[str, Any]]] = None,
+        budget: Optional[int] = None
+    ) -> str:
+        """
+        Transcript text for the feedback prompt, covering the whole lesson within the budget
+
+        Args:
+            transcription: Full transcript text
+            segments: Timed Whisper segments, if available
+            budget: Token budget for the result (default: transcript_budget_tokens)
+
+        Returns:
+            The transcript itself if it fits, otherwise a timestamped digest
+        """
+        budget = budget or settings.transcript_budget_tokens
+        if count_tokens(transcription) <= budget:
+            return transcription
+
+        chunk_tokens = settings.transcript_chunk_tokens
+        chunks = chunk_segments(segments, chunk_tokens) if segments else chunk_text(transcription, chunk_tokens)
+        logger.info(f"Summarizing transcript in {len(chunks)} chunks")
+
+        for _ in range(MAX_REDUCE_ROUNDS):
+            summaries = self._summarize_all(chunks)
+            digest = self._join(chunks, summaries)
+            if count_tokens(digest) <= budget:
+                return digest
+            # Reduce again: the summaries become the chunks of the next round
+            chunks = chunk_segments(
+                [
+                    {'start': chunk['start'], 'end': chunk['end'], 'text': summary}
+                    for chunk, summary in zip(chunks, summaries)
+                ],
+                chunk_tokens
+            )
+
+        return self._fit(chunks, summaries, budget)
+
+    def _join(self, chunks: List[Dict[str, Any]], summaries: List[str]) -> str:
+        return "\n".join(self._label(chunk) + summary for chunk, summary in zip(chunks, summaries))
+
+    def _fit(self, chunks: List[Dict[str, Any]], summaries: List[str], budget: int) -> str:
+        """
+        Trim the summaries so the digest fits the budget while every time range keeps its line
+
+        Summaries shorter than an equal share keep their text and leave the rest to the longer ones,
+        which are cut at a word boundary. The share shrinks until count_tokens confirms the fit.
+        """
+        sizes = [count_tokens(summary) for summary in summaries]
+        available = budget - sum(count_tokens(self._label(chunk)) + 1 for chunk in chunks)
+        share = self._equal_share(sizes, available)
+        while True:
+            trimmed = [
+                summary if size <= share else truncate_tokens(summary, share - 1) + "..."
+                for summary, size in zip(summaries, sizes)
+            ]
+            digest = self._join(chunks, trimmed)
+            if count_tokens(digest) <= budget or share <= 1:
+                return digest
+            share -= max(1, share // 10)
+
+    @staticmethod
+    def _equal_share(sizes: List[int], available: int) -> int:
+        """Largest per-summary cap whose capped sizes add up to at most available tokens"""
+        remaining = available
+        ordered = sorted(sizes)
+        for index, size in enumerate(ordered):
+            equal = remaining // (len(ordered) - index)
+            if size > equal:
+                return max(0, equal)
+            remaining -= size
+        return ordered[-1] if ordered else 0
+
+    def _summarize_all(self, chunks: List[Dict[str, Any]]) -> List[str]:
+        with ThreadPoolExecutor(max_workers=max(1, settings.transcript_summary_concurrency)) as executor:
+            # Each task runs in a copy of the caller's context so LLM usage is recorded for the job
+            futures = [executor.submit(contextvars.copy_context().run, self._summarize, chunk) for chunk in chunks]
+            return [future.result() for future in futures]
+
+    def _summarize(self, chunk: Dict[str, Any]) -> str:
+        prompt = f"{SUMMARY_INSTRUCTIONS}\n\nTranscript excerpt:\n{chunk['text']}"
+        # A fallback model's summary is only used when the preferred models cannot provide one
+        for model in self.models:
+            cache_path = self._cache_path(model, chunk['text'])
+            if os.path.exists(cache_path):
+                metrics.inc('effectiveclass_cache_requests_total', {'cache': "transcript_summary", 'result': "hit"})
+                with open(cache_path, encoding="utf-8") as f:
+                    return f.read()
+
+            summary = self.complete(prompt, model)
+            if summary:
+                metrics.inc('effectiveclass_cache_requests_total', {'cache': "transcript_summary", 'result': "miss"})
+                summary = " ".join(summary.split())
+                self._store(cache_path, summary)
+                return summary
+
+        metrics.inc('effectiveclass_cache_requests_total', {'cache': "transcript_summary", 'result': "miss"})
+        # Keep coverage even when every model fails: the start of the chunk, uncached
+        return truncate_tokens(chunk['text'], settings.transcript_chunk_tokens // 4) + "..."
+
+    def _store(self, cache_path: str, summary: str):
+        try:
+            os.makedirs(settings.transcript_summary_cache_dir, exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(summary)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not cache transcript summary: {str(e)}")
+
+    def _cache_path(self, model: str, text: str) -> str:
+        """Cache file of a chunk summary, keyed on the model that wrote it"""
+        key = hashlib.sha256(f"{SUMMARY_PROMPT_VERSION}\0{model}\0{text}".encode("utf-8")).hexdigest()
+        return os.path.join(settings.transcript_summary_cache_dir, f"{key}.txt")
+
+    @staticmethod
+    def _label(chunk: Dict[str, Any]) -> str:
+        if chunk.get('start') is None or chunk.get('end') is None:
+            return "- "
+        return f"- [{_format_time(chunk['start'])}-{_format_time(chunk['end'])}] "
@@ -1,6 +1,7 @@
 import logging
-from faster_whisper import WhisperModel
+import threading
 from config.settings import settings
+from services.model_server import get_whisper_client, LocalWhisper
 from typing import Optional, Dict, Any
 import os
 
@@ -9,13 +10,28 @@ logger = logging.getLogger(__name__)
 
 class TranscriptionService:
     def __init__(self):
-        self.model = WhisperModel(
-            settings.whisper_model,
-            device="cpu",  # Change to "cuda" if GPU is available
-            compute_type="int8"  # Change to "float16" for better accuracy
-        )
+        self._model = None
+        self._model_lock = threading.Lock()
         self.confidence_threshold = settings.confidence_threshold
     
+    @property
+    def model(self):
+        """Whisper model server client, or an in-process model if the server is unavailable, built on first use"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # Share the host-wide model server when possible instead of loading another copy
+                    model = get_whisper_client() if settings.model_server_enabled else None
+                    if model is None:
+                        from faster_whisper import WhisperModel
+                        model = LocalWhisper(WhisperModel(
+                            settings.whisper_model,
+                            device="cpu",  # Change to "cuda" if GPU is available
+                            compute_type="int8"  # Change to "float16" for better accuracy
+                        ))
+                    self._model = model
+        return self._model
+    
     def transcribe_audio(self, audio_path: str, language: str = None) -> Optional[Dict[str, Any]]:
         """
         Transcribe audio file using Whisper
@@ -78,7 +94,8 @@ class TranscriptionService:
                 "segments": segments_data,
                 "language": info.language,
                 "language_probability": info.language_probability,
-                "duration": info.duration
+                "duration": info.duration,
+                "audio_metrics": info.audio_metrics
             }
             
             logger.info(f"Transcription completed. Length: {len(transcription_text)} characters")
@@ -144,7 +161,8 @@ class TranscriptionService:
                 "segments": segments_data,
                 "language": info.language,
                 "language_probability": info.language_probability,
-                "duration": info.duration
+                "duration": info.duration,
+                "audio_metrics": info.audio_metrics
             }
             
             logger.info(f"Video transcription completed. Length: {len(transcription_text)} characters")
@@ -2,40 +2,108 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from config.settings import settings
+from services.frame_sampler import FrameSampler, AdaptiveFrameSampler
+from services.frame_buffer import FrameBuffer
+from services.analysis_stats import RunningStats
+from services.analysis_aggregator import AnalysisAggregator
+from services.frame_series import FrameSeries, FRAME_SERIES_DTYPE
+from services.keyframes import KeyframeSelector
+from services.face_tracker import FaceTracker, stitch_people
+from services.motion_estimator import MotionEstimator
+from services.quality_metrics import QualityMeter, merge_quality_stats, summarize_quality
+from services.metrics import metrics
+from services.tracing import record_span
+from services.profiler import current_profiler, profile_worker
+
 logger = logging.getLogger(__name__)
 
 
+# Average camera movement (frame diagonals per second) treated as completely unstable
+CAMERA_MOTION_LIMIT = 0.1
+
+# Named analysis profiles: which detectors run and how often frames are sampled.
+# With "cascade" enabled, pose only runs when face detection finds someone. Face mesh
+# always needs a detected face to track, whatever the profile.
+ANALYSIS_PROFILES = {
+    "fast": {
+        "sample_interval": 2.0,
+        "face_mesh": True,
+        "max_num_faces": 4,
+        "refine_landmarks": False,
+        "mesh_interval": 4,
+        "pose": False,
+        "cascade": True
+    },
+    "standard": {
+        "sample_interval": 0.5,
+        "face_mesh": True,
+        "max_num_faces": 10,
+        "refine_landmarks": True,
+        "mesh_interval": 3,
+        "pose": True,
+        "cascade": True
+    },
+    "detailed": {
+        "sample_interval": 0.25,
+        "face_mesh": True,
+        "max_num_faces": 10,
+        "refine_landmarks": True,
+        "mesh_interval": 1,
+        "pose": True,
+        "cascade": False  # Pose runs on every sampled frame, so a teacher facing the board still counts
+    }
+}
+
+
 class VideoAnalyzer:
-    def __init__(self):
+    def __init__(self, profile: Optional[str] = None):
+        self.profile_name = profile or settings.video_analysis_profile
+        if self.profile_name not in ANALYSIS_PROFILES:
+            logger.warning(f"Unknown analysis profile '{self.profile_name}', using 'standard'")
+            self.profile_name = "standard"
+        self.profile = ANALYSIS_PROFILES[self.profile_name]
+        self.sample_interval = settings.video_sample_interval or self.profile["sample_interval"]
+        self.max_sample_rate = settings.video_max_sample_rate or 1.0 / self.sample_interval
+        # Spacing of the frames the sampler looks at; segment boundaries are aligned to it
+        self.probe_interval = 1.0 / self.max_sample_rate if settings.video_adaptive_sampling else self.sample_interval
+        
         # Initialize MediaPipe
         self.mp_face_detection = mp.solutions.face_detection
         self.mp_face_mesh = mp.solutions.face_mesh
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_pose = mp.solutions.pose
         
-        # Initialize face detection
+        # Initialize face detection (the cheap first stage of the cascade)
         self.face_detection = self.mp_face_detection.FaceDetection(
             model_selection=1, min_detection_confidence=0.5
         )
         
         # Initialize face mesh for detailed analysis
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=10,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        self.face_mesh = None
+        if self.profile["face_mesh"]:
+            self.face_mesh = self.mp_face_mesh.FaceMesh(
+                static_image_mode=False,
+                max_num_faces=self.profile["max_num_faces"],
+                refine_landmarks=self.profile["refine_landmarks"],
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
         
         # Initialize pose detection
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        self.pose = None
+        if self.profile["pose"]:
+            self.pose = self.mp_pose.Pose(
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
     
     def analyze_video(self, video_path: str) -> Optional[Dict[str, Any]]:
         """
@@ -53,6 +121,7 @@ class VideoAnalyzer:
                 return None
             
             logger.info(f"Starting video analysis: {video_path}")
+            started = time.perf_counter()
             
             cap = cv2.VideoCapture(video_path)
             
@@ -69,52 +138,57 @@ class VideoAnalyzer:
             
             logger.info(f"Video properties: {width}x{height}, {fps} FPS, {duration:.2f}s duration")
             
-            # Analysis data
-            face_detection_data = []
-            motion_analysis_data = []
-            engagement_periods = []
-            frame_analysis = []
-            
-            frame_idx = 0
-            sample_interval = max(1, int(fps / 2))  # Sample every 0.5 seconds
+            cap.release()
             
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Sample frames for analysis
-                if frame_idx % sample_interval == 0:
-                    timestamp = frame_idx / fps
-                    
-                    # Analyze frame
-                    frame_result = self._analyze_frame(frame, timestamp)
-                    if frame_result:
-                        frame_analysis.append(frame_result)
-                        
-                        # Track face detection
-                        if frame_result['faces_detected'] > 0:
-                            face_detection_data.append({
-                                'timestamp': timestamp,
-                                'face_count': frame_result['faces_detected'],
-                                'confidence': frame_result['face_confidence']
-                            })
-                        
-                        # Track motion
-                        if frame_result['motion_score'] > 0:
-                            motion_analysis_data.append({
-                                'timestamp': timestamp,
-                                'motion_score': frame_result['motion_score']
-                            })
-                
-                frame_idx += 1
+            # Split the video into time ranges and analyze them in parallel
+            segments = self._plan_segments(duration)
+            if len(segments) > 1:
+                logger.info(f"Analyzing {len(segments)} segments across worker processes")
+                # Workers sample themselves when this job is profiled
+                profiler = current_profiler()
+                worker_stage = (profiler.stage or "pipeline") if profiler else None
+                pool = _get_process_pool()
+                segment_results = list(pool.map(
+                    _analyze_segment_in_worker,
+                    [video_path] * len(segments),
+                    [start for start, _ in segments],
+                    [end for _, end in segments],
+                    [self.profile_name] * len(segments),
+                    [worker_stage] * len(segments)
+                ))
+                for segment in segment_results:
+                    if 'profile' in segment:
+                        profiler.merge_worker(*segment.pop('profile'))
+            else:
+                segment_results = [self._analyze_segment(video_path, 0.0, None)]
+            
+            # Segments are returned in order, so merging left to right keeps the timelines
+            # sorted and joins attention periods spanning a boundary
+            aggregate = AnalysisAggregator()
+            keyframes = KeyframeSelector()
+            for (start, end), segment in zip(segments, segment_results):
+                aggregate.merge(segment['aggregate'])
+                keyframes.merge(segment['keyframes'])
+                timing = segment['timing']
+                record_span(
+                    "video.segment", timing['duration'], start=timing['start'], video_start=start, video_end=end,
+                    frames=timing['frames'], pid=timing['pid']
+                )
+            
+            # Join people whose tracks were cut at a segment boundary
+            people = stitch_people(
+                [segment['people'] for segment in segment_results],
+                [start for start, _ in segments],
+                gap=2 * self.sample_interval
+            )
             
-            cap.release()
+            quality_stats = merge_quality_stats(segment['quality_stats'] for segment in segment_results)
             
             # Process analysis results
-            analysis_result = self._process_analysis_results(
-                frame_analysis, face_detection_data, motion_analysis_data, duration
-            )
+            analysis_result = self._process_analysis_results(aggregate, duration, people, quality_stats)
+            analysis_result['keyframes'] = keyframes.keyframes
+            metrics.inc('effectiveclass_frames_analyzed_total', value=aggregate.frames)
+            metrics.inc('effectiveclass_video_analysis_seconds_total', value=time.perf_counter() - started)
             
             logger.info(f"Video analysis completed for {video_path}")
             return analysis_result
@@ -123,56 +197,226 @@ class VideoAnalyzer:
             logger.error(f"Error analyzing video {video_path}: {str(e)}")
             return None
     
-    def _analyze_frame(self, frame: np.ndarray, timestamp: float) -> Optional[Dict[str, Any]]:
+    def _plan_segments(self, duration: float) -> List[Tuple[float, Optional[float]]]:
+        """
+        Split the video into time ranges for parallel analysis
+        
+        Args:
+            duration: Video duration in seconds
+            
+        Returns:
+            List of (start, end) ranges in seconds; the last range is open-ended
+        """
+        workers = _worker_count()
+        if workers <= 1 or duration < 2 * settings.video_segment_min_seconds:
+            return [(0.0, None)]
+        
+        # Twice as many segments as workers keeps the pool busy when segments differ in cost
+        segment_count = min(workers * 2, int(duration // settings.video_segment_min_seconds))
+        interval = self.probe_interval
+        
+        # Align boundaries to the sampling grid so the same frames are analyzed as sequentially
+        boundaries = [round(duration * i / segment_count / interval) * interval for i in range(segment_count)]
+        return [
+            (start, boundaries[i + 1] if i + 1 < len(boundaries) else None)
+            for i, start in enumerate(boundaries)
+        ]
+    
+    def _analyze_segment(self, video_path: str, start: float, end: Optional[float]) -> Dict[str, Any]:
+        """
+        Analyze the sampled frames of one time range of a video
+        
+        Args:
+            video_path: Path to the video file
+            start: Segment start in seconds
+            end: Segment end in seconds (exclusive), None for end of video
+            
+        Returns:
+            Dictionary with the segment's frame aggregate, keyframes, per-person and quality data
+        """
+        aggregate = AnalysisAggregator()
+        started = time.time()
+        
+        cap = cv2.VideoCapture(video_path)
+        frame_buffer = FrameBuffer(settings.video_analysis_width)
+        tracker = FaceTracker(self.profile["mesh_interval"])
+        motion_estimator = MotionEstimator()
+        quality_meter = QualityMeter()
+        keyframes = KeyframeSelector()
+        self._reset_tracking()
+        try:
+            if start > 0:
+                self._seed_motion(cap, frame_buffer, motion_estimator, start)
+            
+            # Only decode the frames that will be analyzed
+            if settings.video_adaptive_sampling:
+                sampler = AdaptiveFrameSampler(
+                    cap,
+                    min_rate=settings.video_min_sample_rate,
+                    max_rate=self.max_sample_rate,
+                    threshold=settings.video_scene_change_threshold,
+                    start=start,
+                    end=end
+                )
+            else:
+                sampler = FrameSampler(
+                    cap,
+                    interval=self.sample_interval,
+                    seek_threshold=settings.video_seek_threshold,
+                    start=start,
+                    end=end
+                )
+            
+            # A sampled frame stands for the time until the next one: adaptive sampling skips
+            # frames that look like it. Each result is held back until that span is known.
+            pending = None
+            for frame_idx, timestamp, frame in sampler:
+                # Analyze frame
+                frame_buffer.update(frame)
+                quality = quality_meter.measure(frame_buffer.gray)
+                frame_result = self._analyze_frame(frame_buffer, timestamp, tracker, motion_estimator)
+                if frame_result:
+                    frame_result.update(quality)
+                    keyframes.update(frame_buffer, timestamp, quality['sharpness'])
+                
+                if pending is not None:
+                    self._add_frame(aggregate, quality_meter, *pending, span=timestamp - pending[2])
+                pending = (frame_result, quality, timestamp)
+            
+            if pending is not None:
+                # The last frame stands for the rest of the segment
+                segment_end = end if end is not None else self._video_duration(cap)
+                span = max(segment_end - pending[2], sampler.frame_step / sampler.fps)
+                self._add_frame(aggregate, quality_meter, *pending, span=span)
+        finally:
+            cap.release()
+        
+        if isinstance(sampler, AdaptiveFrameSampler):
+            logger.info(f"Adaptive sampling analyzed {sampler.sampled} of {sampler.probed} probed frames")
+        
+        return {
+            'aggregate': aggregate,
+            'keyframes': keyframes,
+            'people': tracker.summary(),
+            'quality_stats': quality_meter.stats,
+            'timing': {'start': started, 'duration': time.time() - started, 'frames': aggregate.frames, 'pid': os.getpid()}
+        }
+    
+    @staticmethod
+    def _add_frame(
+        aggregate: AnalysisAggregator,
+        quality_meter: QualityMeter,
+        frame_result: Optional[Dict[str, Any]],
+        quality: Dict[str, float],
+        timestamp: float,
+        span: float
+    ):
+        """Fold one analyzed frame into the segment statistics, weighted by the seconds it stands for"""
+        quality_meter.add(quality, span)
+        if frame_result:
+            aggregate.add(frame_result, span)
+    
+    @staticmethod
+    def _video_duration(cap: "cv2.VideoCapture") -> float:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        return cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    
+    def _reset_tracking(self):
+        """Drop MediaPipe tracking state, so landmarks of another segment or video are not carried over"""
+        for solution in (self.face_mesh, self.pose):
+            if solution is not None:
+                solution.reset()
+    
+    def _seed_motion(
+        self,
+        cap: "cv2.VideoCapture",
+        frame_buffer: FrameBuffer,
+        motion_estimator: MotionEstimator,
+        start: float
+    ):
+        """
+        Feed the motion stage the frame one probe interval before a segment start
+        
+        Without it the first frame of every segment after the first has no previous
+        frame and reports no motion, unlike the same frame in a sequential run.
+        """
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_idx = max(0, int(round((start - self.probe_interval) * fps)))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        if ret:
+            frame_buffer.update(frame)
+            motion_estimator.update(frame_buffer.gray, frame_buffer.blurred, frame_idx / fps)
+    
+    def _analyze_frame(
+        self,
+        frame: FrameBuffer,
+        timestamp: float,
+        tracker: FaceTracker,
+        motion_estimator: MotionEstimator
+    ) -> Optional[Dict[str, Any]]:
         """
         Analyze a single frame for faces, motion, and engagement
         
         Args:
-            frame: Video frame as numpy array
+            frame: Preprocessed frame buffers shared by all detectors
             timestamp: Current timestamp in seconds
+            tracker: Face tracker carrying per-person state across frames
+            motion_estimator: Motion stage holding the previous sampled frame
             
         Returns:
             Dictionary with frame analysis results
         """
         try:
-            # Convert BGR to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            rgb_frame = frame.rgb
             
             # Face detection
             face_results = self.face_detection.process(rgb_frame)
             faces_detected = 0
             face_confidence = 0.0
+            face_boxes = []
             
             if face_results.detections:
                 faces_detected = len(face_results.detections)
                 face_confidence = np.mean([
                     detection.score[0] for detection in face_results.detections
                 ])
+                face_boxes = [self._detection_box(detection) for detection in face_results.detections]
+            
+            # Track detected faces so the mesh does not have to run on every frame
+            tracker.update(face_boxes, timestamp)
             
-            # Face mesh for detailed analysis
-            mesh_results = self.face_mesh.process(rgb_frame)
-            engagement_score = 0.0
+            # Face mesh for detailed analysis, refreshed every few frames or when a new face appears
+            if self.face_mesh and tracker.needs_mesh():
+                mesh_results = self.face_mesh.process(rgb_frame)
+                
+                if mesh_results.multi_face_landmarks:
+                    # Calculate engagement based on eye openness and head pose, for every face
+                    tracker.assign_engagement([
+                        (self._landmark_box(landmarks), self._calculate_engagement_score(landmarks))
+                        for landmarks in mesh_results.multi_face_landmarks
+                    ])
             
-            if mesh_results.multi_face_landmarks:
-                # Calculate engagement based on eye openness and head pose
-                engagement_score = self._calculate_engagement_score(mesh_results.multi_face_landmarks[0])
+            engagement_score = tracker.frame_engagement()
             
             # Motion analysis
-            motion_score = self._calculate_motion_score(frame)
+            motion = motion_estimator.update(frame.gray, frame.blurred, timestamp)
             
-            # Pose analysis
-            pose_results = self.pose.process(rgb_frame)
+            # Pose analysis, only when someone is in view unless the profile disables the cascade
             pose_score = 0.0
-            
-            if pose_results.pose_landmarks:
-                pose_score = self._calculate_pose_score(pose_results.pose_landmarks)
+            if self.pose and (faces_detected > 0 or not self.profile["cascade"]):
+                pose_results = self.pose.process(rgb_frame)
+                
+                if pose_results.pose_landmarks:
+                    pose_score = self._calculate_pose_score(pose_results.pose_landmarks)
             
             return {
                 'timestamp': timestamp,
                 'faces_detected': faces_detected,
                 'face_confidence': face_confidence,
                 'engagement_score': engagement_score,
-                'motion_score': motion_score,
+                'motion_score': motion['motion_score'],
+                'camera_motion': motion['camera_motion'],
                 'pose_score': pose_score
             }
             
@@ -180,6 +424,18 @@ class VideoAnalyzer:
             logger.error(f"Error analyzing frame at {timestamp}s: {str(e)}")
             return None
     
+    def _detection_box(self, detection) -> Tuple[float, float, float, float]:
+        """Normalized (xmin, ymin, xmax, ymax) box of a MediaPipe face detection"""
+        box = detection.location_data.relative_bounding_box
+        return (box.xmin, box.ymin, box.xmin + box.width, box.ymin + box.height)
+    
+    def _landmark_box(self, landmarks) -> Tuple[float, float, float, float]:
+        """Approximate face box from the forehead, chin and ear landmarks of a face mesh"""
+        points = [landmarks.landmark[i] for i in (10, 152, 234, 454)]
+        xs = [point.x for point in points]
+        ys = [point.y for point in points]
+        return (min(xs), min(ys), max(xs), max(ys))
+    
     def _calculate_engagement_score(self, landmarks) -> float:
         """
         Calculate engagement score based on facial landmarks
@@ -219,33 +475,6 @@ class VideoAnalyzer:
             logger.error(f"Error calculating engagement score: {str(e)}")
             return 0.0
     
-    def _calculate_motion_score(self, frame: np.ndarray) -> float:
-        """
-        Calculate motion score using optical flow
-        
-        Args:
-            frame: Video frame
-            
-        Returns:
-            Motion score between 0 and 1
-        """
-        try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            # Apply Gaussian blur
-            gray = cv2.GaussianBlur(gray, (21, 21), 0)
-            
-            # Calculate motion score (simplified)
-            # In a real implementation, you'd compare with previous frame
-            motion_score = np.std(gray) / 255.0
-            
-            return min(1.0, motion_score)
-            
-        except Exception as e:
-            logger.error(f"Error calculating motion score: {str(e)}")
-            return 0.0
-    
     def _calculate_pose_score(self, landmarks) -> float:
         """
         Calculate pose score based on body landmarks
@@ -273,101 +502,122 @@ class VideoAnalyzer:
     
     def _process_analysis_results(
         self, 
-        frame_analysis: List[Dict], 
-        face_detection_data: List[Dict], 
-        motion_analysis_data: List[Dict], 
-        duration: float
+        aggregate: AnalysisAggregator, 
+        duration: float,
+        people: Optional[List[Dict]] = None,
+        quality_stats: Optional[Dict[str, RunningStats]] = None
     ) -> Dict[str, Any]:
         """
         Process and aggregate analysis results
         
         Args:
-            frame_analysis: List of frame analysis results
-            face_detection_data: Face detection data
-            motion_analysis_data: Motion analysis data
+            aggregate: Streaming aggregate of every analyzed frame
             duration: Video duration in seconds
+            people: Per-person engagement summaries from the face tracker
+            quality_stats: Running lighting and sharpness statistics from QualityMeter
             
         Returns:
             Processed analysis results
         """
         try:
-            if not frame_analysis:
+            if aggregate.frames == 0:
                 return {
-                    'face_detection_data': [],
-                    'motion_analysis_data': [],
+                    'frame_series': FrameSeries(np.empty(0, dtype=FRAME_SERIES_DTYPE)),
                     'engagement_metrics': {
                         'face_detection_count': 0,
                         'motion_activity_score': 0.0,
                         'attention_span_avg': 0.0,
-                        'engagement_periods': []
+                        'engagement_periods': [],
+                        'people_detected': 0,
+                        'per_person': []
                     },
                     'technical_analysis': {
                         'video_quality_score': 0.0,
                         'audio_quality_score': 0.0,
                         'lighting_analysis': {},
-                        'camera_stability_score': 0.0
+                        'sharpness_analysis': {},
+                        'camera_stability_score': 0.0,
+                        'camera_motion_avg': 0.0
                     }
                 }
             
             # Calculate engagement metrics
-            engagement_scores = [frame['engagement_score'] for frame in frame_analysis if frame['engagement_score'] > 0]
-            motion_scores = [frame['motion_score'] for frame in frame_analysis if frame['motion_score'] > 0]
-            
-            avg_engagement = np.mean(engagement_scores) if engagement_scores else 0.0
-            avg_motion = np.mean(motion_scores) if motion_scores else 0.0
-            
-            # Calculate attention span
-            attention_periods = []
-            current_period_start = None
-            
-            for frame in frame_analysis:
-                if frame['engagement_score'] > 0.5:  # High engagement threshold
-                    if current_period_start is None:
-                        current_period_start = frame['timestamp']
-                else:
-                    if current_period_start is not None:
-                        attention_periods.append({
-                            'start': current_period_start,
-                            'end': frame['timestamp'],
-                            'duration': frame['timestamp'] - current_period_start
-                        })
-                        current_period_start = None
-            
-            # Add final period if still engaged
-            if current_period_start is not None:
-                attention_periods.append({
-                    'start': current_period_start,
-                    'end': duration,
-                    'duration': duration - current_period_start
-                })
-            
-            avg_attention_span = np.mean([period['duration'] for period in attention_periods]) if attention_periods else 0.0
-            
-            # Technical analysis (simplified)
-            video_quality_score = 0.8  # Placeholder
-            audio_quality_score = 0.7  # Placeholder
-            camera_stability_score = 1.0 - avg_motion  # Less motion = more stable
+            avg_engagement = aggregate.engagement.mean if aggregate.engagement.count else 0.0
+            avg_motion = aggregate.motion.mean if aggregate.motion.count else 0.0
+            
+            # Calculate attention span; a period still open at the end runs to the end of the video
+            attention = aggregate.attention.finish(duration)
+            attention_periods = attention.periods()
+            avg_attention_span = attention.average_duration
+            
+            # Technical analysis
+            audio_quality_score = 0.0  # Filled in by the pipeline from the audio metrics stage
+            camera_motion = aggregate.camera_motion.mean
+            camera_stability_score = max(0.0, 1.0 - camera_motion / CAMERA_MOTION_LIMIT)
+            quality = summarize_quality(quality_stats or merge_quality_stats([]), camera_stability_score)
             
             return {
-                'face_detection_data': face_detection_data,
-                'motion_analysis_data': motion_analysis_data,
+                'frame_series': aggregate.frame_series(),
                 'engagement_metrics': {
-                    'face_detection_count': len(face_detection_data),
+                    'face_detection_count': aggregate.face_frames,
                     'motion_activity_score': avg_motion,
                     'attention_span_avg': avg_attention_span,
-                    'engagement_periods': attention_periods
+                    'engagement_periods': attention_periods,
+                    'people_detected': len(people or []),
+                    'per_person': people or []
                 },
                 'technical_analysis': {
-                    'video_quality_score': video_quality_score,
+                    'video_quality_score': quality['video_quality_score'],
                     'audio_quality_score': audio_quality_score,
-                    'lighting_analysis': {
-                        'brightness_score': 0.8,
-                        'contrast_score': 0.7
-                    },
-                    'camera_stability_score': camera_stability_score
+                    'lighting_analysis': quality['lighting_analysis'],
+                    'sharpness_analysis': quality['sharpness_analysis'],
+                    'camera_stability_score': camera_stability_score,
+                    'camera_motion_avg': camera_motion
                 }
             }
             
         except Exception as e:
             logger.error(f"Error processing analysis results: {str(e)}")
-            return {} 
\ No newline at end of file
+            return {} 
+
+
+# Process pool for segment-parallel analysis; each worker owns its own MediaPipe graphs
+_process_pool: Optional[ProcessPoolExecutor] = None
+_worker_analyzers: Dict[str, VideoAnalyzer] = {}
+
+
+def _worker_count() -> int:
+    return settings.video_analysis_workers or os.cpu_count() or 1
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Spawn rather than fork: MediaPipe graphs are not safe to copy across a fork
+        _process_pool = ProcessPoolExecutor(
+            max_workers=_worker_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+    return _process_pool
+
+
+def _init_worker():
+    logging.basicConfig(level=settings.log_level)
+
+
+def _analyze_segment_in_worker(
+    video_path: str,
+    start: float,
+    end: Optional[float],
+    profile: str,
+    profile_stage: Optional[str] = None
+) -> Dict[str, Any]:
+    # Graphs are built once per worker and profile, then reused for every segment
+    if profile not in _worker_analyzers:
+        _worker_analyzers[profile] = VideoAnalyzer(profile)
+    with profile_worker(profile_stage) as profiler:
+        result = _worker_analyzers[profile]._analyze_segment(video_path, start, end)
+    if profiler is not None:
+        result['profile'] = (profiler.stacks, profiler.report)
+    return result
\ No newline at end of file
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from services.analysis_stats import AttentionPeriods
+
+STEP = 0.5
+
+
+def scan(scores, max_periods=200):
+    periods = AttentionPeriods(0.5, max_periods)
+    for i, score in enumerate(scores):
+        periods.update(i * STEP, score)
+    return periods
+
+
+def segmented(scores, boundaries, max_periods=200):
+    """Feed each segment to its own detector and merge them left to right, like the segment workers"""
+    edges = [0] + list(boundaries) + [len(scores)]
+    merged = AttentionPeriods(0.5, max_periods)
+    for first, last in zip(edges, edges[1:]):
+        segment = AttentionPeriods(0.5, max_periods)
+        for i in range(first, last):
+            segment.update(i * STEP, scores[i])
+        merged.merge(segment)
+    return merged
+
+
+def assert_same(merged, whole, end):
+    merged.finish(end)
+    whole.finish(end)
+    assert merged.count == whole.count
+    assert merged.total_duration == pytest.approx(whole.total_duration)
+    assert merged.periods() == pytest.approx(whole.periods())
+
+
+@pytest.mark.parametrize("boundaries", [
+    [3],      # Split inside an engaged period
+    [2],      # Split right where a period starts
+    [5],      # Split right where a period ends
+    [3, 4],   # One-frame segment inside a period
+    [1, 4, 7],
+])
+def test_merge_joins_periods_across_boundaries(boundaries):
+    scores = [0.9, 0.1, 0.8, 0.9, 0.9, 0.2, 0.7, 0.7, 0.1, 0.9]
+    end = len(scores) * STEP
+    assert_same(segmented(scores, boundaries), scan(scores), end)
+
+
+def test_segment_engaged_throughout_stays_open():
+    scores = [0.1, 0.9, 0.9, 0.9, 0.9, 0.9]
+    merged = segmented(scores, [2, 4])
+    assert merged.open_start == STEP
+    assert_same(merged, scan(scores), len(scores) * STEP)
+    assert merged.periods() == [{'start': 0.5, 'end': 3.0, 'duration': 2.5}]
+
+
+def test_period_open_at_the_end_runs_to_the_end_of_the_video():
+    scores = [0.1, 0.9, 0.9]
+    periods = segmented(scores, [2]).finish(10.0)
+    assert periods.periods() == [{'start': 0.5, 'end': 10.0, 'duration': 9.5}]
+
+
+def test_empty_segments_are_ignored():
+    scores = [0.9, 0.9, 0.1, 0.9]
+    merged = AttentionPeriods().merge(segmented(scores, [2])).merge(AttentionPeriods())
+    assert_same(merged, scan(scores), len(scores) * STEP)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_splits_match_a_single_scan(seed):
+    rng = random.Random(seed)
+    scores = [rng.random() for _ in range(rng.randint(1, 80))]
+    boundaries = sorted(rng.sample(range(1, len(scores)), min(len(scores) - 1, rng.randint(0, 6))))
+    assert_same(segmented(scores, boundaries, max_periods=4), scan(scores, max_periods=4), len(scores) * STEP)
+
+
+def test_only_the_longest_periods_are_kept():
+    # Periods of 1, 3 and 2 frames; count and total cover all of them
+    scores = [0.9, 0.1, 0.9, 0.9, 0.9, 0.1, 0.9, 0.9, 0.1]
+    periods = scan(scores, max_periods=1).finish(len(scores) * STEP)
+    assert periods.count == 3
+    assert periods.total_duration == pytest.approx(3.0)
+    # The period starting at the first frame is held aside for merging and always reported
+    assert [p['start'] for p in periods.periods()] == [0.0, 1.0]
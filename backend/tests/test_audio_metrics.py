@@ -0,0 +1,85 @@
+import wave
+
+import numpy as np
+import pytest
+
+from services.audio_metrics import AudioQualityAnalyzer, analyze_pcm, analyze_wav
+
+RATE = 16000
+
+
+def speech_like(seconds=10.0, level=0.1, noise=0.001, seed=0):
+    """Tone bursts (on half the time) over a low noise floor"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * RATE)) / RATE
+    envelope = (np.floor(t * 2) % 2 == 0).astype(np.float32)
+    tone = level * np.sqrt(2) * np.sin(2 * np.pi * 220 * t) * envelope
+    return (tone + rng.normal(0, noise, t.size)).astype(np.float32)
+
+
+def test_levels_snr_and_speech_ratio():
+    result = analyze_pcm(speech_like(), RATE)
+    assert result['duration'] == pytest.approx(10.0)
+    assert result['speech_level_db'] == pytest.approx(-20.0, abs=1.0)
+    assert result['noise_floor_db'] == pytest.approx(-60.0, abs=1.5)
+    assert result['estimated_snr_db'] == pytest.approx(40.0, abs=2.0)
+    assert result['speech_ratio'] == pytest.approx(0.5, abs=0.02)
+    assert result['clipping_ratio'] == 0.0
+    assert result['audio_quality_score'] == pytest.approx(1.0)
+
+
+def test_noisy_recording_scores_lower():
+    clean = analyze_pcm(speech_like(), RATE)
+    noisy = analyze_pcm(speech_like(noise=0.03), RATE)
+    assert noisy['estimated_snr_db'] < clean['estimated_snr_db'] - 20
+    assert noisy['audio_quality_score'] < clean['audio_quality_score']
+
+
+def test_clipping_is_counted():
+    samples = np.clip(speech_like(level=0.9), -1.0, 1.0)
+    result = analyze_pcm(samples, RATE)
+    assert result['clipping_ratio'] > 0.01
+    assert result['audio_quality_score'] < 0.75
+
+
+def test_silence():
+    result = analyze_pcm(np.zeros(RATE, dtype=np.float32), RATE)
+    assert result['speech_ratio'] == 0.0
+    assert result['estimated_snr_db'] == 0.0
+
+
+def test_empty_input():
+    assert AudioQualityAnalyzer(RATE).result() == {'audio_quality_score': 0.0, 'duration': 0.0}
+
+
+def test_chunked_input_matches_one_buffer():
+    samples = speech_like(seconds=3.0)
+    analyzer = AudioQualityAnalyzer(RATE)
+    chunk = analyzer.window_size * 100
+    for start in range(0, samples.size, chunk):
+        analyzer.add_samples(samples[start:start + chunk])
+    assert analyzer.result() == pytest.approx(analyze_pcm(samples, RATE))
+
+
+def test_wav_counts_clipping_per_channel(tmp_path):
+    # One clipped channel: the downmix halves its peaks, but clipping is still reported
+    left = np.clip(speech_like(seconds=2.0, level=0.9), -1.0, 1.0)
+    right = np.zeros_like(left)
+    pcm = (np.column_stack([left, right]) * 32767).astype(np.int16)
+    path = tmp_path / "stereo.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(pcm.tobytes())
+
+    result = analyze_wav(str(path))
+    assert result['duration'] == pytest.approx(2.0)
+    assert result['clipping_ratio'] > 0.005
+    assert analyze_pcm(pcm.mean(axis=1) / 32768.0, RATE)['clipping_ratio'] == 0.0
+
+
+def test_unreadable_wav(tmp_path):
+    path = tmp_path / "broken.wav"
+    path.write_bytes(b"not a wav file")
+    assert analyze_wav(str(path)) is None
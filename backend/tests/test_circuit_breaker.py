@@ -0,0 +1,112 @@
+import pytest
+
+from services import model_router
+from services.model_router import CircuitBreaker, ModelRouter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(model_router.time, "monotonic", clock)
+    return clock
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure("timeout")
+    breaker.record_failure("timeout")
+    breaker.record_success()
+    breaker.record_failure("timeout")
+    breaker.record_failure("timeout")
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+    breaker.record_failure("timeout")
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()['retry_in_seconds'] == 30.0
+    assert breaker.snapshot()['last_error'] == "timeout"
+
+
+def test_half_open_allows_a_single_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure("error")
+    clock.now += 29
+    assert not breaker.allow()
+
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # The trial is in flight
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=30)
+    breaker.record_failure("rate limited", retry_after=10)
+    assert breaker.state == CircuitBreaker.OPEN  # A 429 opens at once, for its Retry-After
+    clock.now += 10
+    assert breaker.allow()
+
+    breaker.record_failure("error")
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+
+def test_released_trial_can_be_claimed_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure("error")
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release_trial()  # e.g. the answer was unusable, or the request lost a race
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_release_and_late_success_leave_other_states_alone(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.release_trial()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure("error")
+    breaker.release_trial()
+    breaker.record_success()  # Answer to a request sent before the circuit opened
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_router_skips_open_models_and_frees_trials_after_a_race(clock):
+    router = ModelRouter({"feedback": "model-a", "chat": "model-b"})
+    breaker = router._breaker("model-a")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure("error")
+    calls = []
+
+    def call(model, answer):
+        def run():
+            calls.append(model)
+            return answer
+        return run
+
+    attempts = [("model-a", "feedback", call("model-a", "a")), ("model-b", "feedback_fallback", call("model-b", "b"))]
+    assert router.race(attempts) == "b"
+    assert calls == ["model-b"]
+
+    # Half-open: the trial answers with nothing usable, and its slot is given back
+    clock.now += breaker.reset_seconds
+    attempts[0] = ("model-a", "feedback", call("model-a", None))
+    assert router.race(attempts) == "b"
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert router.allow("model-a")
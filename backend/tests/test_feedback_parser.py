@@ -0,0 +1,86 @@
+from services.feedback_parser import PartialJSONParser, parse_feedback_json, validate_feedback
+
+SECTION = "Clear structure and good pacing throughout the lesson."
+
+RESPONSE = (
+    'Here is the feedback:\n```json\n{\n'
+    '  "teaching_quality_score": 8,\n'
+    '  "student_engagement_score": "7/10",\n'
+    '  "overall_score": 7.5,\n'
+    f'  "strengths": "{SECTION}\nQuestions were open-ended.",\n'
+    '  "areas_for_improvement": ["Check understanding more often", "Slow down at the end"],\n'
+    f'  "specific_recommendations": "{SECTION}",\n'
+    '}\n```\nLet me know if you need more.'
+)
+
+
+def test_complete_response_with_prose_fences_and_trailing_comma():
+    data = parse_feedback_json(RESPONSE)
+    assert data['teaching_quality_score'] == 8
+    assert data['student_engagement_score'] == "7/10"
+    assert data['strengths'] == f"{SECTION}\nQuestions were open-ended."
+    assert data['areas_for_improvement'] == ["Check understanding more often", "Slow down at the end"]
+
+
+def test_feeding_in_pieces_matches_feeding_at_once():
+    whole = PartialJSONParser().feed(RESPONSE).snapshot()
+    for size in (1, 3, 17):
+        parser = PartialJSONParser()
+        for i in range(0, len(RESPONSE), size):
+            parser.feed(RESPONSE[i:i + size])
+        assert parser.snapshot() == whole
+
+
+def test_truncated_response_keeps_completed_fields():
+    cut = RESPONSE.index("Questions")
+    parser = PartialJSONParser().feed(RESPONSE[:cut])
+    assert set(parser.snapshot(include_partial=False)) == {
+        "teaching_quality_score", "student_engagement_score", "overall_score"
+    }
+    assert parser.snapshot()['strengths'] == f"{SECTION}\n"
+
+
+def test_number_cut_at_the_end_is_left_out():
+    # "7" may be the start of "75"; only values followed by a delimiter are complete
+    parser = PartialJSONParser().feed('{"teaching_quality_score": 8, "overall_score": 7')
+    assert parser.snapshot() == {"teaching_quality_score": 8}
+
+
+def test_cut_inside_a_key_is_left_out():
+    assert parse_feedback_json('{"overall_score": 7, "stren') == {"overall_score": 7}
+
+
+def test_no_object():
+    assert parse_feedback_json("I cannot help with that.") == {}
+    assert parse_feedback_json(None) == {}
+
+
+def test_validate_normalizes_scores_and_sections():
+    feedback, invalid = validate_feedback(parse_feedback_json(RESPONSE), "en")
+    assert invalid == []
+    assert feedback['student_engagement_score'] == 7.0
+    assert feedback['areas_for_improvement'] == "Check understanding more often Slow down at the end"
+
+
+def test_validate_reports_invalid_fields_in_schema_order():
+    data = {
+        "teaching_quality_score": 12,
+        "student_engagement_score": "high",
+        "overall_score": 6,
+        "strengths": "Too short",
+        "specific_recommendations": SECTION
+    }
+    feedback, invalid = validate_feedback(data, "en")
+    assert invalid == [
+        "teaching_quality_score", "student_engagement_score", "strengths", "areas_for_improvement"
+    ]
+    assert feedback == {"overall_score": 6.0, "specific_recommendations": SECTION}
+
+
+def test_validate_rejects_sections_in_the_wrong_language():
+    data = dict(parse_feedback_json(RESPONSE), strengths="Чёткая структура урока и хороший темп работы.")
+    _, invalid = validate_feedback(data, "en")
+    assert invalid == ["strengths"]
+
+    _, invalid = validate_feedback(data, "ru")
+    assert invalid == ["areas_for_improvement", "specific_recommendations"]
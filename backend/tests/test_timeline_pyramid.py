@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from services.analysis_stats import DecimatingTimeline
+from services.frame_series import FrameSeries, FRAME_SERIES_FIELDS
+from services.timeline_pyramid import TimelinePyramid, query_frames
+
+
+def make_series(seconds, step=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(0.0, seconds, step)
+    points = np.column_stack([timestamps, rng.random((len(timestamps), len(FRAME_SERIES_FIELDS)))])
+    return FrameSeries.from_points(points)
+
+
+@pytest.fixture(scope="module")
+def pyramid():
+    return TimelinePyramid.build(make_series(1000.0))
+
+
+@pytest.mark.parametrize("start, end, points", [
+    (None, None, 500),
+    (None, None, 17),
+    (None, None, 3),
+    (None, None, 1),
+    (0.5, 50.5, 50),    # Unaligned range with exactly as many seconds as points
+    (0.3, 100.7, 50),
+    (123.4, 456.7, 100),
+    (999.0, 2000.0, 10),
+])
+def test_query_never_exceeds_the_point_budget(pyramid, start, end, points):
+    result = pyramid.query(start, end, points)
+    assert 0 < len(result['start']) <= points
+    for field in FRAME_SERIES_FIELDS:
+        for column in result['metrics'][field].values():
+            assert len(column) == len(result['start'])
+
+
+def test_query_covers_the_range(pyramid):
+    result = pyramid.query(123.4, 456.7, 100)
+    width = result['bucket_seconds']
+    assert result['start'][0] <= 123.4 < result['start'][0] + width
+    assert result['start'][-1] < 456.7 <= result['start'][-1] + width
+
+
+def test_query_uses_the_finest_level_that_fits(pyramid):
+    assert pyramid.query(0.0, 100.0, 100)['bucket_seconds'] == 1.0
+    assert pyramid.query(0.5, 100.5, 100)['bucket_seconds'] == 2.0
+
+
+def test_frames_add_up_at_every_resolution(pyramid):
+    for points in (1000, 100, 7, 1):
+        result = pyramid.query(points=points)
+        assert sum(result['frames']) == 2000
+        assert result['exact_extremes']
+
+
+def test_statistics_match_the_series():
+    series = make_series(8.0, step=0.25)
+    result = TimelinePyramid.build(series).query(2.0, 4.0, 2)
+    values = series.slice(2.0, 4.0).column('engagement').astype(np.float64)
+    engagement = result['metrics']['engagement']
+    assert result['frames'] == [4, 4]
+    assert engagement['min'] == pytest.approx([values[:4].min(), values[4:].min()])
+    assert engagement['max'] == pytest.approx([values[:4].max(), values[4:].max()])
+    assert engagement['mean'] == pytest.approx([values[:4].mean(), values[4:].mean()], rel=1e-5)
+
+
+def test_decimated_series_counts_frames_and_flags_extremes():
+    timeline = DecimatingTimeline(FRAME_SERIES_FIELDS, capacity=64)
+    for i in range(1000):
+        timeline.add(i * 0.5, [float(i % 7)] * len(FRAME_SERIES_FIELDS))
+    series = FrameSeries.from_points(timeline.to_array(), timeline.weights())
+    assert len(series) < 1000
+
+    result = TimelinePyramid.build(series).query(points=10)
+    assert len(result['start']) <= 10
+    assert sum(result['frames']) == 1000
+    assert not result['exact_extremes']
+
+
+def test_empty_pyramid():
+    result = TimelinePyramid.build(FrameSeries.from_points(np.empty((0, 1 + len(FRAME_SERIES_FIELDS))))).query()
+    assert result['start'] == [] and result['frames'] == []
+
+
+def test_query_frames_returns_rows_within_the_budget():
+    series = make_series(100.0)
+    result = query_frames(series, 10.0, 20.0, 20)
+    assert len(result['start']) == 20
+    assert result['frames'] == [1] * 20
+    assert result['metrics']['engagement']['min'] == result['metrics']['engagement']['max']
+    assert query_frames(series, 10.0, 20.0, 19) is None